@@ -0,0 +1,60 @@
+"""
+Compares TTS audio encodings and sample rates by bytes per second of speech.
+
+Synthesizes the same text with Google TTS in every configured format,
+measures the real duration of each clip and reports its size, bitrate and
+what one second of speech costs on the wire with the base64 and binary
+tts:audio transports. Calls the real API, so TTS_API_KEY must be set.
+
+Usage:
+    python benchmarks/audio_encoding_benchmark.py [voice]
+"""
+import os
+import sys
+import time
+import base64
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from components.tts.google_chirp import generate_tts_audio
+from components.tts.audio_duration import audio_duration
+from monolithic.socket.utils import AUDIO_CHUNK_SIZES
+
+TEXT = (
+    "Sure, here is a quick overview. Streaming audio in a compressed format keeps "
+    "the first sentence small, so playback can start sooner on slow connections. "
+    "Longer answers benefit even more, because every second of speech costs fewer bytes."
+)
+
+FORMATS = [
+    ('MP3', None),
+    ('MP3', 16000),
+    ('OGG_OPUS', None),
+    ('OGG_OPUS', 16000),
+    ('LINEAR16', 24000),
+    ('LINEAR16', 16000),
+]
+
+
+def main():
+    voice = sys.argv[1] if len(sys.argv) > 1 else None
+    print(f"text: {len(TEXT)} characters")
+    print(f"{'format':<18} {'bytes':>8} {'seconds':>8} {'kbit/s':>7} {'b64 B/s':>8} {'bin B/s':>8} {'chunks':>7} {'synth':>8}")
+    for encoding, sample_rate in FORMATS:
+        start = time.perf_counter()
+        audio = base64.b64decode(generate_tts_audio(TEXT, voice, encoding=encoding, sample_rate=sample_rate))
+        elapsed = time.perf_counter() - start
+        seconds = audio_duration(audio, encoding, sample_rate)
+        label = f"{encoding}@{sample_rate or 'default'}"
+        chunk_size = AUDIO_CHUNK_SIZES[encoding]
+        chunks = (len(audio) + chunk_size - 1) // chunk_size
+        if not seconds:
+            print(f"{label:<18} {len(audio):>8} {'?':>8}")
+            continue
+        b64_bytes = (len(audio) + 2) // 3 * 4
+        print(f"{label:<18} {len(audio):>8} {seconds:>8.2f} {len(audio) * 8 / seconds / 1000:>7.1f} "
+              f"{b64_bytes / seconds:>8.0f} {len(audio) / seconds:>8.0f} {chunks:>7} {elapsed * 1000:>6.0f}ms")
+
+
+if __name__ == '__main__':
+    main()
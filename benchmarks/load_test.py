@@ -0,0 +1,444 @@
+"""
+End-to-end load test against local stand-ins for Gemini and Google TTS.
+
+Starts fake generateContent / streamGenerateContent and text:synthesize
+servers with configurable latency and payload sizes, launches server.py
+pointed at them (GEMINI_API_BASE, TTS_API_URL), registers one user per
+simulated client and drives every client concurrently through
+connect -> user:join -> user:message -> ai:response:chunk/end and the
+auto-play tts:audio stream. Reports time to first chunk, time to first
+audio, full response and full audio times as percentiles, throughput and
+server RSS, and writes everything as JSON for comparing runs.
+
+The server still needs a reachable DATABASE_URL (and JWT_SECRET), taken
+from the environment or .env as usual.
+
+Usage:
+    python benchmarks/load_test.py --clients 50 --messages 3
+    python benchmarks/load_test.py --url http://localhost:5000 --server-pid 1234
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import base64
+import random
+import socket
+import argparse
+import platform
+import threading
+import subprocess
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+import socketio
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_WORDS = ('the quick brown fox jumps over a lazy dog while audible assistants read long answers '
+          'aloud to patient listeners who asked about weather travel cooking history and code').split()
+
+
+def _fake_text(words, seed):
+    rng = random.Random(seed)
+    sentences = []
+    remaining = words
+    while remaining > 0:
+        length = min(remaining, rng.randint(8, 20))
+        sentence = ' '.join(rng.choice(_WORDS) for _ in range(length))
+        sentences.append(sentence[0].upper() + sentence[1:] + '.')
+        remaining -= length
+    return ' '.join(sentences)
+
+
+class _FakeGeminiHandler(BaseHTTPRequestHandler):
+    """
+    Answers POST .../models/<model>:generateContent and :streamGenerateContent?alt=sse.
+    """
+    protocol_version = 'HTTP/1.1'
+    config = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_body(self):
+        length = int(self.headers.get('Content-Length', 0))
+        return self.rfile.read(length) if length else b''
+
+    def do_POST(self):
+        self._read_body()
+        config = self.config
+        text = _fake_text(config.response_words, uuid.uuid4().int)
+        if ':streamGenerateContent' in self.path:
+            self._stream(text)
+            return
+        time.sleep(config.gemini_latency_ms / 1000)
+        body = json.dumps({'candidates': [{'content': {'role': 'model', 'parts': [{'text': text}]}}]}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _stream(self, text):
+        config = self.config
+        words = text.split(' ')
+        step = max(config.chunk_words, 1)
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        time.sleep(config.first_token_ms / 1000)
+        for i in range(0, len(words), step):
+            if i:
+                time.sleep(config.chunk_interval_ms / 1000)
+            delta = ' '.join(words[i:i + step]) + (' ' if i + step < len(words) else '')
+            event = json.dumps({'candidates': [{'content': {'role': 'model', 'parts': [{'text': delta}]}}]})
+            data = f"data: {event}\r\n\r\n".encode()
+            self.wfile.write(b'%x\r\n%s\r\n' % (len(data), data))
+            self.wfile.flush()
+        self.wfile.write(b'0\r\n\r\n')
+
+
+class _FakeTTSHandler(BaseHTTPRequestHandler):
+    """
+    Answers POST .../text:synthesize with random "audio" sized per input character.
+    """
+    protocol_version = 'HTTP/1.1'
+    config = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        payload = json.loads(self.rfile.read(length) or b'{}')
+        chars = len(payload.get('input', {}).get('text', ''))
+        config = self.config
+        time.sleep((config.tts_latency_ms + chars * config.tts_ms_per_char) / 1000)
+        audio = os.urandom(max(chars * config.tts_bytes_per_char, 1))
+        body = json.dumps({'audioContent': base64.b64encode(audio).decode('ascii')}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def start_fake_server(handler, config):
+    handler = type(handler.__name__, (handler,), {'config': config})
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_app_server(args, gemini, tts):
+    port = _free_port()
+    env = dict(os.environ)
+    env.update({
+        'PORT': str(port),
+        'GEMINI_API_BASE': f"http://127.0.0.1:{gemini.server_address[1]}/v1beta",
+        'TTS_API_URL': f"http://127.0.0.1:{tts.server_address[1]}/v1/text:synthesize",
+        'LLM_API_KEY': env.get('LLM_API_KEY') or 'load-test',
+        'TTS_API_KEY': env.get('TTS_API_KEY') or 'load-test',
+    })
+    log = open(args.server_log, 'w') if args.server_log else subprocess.DEVNULL
+    process = subprocess.Popen([sys.executable, os.path.join(ROOT, 'server.py')], cwd=ROOT, env=env,
+                               stdout=log, stderr=subprocess.STDOUT)
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + args.startup_timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"server.py exited with code {process.returncode}")
+        try:
+            requests.get(f"{url}/metrics", timeout=1)
+            return process, url
+        except requests.RequestException:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError("server.py did not start in time")
+
+
+class RSSSampler:
+    """
+    Samples a process's resident set size from /proc (Linux only).
+    """
+
+    def __init__(self, pid, interval=0.5):
+        self.pid = pid
+        self.interval = interval
+        self.samples = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def read(self):
+        try:
+            with open(f"/proc/{self.pid}/status") as status:
+                for line in status:
+                    if line.startswith('VmRSS:'):
+                        return int(line.split()[1]) * 1024
+        except OSError:
+            return None
+        return None
+
+    def _run(self):
+        while not self._stop.is_set():
+            rss = self.read()
+            if rss is not None:
+                self.samples.append(rss)
+            self._stop.wait(self.interval)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        if not self.samples:
+            return None
+        return {'start_bytes': self.samples[0], 'end_bytes': self.samples[-1], 'peak_bytes': max(self.samples)}
+
+
+class SimulatedClient:
+    """
+    One user with one chat session and one Socket.IO connection.
+    """
+
+    def __init__(self, url, args, index):
+        self.url = url
+        self.args = args
+        self.index = index
+        self.results = []
+        self._current = None
+        self._done = threading.Event()
+        self.sio = socketio.Client(reconnection=False)
+        self.sio.on('ai:response:chunk', self._on_chunk)
+        self.sio.on('ai:response:end', self._on_end)
+        self.sio.on('tts:audio', self._on_audio)
+        self.sio.on('tts:ready', self._on_audio_done)
+        self.sio.on('tts:error', self._on_audio_error)
+
+    def setup(self):
+        email = f"load-{uuid.uuid4().hex[:12]}@example.com"
+        response = requests.post(f"{self.url}/auth/register", json={'email': email, 'password': 'load-test-password'})
+        response.raise_for_status()
+        body = response.json()
+        self.token, self.user_id = body['token'], str(body['user_id'])
+        headers = {'Authorization': f"Bearer {self.token}"}
+        response = requests.post(f"{self.url}/sessions", json={'title': 'Load test'}, headers=headers)
+        response.raise_for_status()
+        self.session_id = response.json()['session_id']
+        transports = [self.args.transport] if self.args.transport else None
+        self.sio.connect(self.url, auth={'token': self.token, 'audioTransport': self.args.audio_transport},
+                         transports=transports, wait_timeout=10)
+        self.sio.emit('user:join', {'user_id': self.user_id, 'audioTransport': self.args.audio_transport})
+
+    def _elapsed(self):
+        return time.perf_counter() - self._current['sent']
+
+    def _maybe_done(self):
+        current = self._current
+        if current is not None and 'response' in current and ('audio' in current or 'audio_error' in current):
+            self._done.set()
+
+    def _on_chunk(self, data):
+        if self._current is not None and 'first_chunk' not in self._current:
+            self._current['first_chunk'] = self._elapsed()
+
+    def _on_end(self, data):
+        if self._current is not None:
+            self._current['response'] = self._elapsed()
+            self._current['response_chars'] = len((data.get('message') or {}).get('text') or '')
+            self._maybe_done()
+
+    def _on_audio(self, data):
+        current = self._current
+        if current is None or not data.get('autoPlay'):
+            return
+        if 'first_audio' not in current:
+            current['first_audio'] = self._elapsed()
+        audio = data.get('bytes') or b''
+        current['audio_bytes'] = current.get('audio_bytes', 0) + (len(audio) if isinstance(audio, bytes) else len(audio) * 3 // 4)
+
+    def _on_audio_done(self, data):
+        if self._current is not None and data.get('autoPlay'):
+            self._current['audio'] = self._elapsed()
+            self._maybe_done()
+
+    def _on_audio_error(self, data):
+        if self._current is not None:
+            self._current['audio_error'] = data.get('code')
+            self._maybe_done()
+
+    def run(self, barrier):
+        barrier.wait()
+        for i in range(self.args.messages):
+            self._done.clear()
+            self._current = {'sent': time.perf_counter()}
+            self.sio.emit('user:message', {
+                'session_id': self.session_id,
+                'user_id': self.user_id,
+                'text': f"Question {i} from client {self.index}: tell me something interesting.",
+                'is_first_message': i == 0,
+            })
+            if not self._done.wait(self.args.message_timeout):
+                self._current['timeout'] = True
+            result, self._current = self._current, None
+            result.pop('sent')
+            self.results.append(result)
+            if self.args.think_time_ms:
+                time.sleep(self.args.think_time_ms / 1000)
+
+    def close(self):
+        try:
+            self.sio.disconnect()
+        except Exception:
+            pass
+
+
+def percentiles(values):
+    if not values:
+        return None
+    values = sorted(values)
+
+    def pick(q):
+        return values[min(int(q * len(values)), len(values) - 1)]
+    return {
+        'count': len(values),
+        'p50_ms': round(pick(0.50) * 1000, 1),
+        'p90_ms': round(pick(0.90) * 1000, 1),
+        'p99_ms': round(pick(0.99) * 1000, 1),
+        'max_ms': round(values[-1] * 1000, 1),
+        'mean_ms': round(sum(values) / len(values) * 1000, 1),
+    }
+
+
+def summarize(results, wall_seconds):
+    completed = [r for r in results if 'response' in r]
+    return {
+        'messages': len(results),
+        'completed': len(completed),
+        'timeouts': sum(1 for r in results if r.get('timeout')),
+        'audio_errors': sum(1 for r in results if 'audio_error' in r),
+        'wall_seconds': round(wall_seconds, 3),
+        'throughput_msgs_per_s': round(len(completed) / wall_seconds, 3) if wall_seconds else 0.0,
+        'time_to_first_chunk': percentiles([r['first_chunk'] for r in results if 'first_chunk' in r]),
+        'time_to_first_audio': percentiles([r['first_audio'] for r in results if 'first_audio' in r]),
+        'full_response': percentiles([r['response'] for r in completed]),
+        'full_audio': percentiles([r['audio'] for r in results if 'audio' in r]),
+        'audio_bytes_total': sum(r.get('audio_bytes', 0) for r in results),
+    }
+
+
+def _print_report(report):
+    summary = report['summary']
+    print(f"clients: {report['config']['clients']}, messages: {summary['messages']}, "
+          f"completed: {summary['completed']}, timeouts: {summary['timeouts']}, audio errors: {summary['audio_errors']}")
+    print(f"throughput: {summary['throughput_msgs_per_s']} msgs/s over {summary['wall_seconds']} s")
+    print(f"{'stage':<22} {'p50':>9} {'p90':>9} {'p99':>9} {'max':>9}")
+    for stage in ('time_to_first_chunk', 'time_to_first_audio', 'full_response', 'full_audio'):
+        stats = summary[stage]
+        if stats:
+            print(f"{stage:<22} {stats['p50_ms']:>7.1f}ms {stats['p90_ms']:>7.1f}ms {stats['p99_ms']:>7.1f}ms {stats['max_ms']:>7.1f}ms")
+    rss = report.get('server_rss')
+    if rss:
+        print(f"server RSS: start {rss['start_bytes'] / 2**20:.1f} MiB, "
+              f"peak {rss['peak_bytes'] / 2**20:.1f} MiB, end {rss['end_bytes'] / 2**20:.1f} MiB")
+    print(f"results written to {report['output']}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--clients', type=int, default=20, help='concurrent simulated clients')
+    parser.add_argument('--messages', type=int, default=3, help='messages sent by each client, one at a time')
+    parser.add_argument('--think-time-ms', type=int, default=0, help='pause between a client\'s messages')
+    parser.add_argument('--message-timeout', type=float, default=120, help='seconds to wait for response and audio')
+    parser.add_argument('--transport', choices=('polling', 'websocket'), default=None,
+                        help='Socket.IO client transport (websocket needs websocket-client)')
+    parser.add_argument('--audio-transport', choices=('base64', 'binary'), default='base64')
+    parser.add_argument('--response-words', type=int, default=120, help='words per fake Gemini response')
+    parser.add_argument('--chunk-words', type=int, default=8, help='words per fake stream event')
+    parser.add_argument('--first-token-ms', type=int, default=300, help='fake Gemini delay before the first event')
+    parser.add_argument('--chunk-interval-ms', type=int, default=40, help='fake Gemini delay between events')
+    parser.add_argument('--gemini-latency-ms', type=int, default=800, help='fake generateContent latency')
+    parser.add_argument('--tts-latency-ms', type=int, default=250, help='fake TTS base latency')
+    parser.add_argument('--tts-ms-per-char', type=float, default=0.5, help='fake TTS latency per input character')
+    parser.add_argument('--tts-bytes-per-char', type=int, default=270, help='fake audio bytes per input character')
+    parser.add_argument('--url', default=None, help='drive an already running server instead of starting server.py')
+    parser.add_argument('--server-pid', type=int, default=None, help='pid to sample RSS from when --url is given')
+    parser.add_argument('--server-log', default=None, help='file for the started server\'s output')
+    parser.add_argument('--startup-timeout', type=float, default=30)
+    parser.add_argument('--output', default=None, help='JSON results file (default benchmarks/results/load_test-<time>.json)')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    gemini = start_fake_server(_FakeGeminiHandler, args)
+    tts = start_fake_server(_FakeTTSHandler, args)
+    process = None
+    if args.url:
+        # An external server must already point GEMINI_API_BASE and TTS_API_URL at the fakes
+        url, pid = args.url.rstrip('/'), args.server_pid
+        print(f"fake Gemini: http://127.0.0.1:{gemini.server_address[1]}/v1beta, "
+              f"fake TTS: http://127.0.0.1:{tts.server_address[1]}/v1/text:synthesize")
+    else:
+        process, url = start_app_server(args, gemini, tts)
+        pid = process.pid
+
+    clients = []
+    try:
+        for index in range(args.clients):
+            client = SimulatedClient(url, args, index)
+            client.setup()
+            clients.append(client)
+        sampler = RSSSampler(pid).start() if pid else None
+        barrier = threading.Barrier(len(clients) + 1)
+        threads = [threading.Thread(target=client.run, args=(barrier,), daemon=True) for client in clients]
+        for thread in threads:
+            thread.start()
+        barrier.wait()
+        started = time.perf_counter()
+        for thread in threads:
+            thread.join()
+        wall_seconds = time.perf_counter() - started
+        rss = sampler.stop() if sampler else None
+    finally:
+        for client in clients:
+            client.close()
+        if process is not None:
+            process.terminate()
+            try:
+                process.wait(10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        gemini.shutdown()
+        tts.shutdown()
+
+    output = args.output or os.path.join(ROOT, 'benchmarks', 'results', f"load_test-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    report = {
+        'finished_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'host': {'python': platform.python_version(), 'platform': platform.platform(), 'cpus': os.cpu_count()},
+        'config': {key: value for key, value in vars(args).items() if key not in ('output', 'server_log')},
+        'summary': summarize([r for client in clients for r in client.results], wall_seconds),
+        'server_rss': rss,
+        'results': [dict(r, client=client.index) for client in clients for r in client.results],
+        'output': output,
+    }
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    _print_report(report)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,152 @@
+"""
+Compares per-query latency of plain SQL text against the repository's
+server-side prepared statements on a local Postgres.
+
+Creates a scratch schema with the chat tables, seeds it, times each
+read statement both ways on the same connection and drops the schema
+again. Needs DATABASE_URL (or a DSN argument) pointing at a database the
+user may create schemas in.
+
+Usage:
+    python benchmarks/prepared_statements_benchmark.py [dsn] [iterations]
+"""
+import os
+import re
+import sys
+import time
+import uuid
+import datetime
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import psycopg2
+from components.postgres.postgres_conn_utils import PreparedConnection
+from components.postgres.repository import STATEMENTS, run
+
+SCHEMA = f"bench_prepared_{os.getpid()}"
+
+TABLES = f"""
+CREATE SCHEMA {SCHEMA};
+SET search_path TO {SCHEMA};
+CREATE TYPE sender_enum AS ENUM ('USER', 'AI', 'SYSTEM');
+CREATE TABLE users (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    email VARCHAR(255) UNIQUE NOT NULL,
+    password_hash VARCHAR(255) NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    last_login_at TIMESTAMP
+);
+CREATE TABLE chatsessions (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    user_id UUID REFERENCES users(id) ON DELETE CASCADE,
+    title VARCHAR(255) NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    last_activity_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    summary TEXT,
+    summary_until_at TIMESTAMP,
+    summary_until_id UUID
+);
+CREATE TABLE messages (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    session_id UUID REFERENCES chatsessions(id) ON DELETE CASCADE,
+    sender sender_enum NOT NULL,
+    text TEXT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX ON messages (session_id, created_at, id);
+CREATE UNIQUE INDEX ON users (lower(email));
+CREATE INDEX ON chatsessions (user_id, last_activity_at DESC, id DESC);
+"""
+
+
+def seed(conn, users=200, sessions_per_user=20, messages_per_session=40):
+    now = datetime.datetime.now(datetime.timezone.utc)
+    with conn.cursor() as cur:
+        user_ids, session_ids = [], []
+        for u in range(users):
+            user_id = str(uuid.uuid4())
+            user_ids.append(user_id)
+            cur.execute("INSERT INTO users (id, email, password_hash) VALUES (%s, %s, %s)",
+                        (user_id, f"user{u}@example.com", 'x' * 100))
+            for s in range(sessions_per_user):
+                session_id = str(uuid.uuid4())
+                session_ids.append(session_id)
+                cur.execute("INSERT INTO chatsessions (id, user_id, title, last_activity_at) VALUES (%s, %s, %s, %s)",
+                            (session_id, user_id, f"Session {s}", now - datetime.timedelta(minutes=s)))
+        cur.execute(
+            "INSERT INTO messages (session_id, sender, text, created_at) "
+            "SELECT s.id, (ARRAY['USER', 'AI'])[1 + i % 2]::sender_enum, repeat('lorem ipsum ', 20), "
+            "now() - make_interval(secs => i) FROM chatsessions s, generate_series(1, %s) i",
+            (messages_per_session,)
+        )
+    conn.commit()
+    return user_ids, session_ids
+
+
+def _plain(name):
+    return re.sub(r'\$\d+', '%s', STATEMENTS[name][1])
+
+
+def time_queries(conn, name, param_sets, prepared):
+    latencies = []
+    sql = _plain(name)
+    for params in param_sets:
+        start = time.perf_counter()
+        if prepared:
+            run(name, params, fetch='all', conn=conn)
+        else:
+            with conn.cursor() as cur:
+                cur.execute(sql, params)
+                cur.fetchall()
+        latencies.append(time.perf_counter() - start)
+        conn.rollback()
+    latencies.sort()
+    return {
+        'mean': sum(latencies) / len(latencies),
+        'p50': latencies[len(latencies) // 2],
+        'p99': latencies[min(int(len(latencies) * 0.99), len(latencies) - 1)],
+    }
+
+
+def main():
+    dsn = sys.argv[1] if len(sys.argv) > 1 else os.getenv('DATABASE_URL')
+    iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    if not dsn:
+        sys.exit("Pass a DSN or set DATABASE_URL")
+
+    conn = psycopg2.connect(dsn, connection_factory=PreparedConnection)
+    try:
+        with conn.cursor() as cur:
+            cur.execute(TABLES)
+        conn.commit()
+        user_ids, session_ids = seed(conn)
+        now = datetime.datetime.now()
+        workloads = {
+            'get_sessions': [(user_ids[i % len(user_ids)], 50) for i in range(iterations)],
+            'get_messages_newest': [(session_ids[i % len(session_ids)], 21) for i in range(iterations)],
+            'get_messages_before': [(session_ids[i % len(session_ids)], now, str(uuid.uuid4()), 21) for i in range(iterations)],
+            'get_session_summary': [(session_ids[i % len(session_ids)],) for i in range(iterations)],
+            'get_user_by_email': [(f"user{i % len(user_ids)}@example.com",) for i in range(iterations)],
+        }
+
+        print(f"{iterations} iterations per statement")
+        print(f"{'statement':<22} {'plain p50':>10} {'prepared p50':>13} {'plain p99':>10} {'prepared p99':>13} {'mean gain':>10}")
+        for name, param_sets in workloads.items():
+            # Warm both paths (prepares the statement) before timing
+            time_queries(conn, name, param_sets[:20], prepared=False)
+            time_queries(conn, name, param_sets[:20], prepared=True)
+            plain = time_queries(conn, name, param_sets, prepared=False)
+            prepared = time_queries(conn, name, param_sets, prepared=True)
+            gain = (plain['mean'] - prepared['mean']) / plain['mean'] * 100
+            print(f"{name:<22} {plain['p50'] * 1e6:>8.0f}us {prepared['p50'] * 1e6:>11.0f}us "
+                  f"{plain['p99'] * 1e6:>8.0f}us {prepared['p99'] * 1e6:>11.0f}us {gain:>9.1f}%")
+    finally:
+        conn.rollback()
+        with conn.cursor() as cur:
+            cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        conn.commit()
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
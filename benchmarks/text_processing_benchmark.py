@@ -0,0 +1,93 @@
+"""
+Micro-benchmark for the markdown-to-speech cleaner.
+
+Compares the original clean_markdown_for_tts (parser built per call and
+sequential str.replace passes) with the current one, and streaming use:
+re-cleaning the accumulated text on every delta versus StreamingTTSCleaner.
+
+Usage:
+    python benchmarks/text_processing_benchmark.py [iterations]
+"""
+import os
+import re
+import sys
+import timeit
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from markdown_it import MarkdownIt
+from mdit_plain.renderer import RendererPlain
+from monolithic.utils.text_processing import clean_markdown_for_tts, StreamingTTSCleaner
+
+SAMPLE = """## Getting started
+
+Install the package with `pip install audible-ai` and set `LLM_API_KEY=...` in your environment, e.g. in a `.env` file.
+Then open [the dashboard](https://example.com/dashboard) and pick a voice (i.e. a Wavenet or Chirp voice), etc.
+
+```python
+client = Client(api_key="secret")
+print(client.ask("What is 2 > 1?"))
+```
+
+- Responses stream as they are generated.
+- Audio starts after the first sentence, not the whole answer.
+
+That's all you need to know for now!
+"""
+
+
+def legacy_clean_markdown_for_tts(markdown_text):
+    parser = MarkdownIt(renderer_cls=RendererPlain)
+    text = parser.render(markdown_text)
+    text = re.sub(r'\s+([.,!?])', r'\1', text)
+    replacements = {
+        '/': ' slash ', '\\': ' backslash ', '=': ' equals ', '>': ' greater than ',
+        '<': ' less than ', '{}': ' curly braces ', '()': ' parentheses ',
+        '[]': ' square brackets ', 'e.g.': 'for example', 'i.e.': 'that is', 'etc.': 'etcetera'
+    }
+    for old, new in replacements.items():
+        text = text.replace(old, new)
+    text = ' '.join(text.split())
+    return text.strip()
+
+
+def deltas(text, size=20):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+def naive_streaming(text):
+    accumulated = ''
+    for delta in deltas(text):
+        accumulated += delta
+        legacy_clean_markdown_for_tts(accumulated)
+
+
+def incremental_streaming(text):
+    cleaner = StreamingTTSCleaner()
+    for delta in deltas(text):
+        cleaner.feed(delta)
+    cleaner.flush()
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    document = SAMPLE * 4
+    assert clean_markdown_for_tts(document) == legacy_clean_markdown_for_tts(document)
+
+    cases = [
+        ('whole document, legacy', lambda: legacy_clean_markdown_for_tts(document)),
+        ('whole document, current', lambda: clean_markdown_for_tts(document)),
+        ('short reply, legacy', lambda: legacy_clean_markdown_for_tts('Sure, here it is.')),
+        ('short reply, current', lambda: clean_markdown_for_tts('Sure, here it is.')),
+        ('streaming, re-clean per delta', lambda: naive_streaming(document)),
+        ('streaming, incremental', lambda: incremental_streaming(document)),
+    ]
+    print(f"{len(document)} character document, {iterations} iterations")
+    for name, func in cases:
+        runs = iterations if 'streaming' not in name else max(iterations // 50, 1)
+        per_call = timeit.timeit(func, number=runs) / runs
+        print(f"{name:<32} {per_call * 1e6:>12.1f} us")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""
+Compares base64 and binary tts:audio transports.
+
+Encodes the tts:audio events for one synthesized response exactly as
+python-socketio would put them on a WebSocket and reports bytes on the wire
+and CPU time per response for each transport.
+
+Usage:
+    python benchmarks/tts_transport_benchmark.py [audio_kb] [iterations]
+"""
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from socketio import packet
+from monolithic.socket.utils import emit_audio_chunks
+
+
+class _WireCounter:
+    """
+    Stand-in for the SocketIO server that encodes each emit into Socket.IO
+    packets and counts the bytes of the resulting WebSocket messages.
+    """
+
+    def __init__(self):
+        self.bytes = 0
+        self.messages = 0
+
+    def emit(self, event, data, room=None):
+        pkt = packet.Packet(packet.EVENT, data=[event, data])
+        encoded = pkt.encode()
+        if not isinstance(encoded, list):
+            encoded = [encoded]
+        for part in encoded:
+            # Engine.IO prefixes text messages with the "4" (message) packet type
+            self.bytes += len(part) if isinstance(part, bytes) else len(part.encode('utf-8')) + 1
+            self.messages += 1
+
+
+def run(transport, audio, iterations):
+    counter = _WireCounter()
+    start = time.process_time()
+    for _ in range(iterations):
+        emit_audio_chunks(counter, 'user', 'message', audio, ((transport, 'MP3', None),))
+    cpu = (time.process_time() - start) / iterations
+    return counter.bytes // iterations, counter.messages // iterations, cpu
+
+
+def main():
+    audio_kb = int(sys.argv[1]) if len(sys.argv) > 1 else 256
+    iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    audio = os.urandom(audio_kb * 1024)
+
+    print(f"audio payload: {len(audio)} bytes, {iterations} iterations")
+    print(f"{'transport':<10} {'wire bytes':>12} {'overhead':>9} {'messages':>9} {'cpu/response':>14}")
+    for transport in ('base64', 'binary'):
+        wire_bytes, messages, cpu = run(transport, audio, iterations)
+        overhead = (wire_bytes - len(audio)) / len(audio) * 100
+        print(f"{transport:<10} {wire_bytes:>12} {overhead:>8.1f}% {messages:>9} {cpu * 1000:>11.3f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,205 @@
+import os
+import time
+import random
+import threading
+import email.utils
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+import logging
+from logging_config import app_logger, error_logger
+
+RETRYABLE_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+class CircuitOpenError(Exception):
+    """Raised without contacting the upstream while its circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+
+    After failure_threshold failed attempts the circuit opens and calls fail
+    fast for reset_timeout seconds; then a single trial call is let through
+    (half-open) and its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = 'closed'
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == 'closed':
+                return True
+            if self.state == 'open' and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self.state = 'half_open'
+                self._trial_in_flight = False
+            if self.state == 'half_open' and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = 'closed'
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def release(self):
+        """
+        Ends a call that was interrupted without an outcome (e.g. its greenlet was
+        killed or hit a deadline), so a half-open circuit lets the next trial through.
+        """
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == 'half_open' or self._failures >= self.failure_threshold:
+                if self.state != 'open':
+                    app_logger.warning(f"Circuit breaker opened after {self._failures} consecutive failures")
+                self.state = 'open'
+                self._opened_at = time.monotonic()
+                self._trial_in_flight = False
+
+
+def _retry_after_seconds(response):
+    """
+    Parses a Retry-After header given either as delta-seconds or an HTTP date.
+    """
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(email.utils.parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class UpstreamClient:
+    """
+    Keep-alive HTTP client for one upstream host with timeouts, jittered
+    exponential retries on 429/5xx/connection errors and a circuit breaker.
+    """
+
+    def __init__(self, host, pool_maxsize=50, connect_timeout=3.05, read_timeout=60.0,
+                 max_retries=2, backoff_base=0.25, backoff_max=8.0,
+                 failure_threshold=5, reset_timeout=30.0):
+        self.host = host
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_maxsize, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.stats = {'requests': 0, 'retries': 0, 'failures': 0, 'short_circuited': 0}
+
+    def _backoff(self, attempt, response=None):
+        retry_after = _retry_after_seconds(response) if response is not None else None
+        if retry_after is not None:
+            return min(retry_after, self.backoff_max)
+        # Full jitter: uniform between 0 and the exponential cap
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def request(self, method, url, **kwargs):
+        """
+        Sends a request, retrying retryable failures. For stream=True, retries only
+        cover the period before response headers arrive. Returns the final response;
+        callers still call raise_for_status().
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        attempt = 0
+        while True:
+            if not self.breaker.allow():
+                self.stats['short_circuited'] += 1
+                raise CircuitOpenError(f"Upstream {self.host} is unavailable (circuit open)")
+            self.stats['requests'] += 1
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                self.breaker.record_failure()
+                self.stats['failures'] += 1
+                if attempt >= self.max_retries:
+                    raise
+                delay = self._backoff(attempt)
+                app_logger.warning(f"Upstream {self.host} request failed ({e.__class__.__name__}), retrying in {delay:.2f}s")
+            except requests.RequestException:
+                # Not retryable (e.g. ChunkedEncodingError), but still a failed call
+                self.breaker.record_failure()
+                self.stats['failures'] += 1
+                raise
+            except BaseException:
+                # GreenletExit from tts:stop or an eventlet.Timeout deadline says nothing about the upstream
+                self.breaker.release()
+                raise
+            else:
+                if response.status_code not in RETRYABLE_STATUSES:
+                    self.breaker.record_success()
+                    return response
+                self.breaker.record_failure()
+                self.stats['failures'] += 1
+                if attempt >= self.max_retries:
+                    return response
+                delay = self._backoff(attempt, response)
+                response.close()
+                app_logger.warning(f"Upstream {self.host} returned {response.status_code}, retrying in {delay:.2f}s")
+            attempt += 1
+            self.stats['retries'] += 1
+            time.sleep(delay)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_upstream_client(url):
+    """
+    Returns the shared client for the URL's host, configured from UPSTREAM_* environment variables.
+    """
+    host = urlsplit(url).netloc
+    with _clients_lock:
+        client = _clients.get(host)
+        if client is None:
+            client = _clients[host] = UpstreamClient(
+                host,
+                pool_maxsize=int(os.getenv('UPSTREAM_POOL_MAXSIZE', 50)),
+                connect_timeout=float(os.getenv('UPSTREAM_CONNECT_TIMEOUT', 3.05)),
+                read_timeout=float(os.getenv('UPSTREAM_READ_TIMEOUT', 60)),
+                max_retries=int(os.getenv('UPSTREAM_MAX_RETRIES', 2)),
+                backoff_base=float(os.getenv('UPSTREAM_BACKOFF_BASE', 0.25)),
+                backoff_max=float(os.getenv('UPSTREAM_BACKOFF_MAX', 8)),
+                failure_threshold=int(os.getenv('UPSTREAM_BREAKER_THRESHOLD', 5)),
+                reset_timeout=float(os.getenv('UPSTREAM_BREAKER_RESET', 30)),
+            )
+            app_logger.info(f"Upstream client created for {host}")
+    return client
+
+
+def upstream_post(url, **kwargs):
+    """
+    POST through the shared keep-alive client for the URL's host.
+    """
+    return get_upstream_client(url).post(url, **kwargs)
+
+
+def get_upstream_stats():
+    with _clients_lock:
+        return {host: dict(client.stats, circuit=client.breaker.state) for host, client in _clients.items()}
@@ -1,44 +1,167 @@
-
 import os
-import requests
+import json
+import time
 import logging
 from logging_config import app_logger, error_logger
+from components.http.upstream_client import upstream_post
+from components.llm_models.response_cache import get_llm_cache, llm_cache_key
+from components.metrics.metrics import GEMINI_REQUEST_SECONDS, GEMINI_FIRST_TOKEN_SECONDS
+
+GEMINI_MODEL = 'gemini-2.5-flash'
+
+_latency = {
+    (method, outcome): GEMINI_REQUEST_SECONDS.labels(method, outcome)
+    for method in ('generate', 'stream') for outcome in ('ok', 'error', 'cache')
+}
+
 
+class GeminiError(Exception):
+    """Raised when the Gemini API call fails, so error text is never mistaken for a reply."""
 
-def get_gemini_response(user_message):
+
+def _gemini_endpoint(method):
     """
-    Sends a chat message to Gemini 2.5 Flash API and returns the AI response text.
+    Builds the Gemini REST endpoint for the given method. GEMINI_API_BASE can point at a local fake server.
+    """
+    base = os.getenv('GEMINI_API_BASE', 'https://generativelanguage.googleapis.com/v1beta').rstrip('/')
+    return f"{base}/models/{GEMINI_MODEL}:{method}"
+
+
+def _gemini_request(user_message, context=None):
+    """
+    Builds headers and payload. context: Optional dict from the context builder with
+    prior "contents" turns and a "system_instruction" (rolling conversation summary).
     """
-    api_key = os.getenv('LLM_API_KEY')
-    endpoint = 'https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-flash:generateContent'
     headers = {
         'Content-Type': 'application/json',
-        'x-goog-api-key': api_key
+        'x-goog-api-key': os.getenv('LLM_API_KEY')
     }
+    context = context or {}
     payload = {
-        "contents": [
+        "contents": list(context.get('contents', [])) + [
             {"role": "user", "parts": [{"text": user_message}]}
         ]
     }
+    if context.get('system_instruction'):
+        payload["systemInstruction"] = {"parts": [{"text": context['system_instruction']}]}
+    return headers, payload
+
+
+def _extract_text(data):
+    parts = data.get('candidates', [{}])[0].get('content', {}).get('parts', [])
+    return ''.join(part.get('text', '') for part in parts)
+
+
+def _cache_for(payload, use_cache):
+    """
+    Returns (cache, key) for the request, or (None, None) when caching is off or opted out.
+    """
+    cache = get_llm_cache()
+    if cache is None:
+        return None, None
+    if not use_cache:
+        cache.record_bypass()
+        return None, None
+    return cache, llm_cache_key(GEMINI_MODEL, payload)
+
+
+def get_gemini_response(user_message, context=None, use_cache=True):
+    """
+    Sends a chat message to Gemini 2.5 Flash API and returns the AI response text.
+    use_cache: Set False to skip the response cache for this call.
+    Raises GeminiError if the request fails.
+    """
+    started = time.perf_counter()
+    headers, payload = _gemini_request(user_message, context)
+    cache, key = _cache_for(payload, use_cache)
+    if cache is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            app_logger.info("Gemini API response served from cache")
+            _latency['generate', 'cache'].observe(time.perf_counter() - started)
+            return ''.join(cached)
     try:
-        app_logger.info(f"Gemini API user message recieved")
-        response = requests.post(endpoint, json=payload, headers=headers)
+        app_logger.info("Gemini API user message recieved")
+        response = upstream_post(_gemini_endpoint('generateContent'), json=payload, headers=headers)
         response.raise_for_status()
         data = response.json()
-        ai_text = data.get('candidates', [{}])[0].get('content', {}).get('parts', [{}])[0].get('text', '')
-        app_logger.info(f"Gemini API response generated")
+        ai_text = _extract_text(data)
+        app_logger.info("Gemini API response generated")
+        if cache is not None and ai_text:
+            cache.put(key, [ai_text])
+        _latency['generate', 'ok'].observe(time.perf_counter() - started)
         return ai_text
     except Exception as e:
+        _latency['generate', 'error'].observe(time.perf_counter() - started)
         error_logger.error(f"Gemini API Error: {e}", exc_info=True)
-        return f"[Gemini API Error]: {str(e)}"
+        raise GeminiError(str(e)) from e
+
+
+def iter_sse_events(lines):
+    """
+    Incrementally parses a Server-Sent Events stream, yielding the data of each event.
+    `lines` is an iterable of decoded lines without line terminators.
+    """
+    data_lines = []
+    for line in lines:
+        if line == '':
+            if data_lines:
+                yield '\n'.join(data_lines)
+                data_lines = []
+            continue
+        if line.startswith(':'):
+            continue
+        field, _, value = line.partition(':')
+        if value.startswith(' '):
+            value = value[1:]
+        if field == 'data':
+            data_lines.append(value)
+    if data_lines:
+        yield '\n'.join(data_lines)
+
 
-def get_gemini_response_stream(user_message, chunk_size=20):
+def get_gemini_response_stream(user_message, context=None, use_cache=True):
     """
-    Simulates streaming Gemini response by yielding chunks of text.
+    Streams the Gemini response via streamGenerateContent (SSE), yielding text deltas as they arrive.
+    A cached response is replayed as its original deltas, so callers see the same chunk sequence.
+    use_cache: Set False to skip the response cache for this call.
+    Raises GeminiError if the request fails, possibly after some deltas were yielded.
     """
+    started = time.perf_counter()
+    headers, payload = _gemini_request(user_message, context)
+    cache, key = _cache_for(payload, use_cache)
+    if cache is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            app_logger.info("Gemini stream served from cache")
+            _latency['stream', 'cache'].observe(time.perf_counter() - started)
+            yield from cached
+            return
     try:
-        full_text = get_gemini_response(user_message)
-        for i in range(0, len(full_text), chunk_size):
-            yield full_text[i:i+chunk_size]
+        app_logger.info("Gemini stream user message recieved")
+        deltas = []
+        with upstream_post(_gemini_endpoint('streamGenerateContent'), params={'alt': 'sse'},
+                           json=payload, headers=headers, stream=True) as response:
+            response.raise_for_status()
+            response.encoding = 'utf-8'
+            lines = response.iter_lines(chunk_size=None, decode_unicode=True)
+            for event_data in iter_sse_events(lines):
+                data = json.loads(event_data)
+                if 'error' in data:
+                    # Gemini reports failures after the 200 headers as an error event
+                    raise GeminiError(data['error'].get('message') or str(data['error']))
+                delta = _extract_text(data)
+                if delta:
+                    if not deltas:
+                        GEMINI_FIRST_TOKEN_SECONDS.observe(time.perf_counter() - started)
+                    deltas.append(delta)
+                    yield delta
+        app_logger.info("Gemini stream completed")
+        # Only complete responses are cached; an abandoned stream never reaches this point
+        if cache is not None and deltas:
+            cache.put(key, deltas)
+        _latency['stream', 'ok'].observe(time.perf_counter() - started)
     except Exception as e:
+        _latency['stream', 'error'].observe(time.perf_counter() - started)
         error_logger.error(f"Gemini stream error: {e}", exc_info=True)
+        raise GeminiError(str(e)) from e
@@ -0,0 +1,124 @@
+import os
+import re
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+import logging
+from logging_config import app_logger, error_logger
+
+_WHITESPACE = re.compile(r'\s+')
+_TRAILING_PUNCT = re.compile(r'[\s?!.]+$')
+
+
+def normalize_prompt(text):
+    """
+    Canonical form of a user prompt for exact-match caching: case-folded,
+    whitespace collapsed and trailing ?/!/. removed.
+    """
+    text = _WHITESPACE.sub(' ', text.strip()).casefold()
+    return _TRAILING_PUNCT.sub('', text)
+
+
+def llm_cache_key(model, payload):
+    """
+    Key for a Gemini request: the model plus the whole payload (history, system
+    instruction, generation config) with the final user turn normalized.
+    """
+    contents = payload.get('contents', [])
+    last = contents[-1] if contents else {}
+    prompt = ' '.join(part.get('text', '') for part in last.get('parts', []))
+    raw = json.dumps({
+        'model': model,
+        'prompt': normalize_prompt(prompt),
+        'history': contents[:-1],
+        'rest': {k: v for k, v in payload.items() if k != 'contents'},
+    }, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class LLMResponseCache:
+    """
+    Exact-match cache of LLM responses, stored as the list of streamed chunks
+    so a hit can be replayed through the same chunk path as a live response.
+    Entries expire after ttl seconds; the least recently used are evicted once
+    the cached text exceeds max_bytes.
+    """
+
+    def __init__(self, max_bytes=16 * 1024 * 1024, ttl=3600.0):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (chunks, size, expires_at)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'expired': 0, 'stores': 0, 'evictions': 0, 'bypassed': 0}
+
+    def get(self, key):
+        """
+        Returns the cached chunks for key, or None.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+            chunks, size, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self._bytes -= size
+                self._stats['expired'] += 1
+                self._stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+            return list(chunks)
+
+    def put(self, key, chunks):
+        chunks = tuple(chunks)
+        size = sum(len(chunk.encode('utf-8')) for chunk in chunks)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[1]
+            self._entries[key] = (chunks, size, time.monotonic() + self.ttl)
+            self._bytes += size
+            self._stats['stores'] += 1
+            while self._bytes > self.max_bytes:
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self._stats['evictions'] += 1
+
+    def record_bypass(self):
+        self._stats['bypassed'] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats, entries=len(self._entries), bytes=self._bytes, max_bytes=self.max_bytes)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        return stats
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_llm_cache():
+    """
+    Shared response cache, or None unless LLM_CACHE_ENABLED is set.
+    Sized by LLM_CACHE_MAX_BYTES with entries living LLM_CACHE_TTL seconds.
+    """
+    global _cache
+    if os.getenv('LLM_CACHE_ENABLED', 'false').lower() not in ('1', 'true', 'yes'):
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = LLMResponseCache(
+                max_bytes=int(os.getenv('LLM_CACHE_MAX_BYTES', 16 * 1024 * 1024)),
+                ttl=float(os.getenv('LLM_CACHE_TTL', 3600)),
+            )
+            app_logger.info("LLM response cache enabled")
+    return _cache
@@ -0,0 +1,230 @@
+import time
+import bisect
+import functools
+import threading
+import logging
+from logging_config import app_logger, error_logger
+
+# Seconds; covers fast DB lookups through slow LLM responses
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# Bytes; socket frames through full audio clips
+SIZE_BUCKETS = (64, 256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+# Estimated prompt tokens; short chats through a full context budget
+TOKEN_BUCKETS = (128, 256, 512, 1024, 2048, 4096, 8192, 16384, 32768, 65536)
+
+_registry = []
+_registry_lock = threading.Lock()
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    """
+    Base of Counter, Gauge and Histogram: a family of children, one per label
+    combination, each an instance of `child_class`.
+
+    A callback computes the values at scrape time instead, returning a number
+    (unlabelled) or a {label values tuple: number} dict; use it to export
+    counts a component already keeps in its own stats().
+    """
+    kind = None
+    child_class = None
+
+    def __init__(self, name, documentation, labelnames=(), callback=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.callback = callback
+        self._children = {}
+        self._lock = threading.Lock()
+        with _registry_lock:
+            _registry.append(self)
+
+    def labels(self, *values, **kwargs):
+        """
+        Returns the child for a label combination; keep the result on hot paths to skip the lookup.
+        """
+        if kwargs:
+            values = tuple(kwargs[name] for name in self.labelnames)
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _new_child(self):
+        return self.child_class()
+
+    def _unlabelled(self):
+        return self.labels()
+
+    def _run_callback(self):
+        try:
+            values = self.callback()
+            if not isinstance(values, dict):
+                values = {(): values}
+            for key, value in values.items():
+                self.labels(*(key if isinstance(key, tuple) else (key,))).value = value
+        except Exception as e:
+            error_logger.error(f"Metric {self.name} callback error: {e}", exc_info=True)
+
+    def collect(self):
+        if self.callback is not None:
+            self._run_callback()
+        name = self.name + '_total' if self.kind == 'counter' else self.name
+        lines = [f"# HELP {name} {self.documentation}", f"# TYPE {name} {self.kind}"]
+        for key, child in list(self._children.items()):
+            lines.extend(child.samples(self.name, self.labelnames, key))
+        return lines
+
+
+class _CounterChild:
+    __slots__ = ('value',)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def samples(self, name, labelnames, key):
+        return [f"{name}_total{_format_labels(labelnames, key)} {_format_value(self.value)}"]
+
+
+class Counter(_Metric):
+    kind = 'counter'
+    child_class = _CounterChild
+
+    def inc(self, amount=1):
+        self._unlabelled().inc(amount)
+
+
+class _GaugeChild:
+    __slots__ = ('value',)
+
+    def __init__(self):
+        self.value = 0
+
+    def set(self, value):
+        self.value = value
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def dec(self, amount=1):
+        self.value -= amount
+
+    def samples(self, name, labelnames, key):
+        return [f"{name}{_format_labels(labelnames, key)} {_format_value(self.value)}"]
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+    child_class = _GaugeChild
+
+    def set(self, value):
+        self._unlabelled().set(value)
+
+
+class _HistogramChild:
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        # One bisect and three additions; cumulative counts are built at scrape time
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self, name, labelnames, key):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            cumulative += count
+            lines.append(f"{name}_bucket{_format_labels(labelnames, key, ('le', _format_value(float(bound))))} {cumulative}")
+        labels = _format_labels(labelnames, key)
+        lines.append(f"{name}_sum{labels} {_format_value(self.sum)}")
+        lines.append(f"{name}_count{labels} {self.count}")
+        return lines
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+    child_class = _HistogramChild
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return self.child_class(self.buckets)
+
+    def observe(self, value):
+        self._unlabelled().observe(value)
+
+
+def timed(histogram, **labels):
+    """
+    Decorator observing the wrapped function's duration. The label `function`
+    defaults to the function's name.
+    """
+    def decorator(func):
+        child = histogram.labels(**dict({'function': func.__name__}, **labels)) \
+            if 'function' in histogram.labelnames else histogram.labels(**labels)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                child.observe(time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+
+def render_metrics():
+    """
+    All registered metrics in the Prometheus text exposition format (0.0.4).
+    """
+    with _registry_lock:
+        metrics = list(_registry)
+    lines = []
+    for metric in metrics:
+        lines.extend(metric.collect())
+    return '\n'.join(lines) + '\n'
+
+
+# Shared metric catalogue
+DB_QUERY_SECONDS = Histogram('db_query_seconds', 'Database query function latency', ('function',))
+GEMINI_REQUEST_SECONDS = Histogram('gemini_request_seconds', 'Gemini request latency until the full response', ('method', 'outcome'))
+GEMINI_FIRST_TOKEN_SECONDS = Histogram('gemini_first_token_seconds', 'Time from sending a streaming Gemini request to the first text delta')
+TTS_SYNTHESIS_SECONDS = Histogram('tts_synthesis_seconds', 'Google TTS synthesis request latency', ('outcome',))
+TTS_AUDIO_BYTES = Histogram('tts_audio_bytes', 'Size of synthesized TTS audio clips', ('encoding',), buckets=SIZE_BUCKETS)
+SOCKET_EMITS = Counter('socketio_emits', 'Socket.IO events emitted', ('event',))
+SOCKET_EMIT_BYTES = Histogram('socketio_emit_bytes', 'Approximate payload size of emitted Socket.IO events', ('event',), buckets=SIZE_BUCKETS)
+HTTP_REQUEST_SECONDS = Histogram('http_request_seconds', 'REST request latency', ('endpoint', 'method', 'status'))
+PASSWORD_HASH_WAIT_SECONDS = Histogram('password_hash_wait_seconds', 'Time password hashing requests waited for a worker', ('operation',))
+PASSWORD_HASH_SECONDS = Histogram('password_hash_seconds', 'Password hash and verify time on the worker pool', ('operation',))
+PIPELINE_STAGE_SECONDS = Histogram('pipeline_stage_seconds', 'user:message pipeline stage times (durations, or offsets since the message arrived)', ('stage',))
+CONTEXT_PROMPT_TOKENS = Histogram('context_prompt_tokens', 'Estimated tokens in each prompt sent to the LLM', buckets=TOKEN_BUCKETS)
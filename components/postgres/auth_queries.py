@@ -1,50 +1,64 @@
-from components.postgres.postgres_conn_utils import get_db
+from psycopg2.extras import execute_values
+from components.postgres.repository import run
+from components.metrics.metrics import timed, DB_QUERY_SECONDS
 import logging
 from logging_config import app_logger, error_logger
 
+@timed(DB_QUERY_SECONDS)
 def get_user_by_email_db(email):
     try:
-        db = get_db()
-        cur = db.cursor()
-        app_logger.info(f"DB Query: Fetching user by email: {email}")
-        cur.execute("SELECT id, password_hash FROM users WHERE email=%s", (email,))
-        return cur.fetchone()
+        app_logger.info("DB Query: Fetching user by email: %s", email)
+        return run('get_user_by_email', (email,), fetch='one')
     except Exception as e:
         error_logger.error(f"get_user_by_email_db error: {e}", exc_info=True)
         return None
 
-def user_exists_db(email):
+@timed(DB_QUERY_SECONDS)
+def register_user_db(email, password_hash):
+    """
+    Creates the user and stamps the first login in one statement.
+    Returns the new user ID, or None if the email (compared case-insensitively) is taken.
+    Errors are logged and re-raised.
+    """
     try:
-        db = get_db()
-        cur = db.cursor()
-        app_logger.info(f"DB Query: Checking if user exists with email: {email}")
-        cur.execute("SELECT id FROM users WHERE email=%s", (email,))
-        return cur.fetchone() is not None
+        app_logger.info("DB Query: Registering user with email: %s", email)
+        row = run('register_user', (email, password_hash), fetch='one', commit=True)
+        if row is None:
+            app_logger.info("DB Query: Email already registered: %s", email)
+            return None
+        app_logger.info("DB Query: Successfully created user with ID: %s", row[0])
+        return row[0]
     except Exception as e:
-        error_logger.error(f"user_exists_db error: {e}", exc_info=True)
-        return False
+        error_logger.error(f"register_user_db error: {e}", exc_info=True)
+        raise
 
-def create_user_db(email, password_hash):
+@timed(DB_QUERY_SECONDS)
+def update_last_logins_db(conn, logins):
+    """
+    Writes a batch of (user_id, login time) pairs on conn in one UPDATE, never moving a time backwards.
+    Rolls back and re-raises on failure.
+    """
     try:
-        db = get_db()
-        cur = db.cursor()
-        app_logger.info(f"DB Query: Creating new user with email: {email}")
-        cur.execute("INSERT INTO users (email, password_hash) VALUES (%s, %s) RETURNING id", (email, password_hash))
-        user_id = cur.fetchone()[0]
-        db.commit()
-        app_logger.info(f"DB Query: Successfully created user with ID: {user_id}")
-        return user_id
-    except Exception as e:
-        error_logger.error(f"create_user_db error: {e}", exc_info=True)
-        return None
+        with conn.cursor() as cur:
+            app_logger.info("DB Query: Updating last login for %s users", len(logins))
+            execute_values(
+                cur,
+                "UPDATE users SET last_login_at = GREATEST(users.last_login_at, v.at) "
+                "FROM (VALUES %s) AS v (id, at) WHERE users.id = v.id::uuid",
+                logins,
+                template="(%s, %s::timestamp)",
+                page_size=max(len(logins), 1)
+            )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
 
-def update_last_login_db(user_id):
+@timed(DB_QUERY_SECONDS)
+def update_password_hash_db(user_id, password_hash):
     try:
-        db = get_db()
-        cur = db.cursor()
-        app_logger.info(f"DB Query: Updating last login timestamp for user ID: {user_id}")
-        cur.execute("UPDATE users SET last_login_at=NOW() WHERE id=%s", (user_id,))
-        db.commit()
-        app_logger.info(f"DB Query: Successfully updated last login for user ID: {user_id}")
+        app_logger.info("DB Query: Updating password hash for user ID: %s", user_id)
+        return run('update_password_hash', (password_hash, user_id), commit=True) > 0
     except Exception as e:
-        error_logger.error(f"update_last_login_db error: {e}", exc_info=True)
+        error_logger.error(f"update_password_hash_db error: {e}", exc_info=True)
+        return False
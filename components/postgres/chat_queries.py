@@ -1,102 +1,211 @@
-from components.postgres.postgres_conn_utils import get_db
 import uuid
+from psycopg2.extras import execute_values
+from components.metrics.metrics import timed, DB_QUERY_SECONDS
+from components.postgres.session_cache import get_session_cache
+from components.postgres.repository import run, prepared_sql
 import logging
 from logging_config import app_logger, error_logger
 
-def get_sessions_db(user_id):
+def _update_session_cache(change, user_id, *args):
+    """
+    Applies a committed change to the session-list cache; a cache failure never fails the write.
+    """
     try:
-        db = get_db()
-        cur = db.cursor()
-        app_logger.info(f"DB Query: Fetching chat sessions for user ID: {user_id}")
-        cur.execute("SELECT id, title FROM chatsessions WHERE user_id=%s", (user_id,))
-        sessions = [{'id': r[0], 'title': r[1]} for r in cur.fetchall()]
-        app_logger.info(f"DB Query: Found {len(sessions)} chat sessions")
+        cache = get_session_cache()
+        if cache is not None:
+            getattr(cache, change)(user_id, *args)
+    except Exception as e:
+        error_logger.error(f"Session cache {change} error: {e}", exc_info=True)
+
+@timed(DB_QUERY_SECONDS)
+def get_sessions_db(user_id, limit=None):
+    """
+    Returns the user's sessions, most recently active first, optionally at most limit.
+    Returns None on error so callers do not cache an empty list.
+    """
+    try:
+        app_logger.info("DB Query: Fetching chat sessions for user ID: %s", user_id)
+        # LIMIT NULL means no limit
+        rows = run('get_sessions', (user_id, limit), fetch='all')
+        sessions = [{'id': str(r[0]), 'title': r[1]} for r in rows]
+        app_logger.info("DB Query: Found %s chat sessions", len(sessions))
         return sessions
     except Exception as e:
         error_logger.error(f"get_sessions_db error: {e}", exc_info=True)
-        return []
+        return None
 
+@timed(DB_QUERY_SECONDS)
 def create_session_db(user_id, title):
     try:
-        db = get_db()
-        cur = db.cursor()
         session_id = str(uuid.uuid4())
-        app_logger.info(f"DB Query: Creating new chat session for user ID: {user_id}, title: {title}")
-        cur.execute("INSERT INTO chatsessions (id, user_id, title) VALUES (%s, %s, %s)", (session_id, user_id, title))
-        db.commit()
-        app_logger.info(f"DB Query: Successfully created chat session with ID: {session_id}")
+        app_logger.info("DB Query: Creating new chat session for user ID: %s, title: %s", user_id, title)
+        run('create_session', (session_id, user_id, title), commit=True)
+        _update_session_cache('session_created', user_id, session_id, title)
+        app_logger.info("DB Query: Successfully created chat session with ID: %s", session_id)
         return session_id
     except Exception as e:
         error_logger.error(f"create_session_db error: {e}", exc_info=True)
         return None
 
+@timed(DB_QUERY_SECONDS)
 def get_messages_db(session_id):
     try:
-        db = get_db()
-        cur = db.cursor()
-        app_logger.info(f"DB Query: Fetching messages for session ID: {session_id}")
-        cur.execute("SELECT id, sender, text, created_at FROM messages WHERE session_id=%s ORDER BY created_at ASC", (session_id,))
-        messages = [{'id': r[0], 'sender': r[1], 'text': r[2], 'created_at': r[3]} for r in cur.fetchall()]
-        app_logger.info(f"DB Query: Found {len(messages)} messages in session")
+        app_logger.info("DB Query: Fetching messages for session ID: %s", session_id)
+        rows = run('get_messages', (session_id,), fetch='all')
+        messages = [{'id': r[0], 'sender': r[1], 'text': r[2], 'created_at': r[3]} for r in rows]
+        app_logger.info("DB Query: Found %s messages in session", len(messages))
         return messages
     except Exception as e:
         error_logger.error(f"get_messages_db error: {e}", exc_info=True)
         return []
 
-def add_user_message_db(session_id, text):
+@timed(DB_QUERY_SECONDS)
+def get_messages_page_db(session_id, limit, before=None, after=None):
+    """
+    Keyset page of a session's messages in chronological order.
+    before/after are (created_at, id) cursors; with neither, the newest page is returned.
+    Returns (messages, has_more) where has_more means older (or, for after, newer) messages exist.
+    """
     try:
-        db = get_db()
-        cur = db.cursor()
-        msg_id = str(uuid.uuid4())
-        app_logger.info(f"DB Query: Adding user message in session ID: {session_id}")
-        cur.execute("INSERT INTO messages (id, session_id, sender, text) VALUES (%s, %s, %s, %s)", (msg_id, session_id, 'USER', text))
-        db.commit()
-        app_logger.info(f"DB Query: Successfully added user message with ID: {msg_id}")
-        return msg_id
+        app_logger.info("DB Query: Fetching message page for session ID: %s", session_id)
+        if after is not None:
+            rows = run('get_messages_after', (session_id, after[0], after[1], limit + 1), fetch='all')
+        elif before is not None:
+            rows = run('get_messages_before', (session_id, before[0], before[1], limit + 1), fetch='all')
+        else:
+            rows = run('get_messages_newest', (session_id, limit + 1), fetch='all')
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        if after is None:
+            rows.reverse()
+        messages = [{'id': r[0], 'sender': r[1], 'text': r[2], 'created_at': r[3]} for r in rows]
+        app_logger.info("DB Query: Found %s messages in page", len(messages))
+        return messages, has_more
     except Exception as e:
-        error_logger.error(f"add_user_message_db error: {e}", exc_info=True)
-        return None
+        error_logger.error(f"get_messages_page_db error: {e}", exc_info=True)
+        return [], False
 
-def add_ai_message_db(session_id, ai_text):
+@timed(DB_QUERY_SECONDS)
+def get_messages_since_db(session_id, since, limit, conn=None):
+    """
+    Oldest messages after the (created_at, id) cursor since, or from the start of
+    the session when since is None, in chronological order. Returns (messages, has_more),
+    or (None, False) on error so callers never skip the turns they could not read.
+    """
     try:
-        db = get_db()
-        cur = db.cursor()
-        ai_msg_id = str(uuid.uuid4())
-        app_logger.info(f"DB Query: Adding AI message in session ID: {session_id}")
-        cur.execute("INSERT INTO messages (id, session_id, sender, text) VALUES (%s, %s, %s, %s)", (ai_msg_id, session_id, 'AI', ai_text))
-        db.commit()
-        app_logger.info(f"DB Query: Successfully added AI message with ID: {ai_msg_id}")
-        return ai_msg_id
+        app_logger.info("DB Query: Fetching messages since cursor for session ID: %s", session_id)
+        if since is None:
+            rows = run('get_messages_oldest', (session_id, limit + 1), fetch='all', conn=conn)
+        else:
+            rows = run('get_messages_after', (session_id, since[0], since[1], limit + 1), fetch='all', conn=conn)
+        messages = [{'id': r[0], 'sender': r[1], 'text': r[2], 'created_at': r[3]} for r in rows[:limit]]
+        return messages, len(rows) > limit
     except Exception as e:
-        error_logger.error(f"add_ai_message_db error: {e}", exc_info=True)
-        return None
+        error_logger.error(f"get_messages_since_db error: {e}", exc_info=True)
+        return None, False
+
+@timed(DB_QUERY_SECONDS)
+def insert_exchanges_db(conn, exchanges):
+    """
+    Writes a batch of exchanges on conn in a single transaction: every message
+    in one multi-row INSERT plus any session title and last-activity updates.
+    Message IDs are generated by the caller, so re-running a batch is idempotent.
+    Rolls back and re-raises on failure.
+    """
+    rows = [m for exchange in exchanges for m in exchange['messages']]
+    titles = [(ex['title'], ex['session_id'], ex['user_id']) for ex in exchanges if ex.get('title')]
+    activity = {}  # session_id -> (user_id, newest message time)
+    for ex in exchanges:
+        for m in ex['messages']:
+            previous = activity.get(ex['session_id'])
+            if previous is None or m['created_at'] > previous[1]:
+                activity[ex['session_id']] = (ex['user_id'], m['created_at'])
+    renamed = []
+    try:
+        with conn.cursor() as cur:
+            app_logger.info("DB Query: Writing %s messages from %s exchanges", len(rows), len(exchanges))
+            if rows:
+                execute_values(
+                    cur,
+                    "INSERT INTO messages (id, session_id, sender, text, created_at) VALUES %s "
+                    "ON CONFLICT (id) DO NOTHING",
+                    [(m['id'], m['session_id'], m['sender'], m['text'], m['created_at']) for m in rows],
+                    page_size=max(len(rows), 1)
+                )
+            if titles:
+                # One statement per title: execute_batch only reports the last rowcount, and
+                # the cache must not learn a title for a session that was deleted meanwhile
+                sql = prepared_sql(conn, cur, 'update_session_title')
+                for title in titles:
+                    cur.execute(sql, title)
+                    if cur.rowcount == 1:
+                        renamed.append(title)
+            if activity:
+                execute_values(
+                    cur,
+                    "UPDATE chatsessions SET last_activity_at = GREATEST(chatsessions.last_activity_at, v.at) "
+                    "FROM (VALUES %s) AS v (id, at) WHERE chatsessions.id = v.id::uuid",
+                    [(session_id, at) for session_id, (_, at) in activity.items()],
+                    template="(%s, %s::timestamp)"
+                )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    for title, session_id, user_id in renamed:
+        _update_session_cache('session_renamed', user_id, session_id, title)
+    for session_id, (user_id, _) in activity.items():
+        _update_session_cache('session_active', user_id, session_id)
 
+@timed(DB_QUERY_SECONDS)
 def delete_session_db(session_id, user_id):
     try:
-        db = get_db()
-        cur = db.cursor()
-        app_logger.info(f"DB Query: Deleting chat session ID: {session_id} for user ID: {user_id}")
+        app_logger.info("DB Query: Deleting chat session ID: %s for user ID: %s", session_id, user_id)
         # Only allow user to delete their own session
-        cur.execute("DELETE FROM chatsessions WHERE id=%s AND user_id=%s", (session_id, user_id))
-        db.commit()
-        success = cur.rowcount > 0
-        app_logger.info(f"DB Query: Session deletion {'successful' if success else 'failed - session not found or not owned by user'}")
+        success = run('delete_session', (session_id, user_id), commit=True) > 0
+        if success:
+            _update_session_cache('session_deleted', user_id, session_id)
+        app_logger.info("DB Query: Session deletion %s", 'successful' if success else 'failed - session not found or not owned by user')
         return success
     except Exception as e:
         error_logger.error(f"delete_session_db error: {e}", exc_info=True)
         return False
 
+@timed(DB_QUERY_SECONDS)
 def update_session_title_db(session_id, user_id, new_title):
     try:
-        db = get_db()
-        cur = db.cursor()
-        app_logger.info(f"DB Query: Updating title of session ID: {session_id} for user ID: {user_id}")
+        app_logger.info("DB Query: Updating title of session ID: %s for user ID: %s", session_id, user_id)
         # Only allow user to update their own session
-        cur.execute("UPDATE chatsessions SET title=%s WHERE id=%s AND user_id=%s", (new_title, session_id, user_id))
-        db.commit()
-        success = cur.rowcount > 0
-        app_logger.info(f"DB Query: Title update {'successful' if success else 'failed - session not found or not owned by user'}")
+        success = run('update_session_title', (new_title, session_id, user_id), commit=True) > 0
+        if success:
+            _update_session_cache('session_renamed', user_id, session_id, new_title)
+        app_logger.info("DB Query: Title update %s", 'successful' if success else 'failed - session not found or not owned by user')
         return success
     except Exception as e:
         error_logger.error(f"update_session_title_db error: {e}", exc_info=True)
         return False
+
+@timed(DB_QUERY_SECONDS)
+def get_session_summary_db(session_id):
+    """
+    Returns (summary, until_created_at, until_id) for the session's rolling summary, or None.
+    """
+    try:
+        app_logger.info("DB Query: Fetching summary for session ID: %s", session_id)
+        row = run('get_session_summary', (session_id,), fetch='one')
+        if row is None or row[0] is None:
+            return None
+        return row[0], row[1], str(row[2])
+    except Exception as e:
+        error_logger.error(f"get_session_summary_db error: {e}", exc_info=True)
+        return None
+
+@timed(DB_QUERY_SECONDS)
+def update_session_summary_db(session_id, summary, until_created_at, until_id, conn=None):
+    try:
+        app_logger.info("DB Query: Updating summary for session ID: %s", session_id)
+        return run('update_session_summary', (summary, until_created_at, until_id, session_id),
+                   commit=True, conn=conn) > 0
+    except Exception as e:
+        error_logger.error(f"update_session_summary_db error: {e}", exc_info=True)
+        return False
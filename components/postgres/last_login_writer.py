@@ -0,0 +1,108 @@
+import os
+import atexit
+import datetime
+import threading
+from components.postgres.postgres_conn_utils import get_pool
+from components.postgres.auth_queries import update_last_logins_db
+import logging
+from logging_config import app_logger, error_logger
+
+
+class LastLoginWriter:
+    """
+    Records login times off the request path.
+
+    record() only stores the time in memory (a user's latest login wins); a
+    background green thread writes everything pending in one UPDATE every
+    flush_interval seconds, or sooner once max_pending users are waiting.
+    Failed batches are kept for the next flush. close() writes what is left;
+    it is registered to run at exit.
+    """
+
+    def __init__(self, flush_interval=5.0, max_pending=10000):
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending = {}  # user_id -> aware UTC datetime
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        self._thread = None
+        self._stats = {'recorded': 0, 'batches': 0, 'written': 0, 'failed': 0, 'dropped': 0}
+
+    def record(self, user_id, at=None):
+        at = at or datetime.datetime.now(datetime.timezone.utc)
+        with self._lock:
+            if self._thread is None and not self._closed:
+                self._thread = threading.Thread(target=self._run, name='last-login-writer', daemon=True)
+                self._thread.start()
+            self._pending[str(user_id)] = at
+            self._stats['recorded'] += 1
+            full = len(self._pending) >= self.max_pending
+        if full or self._closed:
+            self._wake.set()
+
+    def _run(self):
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self):
+        """
+        Writes every pending login time now. Returns True if nothing is left pending.
+        """
+        with self._lock:
+            batch, self._pending = self._pending, {}
+        if not batch:
+            return True
+        try:
+            with get_pool().connection() as conn:
+                update_last_logins_db(conn, list(batch.items()))
+            self._stats['batches'] += 1
+            self._stats['written'] += len(batch)
+            return True
+        except Exception as e:
+            self._stats['failed'] += 1
+            error_logger.error(f"LastLoginWriter flush error for {len(batch)} users: {e}", exc_info=True)
+            with self._lock:
+                # Keep the newer time where the user logged in again meanwhile
+                for user_id, at in batch.items():
+                    if len(self._pending) >= self.max_pending:
+                        self._stats['dropped'] += 1
+                    elif user_id not in self._pending:
+                        self._pending[user_id] = at
+            return False
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(self.flush_interval + 5)
+        pending = len(self._pending)
+        self.flush()
+        app_logger.info("Last-login writer closed after flushing %s pending users", pending)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, pending=len(self._pending))
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_last_login_writer():
+    """
+    Shared writer configured from LAST_LOGIN_* environment variables.
+    """
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = LastLoginWriter(
+                flush_interval=float(os.getenv('LAST_LOGIN_FLUSH_INTERVAL', 5)),
+                max_pending=int(os.getenv('LAST_LOGIN_MAX_PENDING', 10000)),
+            )
+            atexit.register(_writer.close)
+    return _writer
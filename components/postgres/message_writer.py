@@ -0,0 +1,165 @@
+import os
+import time
+import uuid
+import queue
+import atexit
+import datetime
+import threading
+from components.postgres.postgres_conn_utils import get_pool
+from components.postgres.chat_queries import insert_exchanges_db
+import logging
+from logging_config import app_logger, error_logger
+
+
+def new_message(session_id, sender, text, created_at=None, message_id=None):
+    """
+    Builds a message row with a client-generated ID, so callers can use the ID
+    before (or without waiting for) the database write.
+    """
+    return {
+        'id': message_id or str(uuid.uuid4()),
+        'session_id': session_id,
+        'sender': sender,
+        'text': text,
+        # Timezone-aware so Postgres converts it like CURRENT_TIMESTAMP would
+        'created_at': created_at or datetime.datetime.now(datetime.timezone.utc),
+    }
+
+
+class MessageWriter:
+    """
+    Persists chat exchanges (a user message, the AI reply and an optional
+    title update) in one transaction each.
+
+    With write_behind=True exchanges go onto a bounded queue and a background
+    green thread writes them in batches across sessions, one multi-row INSERT
+    per batch. When the queue is full the caller writes synchronously instead.
+    close() drains the queue; it is registered to run at exit.
+    """
+
+    def __init__(self, write_behind=False, queue_size=1000, batch_size=100, flush_interval=0.05):
+        self.write_behind = write_behind
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._closed = False
+        self._thread = None
+        self._stats = {
+            'queued': 0,
+            'queue_full': 0,
+            'batches': 0,
+            'exchanges_written': 0,
+            'messages_written': 0,
+            'failed': 0,
+        }
+        if write_behind:
+            self._thread = threading.Thread(target=self._run, name='message-writer', daemon=True)
+            self._thread.start()
+
+    def write_exchange(self, session_id, user_id, messages, title=None):
+        """
+        Persists messages (from new_message) and an optional new session title together.
+        Returns True once written or queued, False if a synchronous write failed.
+        """
+        exchange = {'session_id': session_id, 'user_id': user_id, 'messages': messages, 'title': title}
+        if self.write_behind and not self._closed:
+            try:
+                self._queue.put_nowait(exchange)
+                self._stats['queued'] += 1
+                return True
+            except queue.Full:
+                self._stats['queue_full'] += 1
+                app_logger.warning("Message write queue full, writing session_id: %s synchronously", session_id)
+        return self._write([exchange])
+
+    def _write(self, exchanges):
+        try:
+            with get_pool().connection() as conn:
+                insert_exchanges_db(conn, exchanges)
+        except Exception as e:
+            if len(exchanges) > 1:
+                # Isolate the failing exchange(s) so one bad row does not lose the whole batch
+                app_logger.warning("Message batch of %s failed (%s), retrying individually", len(exchanges), e)
+                return all([self._write([exchange]) for exchange in exchanges])
+            self._stats['failed'] += 1
+            error_logger.error(f"MessageWriter write error for session_id {exchanges[0]['session_id']}: {e}", exc_info=True)
+            return False
+        self._stats['batches'] += 1
+        self._stats['exchanges_written'] += len(exchanges)
+        self._stats['messages_written'] += sum(len(exchange['messages']) for exchange in exchanges)
+        return True
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is None:
+                self._queue.task_done()
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._queue.task_done()
+                    stopping = True
+                    break
+                batch.append(item)
+            try:
+                self._write(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def flush(self):
+        """
+        Blocks until every queued exchange has been written.
+        """
+        if self._thread is not None:
+            self._queue.join()
+
+    def close(self, timeout=10.0):
+        """
+        Stops accepting write-behind work and drains the queue.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        if self._thread is not None:
+            pending = self._queue.qsize()
+            self._queue.put(None)
+            self._thread.join(timeout)
+            app_logger.info("Message writer closed after draining %s pending exchanges", pending)
+
+    def stats(self):
+        stats = dict(self._stats)
+        stats['mode'] = 'write_behind' if self.write_behind else 'sync'
+        stats['pending'] = self._queue.qsize()
+        return stats
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_message_writer():
+    """
+    Shared writer configured from MESSAGE_WRITE_* environment variables.
+    """
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = MessageWriter(
+                write_behind=os.getenv('MESSAGE_WRITE_MODE', 'sync') == 'write_behind',
+                queue_size=int(os.getenv('MESSAGE_WRITE_QUEUE_SIZE', 1000)),
+                batch_size=int(os.getenv('MESSAGE_WRITE_BATCH_SIZE', 100)),
+                flush_interval=float(os.getenv('MESSAGE_WRITE_FLUSH_MS', 50)) / 1000.0,
+            )
+            atexit.register(_writer.close)
+    return _writer
@@ -0,0 +1,4 @@
+-- Supports keyset pagination of a session's history ordered by (created_at, id).
+-- CONCURRENTLY avoids locking writes on large tables; run it outside a transaction block.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_messages_session_created_id
+    ON messages (session_id, created_at, id);
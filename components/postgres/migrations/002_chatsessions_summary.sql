@@ -0,0 +1,5 @@
+-- Rolling per-session conversation summary used by the context builder.
+-- summary_until_at/summary_until_id mark the newest message folded into the summary.
+ALTER TABLE chatsessions ADD COLUMN IF NOT EXISTS summary TEXT;
+ALTER TABLE chatsessions ADD COLUMN IF NOT EXISTS summary_until_at TIMESTAMP;
+ALTER TABLE chatsessions ADD COLUMN IF NOT EXISTS summary_until_id UUID;
@@ -0,0 +1,4 @@
+-- Supports listing a user's sessions most recently active first.
+-- CONCURRENTLY avoids locking writes on large tables; run it outside a transaction block.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_chatsessions_user_activity
+    ON chatsessions (user_id, last_activity_at DESC, id DESC);
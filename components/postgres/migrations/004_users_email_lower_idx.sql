@@ -0,0 +1,5 @@
+-- Case-insensitive uniqueness of user emails. Backs registration's
+-- INSERT ... ON CONFLICT DO NOTHING and the lower(email) login lookup.
+-- Resolve any emails that differ only in case before running it.
+-- CONCURRENTLY avoids locking writes on large tables; run it outside a transaction block.
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS idx_users_email_lower ON users (lower(email));
@@ -1,12 +1,255 @@
+import os
+import time
+import threading
+from contextlib import contextmanager
 import psycopg2
+from psycopg2 import extensions
 from flask import g, current_app
 import logging
 from logging_config import app_logger, error_logger
 
+
+class PoolTimeoutError(Exception):
+    """Raised when no connection could be checked out within the pool timeout."""
+
+
+class PreparedConnection(extensions.connection):
+    """
+    psycopg2 connection that remembers which repository statements are prepared on its server session.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared = set()
+
+
+class ConnectionPool:
+    """
+    Bounded Postgres connection pool.
+
+    Uses threading primitives, which eventlet.monkey_patch() turns into
+    green locks/conditions, so a checkout that has to wait yields to the hub
+    instead of blocking other greenlets. Together with psycogreen's
+    patch_psycopg() the connections themselves are cooperative too.
+    """
+
+    def __init__(self, dsn, min_size=1, max_size=10, timeout=5.0,
+                 recycle=1800.0, health_check_interval=30.0):
+        if max_size < 1 or min_size < 0 or min_size > max_size:
+            raise ValueError("Invalid pool size: require 0 <= min_size <= max_size and max_size >= 1")
+        self.dsn = dsn
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.recycle = recycle
+        self.health_check_interval = health_check_interval
+
+        self._cond = threading.Condition()
+        self._idle = []          # stack of (conn, last_used_at)
+        self._created_at = {}    # id(conn) -> creation timestamp
+        self._size = 0           # idle + checked out
+        self._closed = False
+        self._stats = {
+            'checkouts': 0,
+            'connections_created': 0,
+            'connections_recycled': 0,
+            'health_check_failures': 0,
+            'rollbacks_on_return': 0,
+            'waits': 0,
+            'wait_time_total': 0.0,
+            'wait_time_max': 0.0,
+            'saturated': 0,
+            'timeouts': 0,
+        }
+
+        for _ in range(min_size):
+            try:
+                conn = self._connect()
+                self._idle.append((conn, time.monotonic()))
+                self._size += 1
+            except Exception as e:
+                error_logger.error(f"ConnectionPool warm-up error: {e}", exc_info=True)
+                break
+
+    def _connect(self):
+        conn = psycopg2.connect(self.dsn, connection_factory=PreparedConnection)
+        self._created_at[id(conn)] = time.monotonic()
+        self._stats['connections_created'] += 1
+        return conn
+
+    def _discard(self, conn):
+        self._created_at.pop(id(conn), None)
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _is_expired(self, conn):
+        created = self._created_at.get(id(conn))
+        return bool(self.recycle) and created is not None and time.monotonic() - created > self.recycle
+
+    def _is_healthy(self, conn, last_used_at):
+        if conn.closed:
+            return False
+        if time.monotonic() - last_used_at < self.health_check_interval:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except Exception:
+            self._stats['health_check_failures'] += 1
+            return False
+
+    def getconn(self):
+        """
+        Checks out a connection, waiting up to `timeout` seconds when the pool is saturated.
+        """
+        start = time.monotonic()
+        deadline = start + self.timeout
+        waited = False
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise PoolTimeoutError("Connection pool is closed")
+                if self._idle:
+                    conn, last_used_at = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    conn, last_used_at = None, None
+                    break
+                if not waited:
+                    waited = True
+                    self._stats['saturated'] += 1
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats['timeouts'] += 1
+                    raise PoolTimeoutError(f"Timed out after {self.timeout}s waiting for a database connection")
+                self._cond.wait(remaining)
+
+        if waited:
+            wait_time = time.monotonic() - start
+            self._stats['waits'] += 1
+            self._stats['wait_time_total'] += wait_time
+            self._stats['wait_time_max'] = max(self._stats['wait_time_max'], wait_time)
+
+        try:
+            if conn is not None and (self._is_expired(conn) or not self._is_healthy(conn, last_used_at)):
+                self._stats['connections_recycled'] += 1
+                self._discard(conn)
+                conn = None
+            if conn is None:
+                conn = self._connect()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+
+        self._stats['checkouts'] += 1
+        return conn
+
+    def putconn(self, conn):
+        """
+        Returns a connection to the pool, rolling back any open transaction first.
+        """
+        reusable = not conn.closed and not self._closed
+        if reusable:
+            try:
+                status = conn.info.transaction_status
+                if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+                    reusable = False
+                elif status != extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+                    self._stats['rollbacks_on_return'] += 1
+            except Exception as e:
+                error_logger.error(f"ConnectionPool rollback-on-return error: {e}", exc_info=True)
+                reusable = False
+        if reusable and self._is_expired(conn):
+            self._stats['connections_recycled'] += 1
+            reusable = False
+
+        with self._cond:
+            if reusable:
+                self._idle.append((conn, time.monotonic()))
+            else:
+                self._discard(conn)
+                self._size -= 1
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        """
+        Context manager for code running outside a Flask app context.
+        """
+        conn = self.getconn()
+        try:
+            yield conn
+        finally:
+            self.putconn(conn)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            while self._idle:
+                conn, _ = self._idle.pop()
+                self._discard(conn)
+                self._size -= 1
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self._stats)
+            stats.update({
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': self._size - len(self._idle),
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+            })
+        return stats
+
+
+_pool = None
+
+
+def create_pool(dsn):
+    """
+    Creates the process-wide connection pool, sized from DB_POOL_* environment variables.
+    """
+    global _pool
+    if _pool is None:
+        _pool = ConnectionPool(
+            dsn,
+            min_size=int(os.getenv('DB_POOL_MIN_SIZE', 1)),
+            max_size=int(os.getenv('DB_POOL_MAX_SIZE', 10)),
+            timeout=float(os.getenv('DB_POOL_TIMEOUT', 5)),
+            recycle=float(os.getenv('DB_POOL_RECYCLE', 1800)),
+            health_check_interval=float(os.getenv('DB_POOL_HEALTH_CHECK_INTERVAL', 30)),
+        )
+        app_logger.info(f"Database pool created (min={_pool.min_size}, max={_pool.max_size}).")
+    return _pool
+
+
+def get_pool():
+    """
+    Returns the process-wide connection pool, creating it from app config on first use.
+    """
+    if _pool is None:
+        return create_pool(current_app.config['DATABASE_URL'])
+    return _pool
+
+
+def get_pool_stats():
+    return _pool.stats() if _pool is not None else {}
+
+
 def get_db():
     try:
         if 'db' not in g:
-            g.db = psycopg2.connect(current_app.config['DATABASE_URL'])
+            g.db = get_pool().getconn()
         return g.db
     except Exception as e:
         error_logger.error(f"get_db error: {e}", exc_info=True)
@@ -16,13 +259,14 @@ def close_db(e=None):
     try:
         db = g.pop('db', None)
         if db is not None:
-            db.close()
+            get_pool().putconn(db)
     except Exception as e:
         error_logger.error(f"close_db error: {e}", exc_info=True)
 
 def init_db(app):
     try:
         app.teardown_appcontext(close_db)
+        create_pool(app.config['DATABASE_URL'])
         app_logger.info("Database teardown registered.")
     except Exception as e:
-        error_logger.error(f"init_db error: {e}", exc_info=True)
\ No newline at end of file
+        error_logger.error(f"init_db error: {e}", exc_info=True)
@@ -0,0 +1,141 @@
+import re
+import psycopg2
+from psycopg2 import extensions
+import psycopg2.errors
+from components.postgres.postgres_conn_utils import get_db
+import logging
+from logging_config import app_logger, error_logger
+
+# Every fixed statement the query modules run: name -> (parameter types, SQL)
+STATEMENTS = {
+    # chat_queries
+    'get_sessions': (
+        ('uuid', 'bigint'),
+        "SELECT id, title FROM chatsessions WHERE user_id=$1 "
+        "ORDER BY last_activity_at DESC, id DESC LIMIT $2"
+    ),
+    'create_session': (
+        ('uuid', 'uuid', 'text'),
+        "INSERT INTO chatsessions (id, user_id, title) VALUES ($1, $2, $3)"
+    ),
+    'get_messages': (
+        ('uuid',),
+        "SELECT id, sender, text, created_at FROM messages WHERE session_id=$1 ORDER BY created_at ASC"
+    ),
+    'get_messages_newest': (
+        ('uuid', 'bigint'),
+        "SELECT id, sender, text, created_at FROM messages "
+        "WHERE session_id=$1 ORDER BY created_at DESC, id DESC LIMIT $2"
+    ),
+    'get_messages_before': (
+        ('uuid', 'timestamp', 'uuid', 'bigint'),
+        "SELECT id, sender, text, created_at FROM messages "
+        "WHERE session_id=$1 AND (created_at, id) < ($2, $3) "
+        "ORDER BY created_at DESC, id DESC LIMIT $4"
+    ),
+    'get_messages_after': (
+        ('uuid', 'timestamp', 'uuid', 'bigint'),
+        "SELECT id, sender, text, created_at FROM messages "
+        "WHERE session_id=$1 AND (created_at, id) > ($2, $3) "
+        "ORDER BY created_at ASC, id ASC LIMIT $4"
+    ),
+    'get_messages_oldest': (
+        ('uuid', 'bigint'),
+        "SELECT id, sender, text, created_at FROM messages "
+        "WHERE session_id=$1 ORDER BY created_at ASC, id ASC LIMIT $2"
+    ),
+    'delete_session': (
+        ('uuid', 'uuid'),
+        "DELETE FROM chatsessions WHERE id=$1 AND user_id=$2"
+    ),
+    'update_session_title': (
+        ('text', 'uuid', 'uuid'),
+        "UPDATE chatsessions SET title=$1 WHERE id=$2 AND user_id=$3"
+    ),
+    'get_session_summary': (
+        ('uuid',),
+        "SELECT summary, summary_until_at, summary_until_id FROM chatsessions WHERE id=$1"
+    ),
+    'update_session_summary': (
+        ('text', 'timestamp', 'uuid', 'uuid'),
+        "UPDATE chatsessions SET summary=$1, summary_until_at=$2, summary_until_id=$3 WHERE id=$4"
+    ),
+    # auth_queries
+    'get_user_by_email': (
+        ('text',),
+        "SELECT id, password_hash FROM users WHERE lower(email)=lower($1)"
+    ),
+    'register_user': (
+        ('text', 'text'),
+        "INSERT INTO users (email, password_hash, last_login_at) VALUES ($1, $2, NOW()) "
+        "ON CONFLICT DO NOTHING RETURNING id"
+    ),
+    'update_password_hash': (
+        ('text', 'uuid'),
+        "UPDATE users SET password_hash=$1 WHERE id=$2"
+    ),
+}
+
+# "EXECUTE name (%s, ...)" per statement, built once
+_EXECUTE_SQL = {
+    name: f"EXECUTE {name} ({', '.join(['%s'] * len(types))})" if types else f"EXECUTE {name}"
+    for name, (types, _) in STATEMENTS.items()
+}
+# Plain-text form for connections that cannot track prepared statements ($n placeholders are in order)
+_PLAIN_SQL = {name: re.sub(r'\$\d+', '%s', sql) for name, (_, sql) in STATEMENTS.items()}
+
+
+def prepared_sql(conn, cur, name):
+    """
+    Prepares name on conn if needed and returns its "EXECUTE name (%s, ...)" text,
+    for use with helpers such as psycopg2.extras.execute_batch. Connections not
+    created by the pool (no `prepared` set) get the plain statement instead.
+    """
+    prepared = getattr(conn, 'prepared', None)
+    if prepared is None:
+        return _PLAIN_SQL[name]
+    if name not in prepared:
+        types, sql = STATEMENTS[name]
+        # PREPARE is not transactional, so the statement outlives a later rollback
+        cur.execute(f"PREPARE {name} ({', '.join(types)}) AS {sql}" if types else f"PREPARE {name} AS {sql}")
+        prepared.add(name)
+        app_logger.debug("Prepared statement %s", name)
+    return _EXECUTE_SQL[name]
+
+
+def run(name, params=(), fetch=None, commit=False, conn=None):
+    """
+    Executes the prepared statement name with params on conn (default: the
+    request's pooled connection), preparing it there on first use.
+
+    fetch: None (returns the rowcount), 'one' or 'all'. commit: commit after
+    a successful write. On any error the transaction is rolled back, so the
+    connection is usable again, and the error is re-raised.
+    """
+    conn = conn if conn is not None else get_db()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(prepared_sql(conn, cur, name), params)
+            if fetch == 'one':
+                result = cur.fetchone()
+            elif fetch == 'all':
+                result = cur.fetchall()
+            else:
+                result = cur.rowcount
+        if commit:
+            conn.commit()
+        return result
+    except Exception as e:
+        rollback(conn)
+        if isinstance(e, psycopg2.errors.InvalidSqlStatementName) and hasattr(conn, 'prepared'):
+            # The server session lost its prepared statements (e.g. reset by a proxy); prepare again next time
+            conn.prepared = set()
+        raise
+
+
+def rollback(conn):
+    try:
+        if not conn.closed and conn.info.transaction_status != extensions.TRANSACTION_STATUS_IDLE:
+            conn.rollback()
+    except Exception as e:
+        error_logger.error(f"Repository rollback error: {e}", exc_info=True)
@@ -13,7 +13,10 @@ CREATE TABLE IF NOT EXISTS chatsessions (
     user_id UUID REFERENCES users(id) ON DELETE CASCADE,
     title VARCHAR(255) NOT NULL,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    last_activity_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    last_activity_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    summary TEXT,
+    summary_until_at TIMESTAMP,
+    summary_until_id UUID
 );
 
 CREATE TYPE sender_enum AS ENUM ('USER', 'AI', 'SYSTEM');
@@ -25,3 +28,9 @@ CREATE TABLE IF NOT EXISTS messages (
     text TEXT NOT NULL,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
+
+
+CREATE INDEX IF NOT EXISTS idx_messages_session_created_id ON messages (session_id, created_at, id);
+
+CREATE INDEX IF NOT EXISTS idx_chatsessions_user_activity ON chatsessions (user_id, last_activity_at DESC, id DESC);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_users_email_lower ON users (lower(email));
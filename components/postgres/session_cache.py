@@ -0,0 +1,252 @@
+import os
+import json
+import time
+import uuid
+import threading
+from collections import OrderedDict
+import logging
+from logging_config import app_logger, error_logger
+
+
+class LocalInvalidationChannel:
+    """
+    Invalidation channel for a single process: nothing to tell.
+    """
+
+    def publish(self, user_id):
+        pass
+
+    def subscribe(self, callback):
+        pass
+
+
+class RedisInvalidationChannel:
+    """
+    Broadcasts invalidated user IDs to every worker over Redis pub/sub.
+    Messages published by this process are ignored on receipt.
+    """
+
+    def __init__(self, url, channel='audibleai:session-cache'):
+        import redis
+        self.channel = channel
+        self.origin = uuid.uuid4().hex
+        self._redis = redis.Redis.from_url(url)
+        self._callbacks = []
+        self._thread = None
+
+    def publish(self, user_id):
+        try:
+            self._redis.publish(self.channel, json.dumps({'origin': self.origin, 'user_id': str(user_id)}))
+        except Exception as e:
+            error_logger.error(f"Session cache invalidation publish error: {e}", exc_info=True)
+
+    def subscribe(self, callback):
+        self._callbacks.append(callback)
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._listen, name='session-cache-invalidation', daemon=True)
+            self._thread.start()
+
+    def _listen(self):
+        while True:
+            try:
+                pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                for message in pubsub.listen():
+                    data = json.loads(message['data'])
+                    if data.get('origin') == self.origin:
+                        continue
+                    for callback in self._callbacks:
+                        callback(data['user_id'])
+            except Exception as e:
+                error_logger.error(f"Session cache invalidation listener error: {e}", exc_info=True)
+                time.sleep(1)
+
+
+class SessionListCache:
+    """
+    Per-user cache of session lists, most recently active first.
+
+    Lists are filled from get_sessions_db and then kept current in place by
+    the session write paths (create, rename, delete, new messages). Each
+    change is also published on the invalidation channel so other workers
+    drop their copy. At most max_users lists of up to max_sessions entries
+    are kept (least recently used users are evicted) and every list expires
+    after ttl seconds as a safety net against missed updates.
+    """
+
+    def __init__(self, max_users=10000, max_sessions=100, ttl=300.0, channel=None):
+        self.max_users = max_users
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.channel = channel or LocalInvalidationChannel()
+        self._entries = OrderedDict()  # user_id -> [sessions, complete, expires_at]
+        self._versions = OrderedDict()  # user_id -> change counter, guards fills racing with writes
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'expired': 0, 'fills': 0, 'stale_fills': 0,
+                       'updates': 0, 'evictions': 0, 'remote_invalidations': 0}
+        self.channel.subscribe(self._on_remote_invalidation)
+
+    def get(self, user_id, limit=None):
+        """
+        Returns a copy of the user's sessions (up to limit), or None if they must be loaded.
+        """
+        user_id = str(user_id)
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+            sessions, complete, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[user_id]
+                self._stats['expired'] += 1
+                self._stats['misses'] += 1
+                return None
+            if not complete and (limit is None or limit > len(sessions)):
+                self._stats['misses'] += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self._stats['hits'] += 1
+            return [dict(s) for s in sessions[:limit]]
+
+    def version(self, user_id):
+        """
+        Token to pass to fill(); taken before reading from the database.
+        """
+        with self._lock:
+            return self._versions.get(str(user_id), 0)
+
+    def fill(self, user_id, sessions, complete, version):
+        """
+        Stores a list read from the database, unless the user's sessions changed since version was taken.
+        """
+        user_id = str(user_id)
+        with self._lock:
+            if self._versions.get(user_id, 0) != version:
+                self._stats['stale_fills'] += 1
+                return
+            self._entries[user_id] = [[dict(s) for s in sessions[:self.max_sessions]],
+                                      complete and len(sessions) <= self.max_sessions,
+                                      time.monotonic() + self.ttl]
+            self._entries.move_to_end(user_id)
+            self._stats['fills'] += 1
+            while len(self._entries) > self.max_users:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def _changed(self, user_id):
+        # Caller holds the lock
+        self._versions[user_id] = self._versions.pop(user_id, 0) + 1
+        while len(self._versions) > self.max_users:
+            self._versions.popitem(last=False)
+        self._stats['updates'] += 1
+
+    def _update(self, user_id, apply):
+        user_id = str(user_id)
+        with self._lock:
+            self._changed(user_id)
+            entry = self._entries.get(user_id)
+            if entry is not None and not apply(entry):
+                del self._entries[user_id]
+        self.channel.publish(user_id)
+
+    def session_created(self, user_id, session_id, title):
+        def apply(entry):
+            entry[0].insert(0, {'id': str(session_id), 'title': title})
+            if len(entry[0]) > self.max_sessions:
+                del entry[0][self.max_sessions:]
+                entry[1] = False
+            return True
+        self._update(user_id, apply)
+
+    def session_renamed(self, user_id, session_id, title):
+        def apply(entry):
+            for session in entry[0]:
+                if session['id'] == str(session_id):
+                    session['title'] = title
+                    return True
+            # Beyond a truncated list nothing is cached; missing from a complete one means it is stale
+            return not entry[1]
+        self._update(user_id, apply)
+
+    def session_deleted(self, user_id, session_id):
+        def apply(entry):
+            for i, session in enumerate(entry[0]):
+                if session['id'] == str(session_id):
+                    del entry[0][i]
+                    break
+            # A truncated list stays a valid (shorter) prefix
+            return True
+        self._update(user_id, apply)
+
+    def session_active(self, user_id, session_id):
+        """
+        Moves a session to the front after new messages.
+        """
+        def apply(entry):
+            for i, session in enumerate(entry[0]):
+                if session['id'] == str(session_id):
+                    if i:
+                        entry[0].insert(0, entry[0].pop(i))
+                    return True
+            return False
+        self._update(user_id, apply)
+
+    def invalidate(self, user_id):
+        self._update(user_id, lambda entry: False)
+
+    def _on_remote_invalidation(self, user_id):
+        with self._lock:
+            self._changed(user_id)
+            self._entries.pop(user_id, None)
+            self._stats['remote_invalidations'] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats, users=len(self._entries))
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        return stats
+
+
+_channel = None
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def set_invalidation_channel(channel):
+    """
+    Installs the channel (anything with publish(user_id) and subscribe(callback))
+    used by the session cache created afterwards.
+    """
+    global _channel
+    _channel = channel
+
+
+def _default_channel():
+    url = os.getenv('SESSION_CACHE_CHANNEL_URL') or os.getenv('SOCKETIO_MESSAGE_QUEUE')
+    if url and url.startswith(('redis://', 'rediss://')):
+        app_logger.info("Session cache invalidation via Redis pub/sub")
+        return RedisInvalidationChannel(url, os.getenv('SESSION_CACHE_CHANNEL', 'audibleai:session-cache'))
+    return LocalInvalidationChannel()
+
+
+def get_session_cache():
+    """
+    Shared session-list cache, or None if SESSION_CACHE_ENABLED is false.
+    Configured from SESSION_CACHE_* environment variables; with several
+    workers, changes are broadcast over SESSION_CACHE_CHANNEL_URL (defaults
+    to SOCKETIO_MESSAGE_QUEUE when that is Redis).
+    """
+    global _cache
+    if os.getenv('SESSION_CACHE_ENABLED', 'true').lower() not in ('1', 'true', 'yes'):
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = SessionListCache(
+                max_users=int(os.getenv('SESSION_CACHE_MAX_USERS', 10000)),
+                max_sessions=int(os.getenv('SESSION_CACHE_MAX_SESSIONS', 100)),
+                ttl=float(os.getenv('SESSION_CACHE_TTL', 300)),
+                channel=_channel or _default_channel(),
+            )
+    return _cache
@@ -0,0 +1,105 @@
+import struct
+import logging
+from logging_config import app_logger, error_logger
+
+# MPEG audio Layer III tables, indexed by the header's version bits (3 = MPEG-1, 2 = MPEG-2, 0 = MPEG-2.5)
+_MP3_BITRATES_KBPS = {
+    3: (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    2: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+_MP3_BITRATES_KBPS[0] = _MP3_BITRATES_KBPS[2]
+_MP3_SAMPLE_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+
+OPUS_GRANULE_RATE = 48000
+
+
+def mp3_duration(data):
+    """
+    Duration of an MPEG Layer III stream, summed from its frame headers. ID3v2 tags are skipped.
+    """
+    view = memoryview(data)
+    offset = 0
+    if bytes(view[:3]) == b'ID3' and len(view) >= 10:
+        size = (view[6] << 21) | (view[7] << 14) | (view[8] << 7) | view[9]
+        offset = 10 + size + (10 if view[5] & 0x10 else 0)
+    seconds = 0.0
+    frames = 0
+    while offset + 4 <= len(view):
+        b1, b2 = view[offset + 1], view[offset + 2]
+        if view[offset] != 0xFF or (b1 & 0xE0) != 0xE0:
+            break
+        version = (b1 >> 3) & 0x03
+        layer = (b1 >> 1) & 0x03
+        bitrate_index = b2 >> 4
+        rate_index = (b2 >> 2) & 0x03
+        if version == 1 or layer != 1 or bitrate_index in (0, 15) or rate_index == 3:
+            break
+        bitrate = _MP3_BITRATES_KBPS[version][bitrate_index] * 1000
+        sample_rate = _MP3_SAMPLE_RATES[version][rate_index]
+        samples = 1152 if version == 3 else 576
+        offset += samples // 8 * bitrate // sample_rate + ((b2 >> 1) & 0x01)
+        seconds += samples / sample_rate
+        frames += 1
+    return seconds if frames else None
+
+
+def ogg_opus_duration(data):
+    """
+    Duration of an Ogg Opus stream: the last page's granule position minus the pre-skip, at 48 kHz.
+    """
+    head = data.find(b'OpusHead')
+    if head < 0 or head + 12 > len(data):
+        return None
+    pre_skip = struct.unpack_from('<H', data, head + 10)[0]
+    end = len(data)
+    while True:
+        page = data.rfind(b'OggS', 0, end)
+        if page < 0 or page + 14 > len(data):
+            return None
+        granule = struct.unpack_from('<q', data, page + 6)[0]
+        # -1 marks a page on which no packet ends; look further back
+        if data[page + 4] == 0 and granule >= 0:
+            return max(granule - pre_skip, 0) / OPUS_GRANULE_RATE
+        end = page
+
+
+def wav_duration(data, sample_rate=None):
+    """
+    Duration of 16-bit PCM, from the RIFF/WAVE header when present. Headerless
+    data needs sample_rate (mono assumed).
+    """
+    if data[:4] != b'RIFF' or data[8:12] != b'WAVE':
+        return len(data) / (sample_rate * 2) if sample_rate else None
+    offset = 12
+    byte_rate = None
+    while offset + 8 <= len(data):
+        chunk_id = data[offset:offset + 4]
+        size = struct.unpack_from('<I', data, offset + 4)[0]
+        body = offset + 8
+        if chunk_id == b'fmt ' and body + 16 <= len(data):
+            byte_rate = struct.unpack_from('<I', data, body + 8)[0]
+        elif chunk_id == b'data':
+            if not byte_rate:
+                return None
+            # Streamed WAVs may leave the size at 0 or 0xFFFFFFFF; trust the bytes actually present
+            available = len(data) - body
+            data_size = size if 0 < size <= available else available
+            return data_size / byte_rate
+        offset = body + size + (size & 1)
+    return None
+
+
+def audio_duration(data, encoding, sample_rate=None):
+    """
+    Seconds of audio in data for a Google TTS audioEncoding, or None if it cannot be determined.
+    """
+    try:
+        if encoding == 'MP3':
+            return mp3_duration(data)
+        if encoding == 'OGG_OPUS':
+            return ogg_opus_duration(data)
+        if encoding == 'LINEAR16':
+            return wav_duration(data, sample_rate)
+    except (struct.error, IndexError, ZeroDivisionError) as e:
+        app_logger.warning("Could not parse %s audio duration: %s", encoding, e)
+    return None
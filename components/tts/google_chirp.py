@@ -1,28 +1,56 @@
 import os
-import requests
+import time
 import logging
+import base64
 from logging_config import app_logger, error_logger
+from components.http.upstream_client import upstream_post
+from components.tts.tts_cache import get_tts_cache, tts_cache_key
+from components.metrics.metrics import TTS_SYNTHESIS_SECONDS, TTS_AUDIO_BYTES
 
-def generate_tts_audio(text, voice="en-US-Wavenet-D", speaking_rate="1.0", pitch="0.0"):
+# Default voice settings
+DEFAULT_VOICE = "en-US-Wavenet-D"
+DEFAULT_RATE = 1.0
+DEFAULT_PITCH = 0.0
+AUDIO_ENCODING = os.getenv("TTS_AUDIO_ENCODING", "MP3")
+AUDIO_ENCODINGS = ("MP3", "OGG_OPUS", "LINEAR16")
+SAMPLE_RATES = (8000, 12000, 16000, 22050, 24000, 32000, 44100, 48000)
+OPUS_SAMPLE_RATES = (8000, 12000, 16000, 24000, 48000)
+
+def normalize_tts_params(voice=None, speaking_rate=None, pitch=None):
     """
-    Calls Google Chirp TTS API and returns audio content (base64).
+    Applies defaults so equivalent requests share the same settings (and cache key).
     """
-    CHIRP_API_URL = "https://texttospeech.googleapis.com/v1/text:synthesize"  # Example endpoint
-    CHIRP_API_KEY = os.getenv("TTS_API_KEY")
-
-    # Default voice settings
-    DEFAULT_VOICE = "en-US-Wavenet-D"
-    DEFAULT_RATE = 1.0
-    DEFAULT_PITCH = 0.0
+    return (
+        voice or DEFAULT_VOICE,
+        float(speaking_rate or DEFAULT_RATE),
+        float(pitch or DEFAULT_PITCH),
+    )
 
-    if not voice:
-        voice = DEFAULT_VOICE
+def normalize_audio_format(encoding=None, sample_rate=None):
+    """
+    Returns a supported (encoding, sample_rate) pair. Unknown encodings fall back
+    to TTS_AUDIO_ENCODING; a sample rate of None lets Google use the voice's native rate.
+    """
+    encoding = str(encoding or AUDIO_ENCODING).upper()
+    if encoding not in AUDIO_ENCODINGS:
+        encoding = AUDIO_ENCODING if AUDIO_ENCODING in AUDIO_ENCODINGS else "MP3"
+    try:
+        sample_rate = int(sample_rate or os.getenv("TTS_SAMPLE_RATE") or 0)
+    except (TypeError, ValueError):
+        sample_rate = 0
+    rates = OPUS_SAMPLE_RATES if encoding == "OGG_OPUS" else SAMPLE_RATES
+    return encoding, sample_rate if sample_rate in rates else None
 
-    if not speaking_rate:
-        speaking_rate = DEFAULT_RATE
+def generate_tts_audio(text, voice="en-US-Wavenet-D", speaking_rate="1.0", pitch="0.0", encoding=None, sample_rate=None):
+    """
+    Calls Google Chirp TTS API and returns audio content (base64).
+    encoding: MP3, OGG_OPUS or LINEAR16 (WAV); sample_rate: optional sampleRateHertz.
+    """
+    CHIRP_API_URL = os.getenv("TTS_API_URL", "https://texttospeech.googleapis.com/v1/text:synthesize")
+    CHIRP_API_KEY = os.getenv("TTS_API_KEY")
 
-    if not pitch:
-        pitch = DEFAULT_PITCH
+    voice, speaking_rate, pitch = normalize_tts_params(voice, speaking_rate, pitch)
+    encoding, sample_rate = normalize_audio_format(encoding, sample_rate)
 
     if not CHIRP_API_KEY:
         raise ValueError("TTS_API_KEY is not set in environment variables.")
@@ -35,20 +63,38 @@ def generate_tts_audio(text, voice="en-US-Wavenet-D", speaking_rate="1.0", pitch
         "input": {"text": text},
         "voice": {"languageCode": voice.split('-')[0] + '-' + voice.split('-')[1], "name": voice},
         "audioConfig": {
-            "audioEncoding": "MP3",
+            "audioEncoding": encoding,
             "speakingRate": speaking_rate,
             "pitch": pitch
         }
     }
+    if sample_rate:
+        payload["audioConfig"]["sampleRateHertz"] = sample_rate
 
+    started = time.perf_counter()
     try:
-        app_logger.info(f"TTS request: text={text[:30]}... voice={voice} rate={speaking_rate} pitch={pitch}")
-        response = requests.post(CHIRP_API_URL, json=payload, headers=headers)
+        app_logger.info("TTS request: text=%s... voice=%s rate=%s pitch=%s encoding=%s", text[:30], voice, speaking_rate, pitch, encoding)
+        response = upstream_post(CHIRP_API_URL, json=payload, headers=headers)
         response.raise_for_status()
         audio_content_base64 = response.json().get("audioContent")
         if not audio_content_base64:
             raise ValueError("No audio content returned from TTS API.")
+        TTS_SYNTHESIS_SECONDS.labels('ok').observe(time.perf_counter() - started)
+        TTS_AUDIO_BYTES.labels(encoding).observe(len(audio_content_base64) * 3 // 4)
         return audio_content_base64  # base64-encoded string
     except Exception as e:
+        TTS_SYNTHESIS_SECONDS.labels('error').observe(time.perf_counter() - started)
         error_logger.error(f"TTS generation error: {e}", exc_info=True)
         raise
+
+def get_tts_audio(text, voice=None, speaking_rate=None, pitch=None, encoding=None, sample_rate=None):
+    """
+    Returns synthesized audio bytes for text, served from the TTS cache when possible.
+    Concurrent identical requests share a single upstream call.
+    """
+    voice, speaking_rate, pitch = normalize_tts_params(voice, speaking_rate, pitch)
+    encoding, sample_rate = normalize_audio_format(encoding, sample_rate)
+    key = tts_cache_key(text, voice, speaking_rate, pitch, encoding, sample_rate)
+    return get_tts_cache().get_or_create(
+        key, lambda: base64.b64decode(generate_tts_audio(text, voice, speaking_rate, pitch, encoding, sample_rate))
+    )
@@ -0,0 +1,217 @@
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+import logging
+from logging_config import app_logger, error_logger
+
+
+def tts_cache_key(text, voice, speaking_rate, pitch, encoding, sample_rate=None):
+    """
+    Content-addressed key for a synthesized clip. The default sample rate is left
+    out so keys of clips cached before sample rates were selectable stay valid.
+    """
+    parts = [text, voice, float(speaking_rate), float(pitch), encoding]
+    if sample_rate:
+        parts.append(int(sample_rate))
+    raw = json.dumps(parts, ensure_ascii=False)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class TTSAudioCache:
+    """
+    Two-tier cache for synthesized audio bytes.
+
+    The memory tier is an LRU bounded by total bytes. The optional disk tier
+    stores one file per key and evicts least recently used files once the
+    directory exceeds max_disk_bytes. Concurrent misses for the same key are
+    coalesced so only one upstream request is made.
+    """
+
+    def __init__(self, max_memory_bytes=64 * 1024 * 1024, disk_dir=None, max_disk_bytes=512 * 1024 * 1024):
+        self.max_memory_bytes = max_memory_bytes
+        self.disk_dir = disk_dir
+        self.max_disk_bytes = max_disk_bytes
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._disk = OrderedDict()  # key -> size, least recently used first
+        self._disk_bytes = 0
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._stats = {
+            'memory_hits': 0,
+            'disk_hits': 0,
+            'misses': 0,
+            'coalesced': 0,
+            'memory_evictions': 0,
+            'disk_evictions': 0,
+        }
+        if disk_dir:
+            self._load_disk_index()
+
+    def _load_disk_index(self):
+        try:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            entries = []
+            for name in os.listdir(self.disk_dir):
+                if name.endswith('.audio'):
+                    st = os.stat(os.path.join(self.disk_dir, name))
+                    entries.append((st.st_mtime, name[:-len('.audio')], st.st_size))
+            for _, key, size in sorted(entries):
+                self._disk[key] = size
+                self._disk_bytes += size
+            self._evict_disk()
+        except Exception as e:
+            error_logger.error(f"TTS cache disk index error: {e}", exc_info=True)
+            self.disk_dir = None
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.audio")
+
+    def _put_memory(self, key, audio):
+        if len(audio) > self.max_memory_bytes:
+            return
+        with self._lock:
+            old = self._memory.pop(key, None)
+            if old is not None:
+                self._memory_bytes -= len(old)
+            self._memory[key] = audio
+            self._memory_bytes += len(audio)
+            while self._memory_bytes > self.max_memory_bytes:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_bytes -= len(evicted)
+                self._stats['memory_evictions'] += 1
+
+    def _put_disk(self, key, audio):
+        if not self.disk_dir or len(audio) > self.max_disk_bytes:
+            return
+        try:
+            path = self._disk_path(key)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(audio)
+            os.replace(tmp_path, path)
+            with self._lock:
+                self._disk_bytes -= self._disk.pop(key, 0)
+                self._disk[key] = len(audio)
+                self._disk_bytes += len(audio)
+            self._evict_disk()
+        except Exception as e:
+            error_logger.error(f"TTS cache disk write error: {e}", exc_info=True)
+
+    def _evict_disk(self):
+        while True:
+            with self._lock:
+                if self._disk_bytes <= self.max_disk_bytes or not self._disk:
+                    return
+                key, size = self._disk.popitem(last=False)
+                self._disk_bytes -= size
+                self._stats['disk_evictions'] += 1
+            try:
+                os.remove(self._disk_path(key))
+            except OSError:
+                pass
+
+    def get(self, key):
+        with self._lock:
+            audio = self._memory.get(key)
+            if audio is not None:
+                self._memory.move_to_end(key)
+                self._stats['memory_hits'] += 1
+                return audio
+            on_disk = self.disk_dir and key in self._disk
+            if on_disk:
+                self._disk.move_to_end(key)
+        if not on_disk:
+            return None
+        try:
+            with open(self._disk_path(key), 'rb') as f:
+                audio = f.read()
+            os.utime(self._disk_path(key))
+        except OSError:
+            with self._lock:
+                self._disk_bytes -= self._disk.pop(key, 0)
+            return None
+        self._stats['disk_hits'] += 1
+        self._put_memory(key, audio)
+        return audio
+
+    def put(self, key, audio):
+        self._put_memory(key, audio)
+        self._put_disk(key, audio)
+
+    def get_or_create(self, key, producer):
+        """
+        Returns cached audio for key, calling producer() at most once across concurrent callers on a miss.
+        """
+        while True:
+            audio = self.get(key)
+            if audio is not None:
+                return audio
+
+            with self._lock:
+                flight = self._inflight.get(key)
+                leader = flight is None
+                if leader:
+                    flight = self._inflight[key] = _Flight()
+                    self._stats['misses'] += 1
+                else:
+                    self._stats['coalesced'] += 1
+
+            if not leader:
+                flight.done.wait()
+                if isinstance(flight.error, Exception):
+                    raise flight.error
+                if flight.error is not None:
+                    # The leader was cancelled (e.g. its green thread was killed); try again
+                    continue
+                return flight.result
+
+            try:
+                flight.result = producer()
+                self.put(key, flight.result)
+                return flight.result
+            except BaseException as e:
+                flight.error = e
+                raise
+            finally:
+                with self._lock:
+                    self._inflight.pop(key, None)
+                flight.done.set()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update({
+                'memory_entries': len(self._memory),
+                'memory_bytes': self._memory_bytes,
+                'disk_entries': len(self._disk),
+                'disk_bytes': self._disk_bytes,
+            })
+        return stats
+
+
+_cache = None
+
+
+def get_tts_cache():
+    """
+    Returns the process-wide TTS audio cache configured from TTS_CACHE_* environment variables.
+    """
+    global _cache
+    if _cache is None:
+        _cache = TTSAudioCache(
+            max_memory_bytes=int(os.getenv('TTS_CACHE_MEMORY_BYTES', 64 * 1024 * 1024)),
+            disk_dir=os.getenv('TTS_CACHE_DIR') or None,
+            max_disk_bytes=int(os.getenv('TTS_CACHE_DISK_BYTES', 512 * 1024 * 1024)),
+        )
+        app_logger.info(f"TTS cache created (memory={_cache.max_memory_bytes} bytes, disk_dir={_cache.disk_dir}).")
+    return _cache
@@ -0,0 +1,24 @@
+import os
+
+# Each worker is a separate eventlet process; rooms and emits are shared through
+# SOCKETIO_MESSAGE_QUEUE. Gunicorn does not route a client back to the same
+# worker, so run more than one worker per instance only if clients use the
+# websocket transport exclusively. Otherwise scale by running several
+# single-worker instances behind a sticky load balancer (see README).
+worker_class = 'eventlet'
+workers = int(os.getenv('GUNICORN_WORKERS', 1))
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', 1000))
+bind = f"0.0.0.0:{os.getenv('PORT', 5000)}"
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 120))
+wsgi_app = 'server:app'
+
+
+def worker_exit(server, worker):
+    # Finish queued background jobs and pending message writes before the worker goes away
+    from monolithic.services.job_executor import get_job_executor
+    from components.postgres.message_writer import get_message_writer
+    from components.postgres.last_login_writer import get_last_login_writer
+    get_job_executor().drain(float(os.getenv('JOB_DRAIN_TIMEOUT', 30)))
+    get_message_writer().close()
+    get_last_login_writer().close()
@@ -1,5 +1,18 @@
 import logging
+import logging.handlers
 import os
+import time
+import atexit
+import random
+
+try:
+    # The listener must be a real OS thread so file writes never run on the eventlet hub
+    from eventlet.patcher import original
+    _threading = original('threading')
+    _queue = original('queue')
+except ImportError:
+    import threading as _threading
+    import queue as _queue
 
 # Ensure log directory exists
 LOG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'logs')
@@ -11,18 +24,199 @@ ERROR_LOG_PATH = os.path.join(LOG_DIR, 'error.log')
 # Log format includes file name
 LOG_FORMAT = '%(asctime)s %(levelname)s %(name)s [%(filename)s]: %(message)s'
 
+# "queue" hands records to a background listener; "sync" writes inline
+LOG_MODE = os.getenv('LOG_MODE', 'queue')
+LOG_MAX_BYTES = int(os.getenv('LOG_MAX_BYTES', 10 * 1024 * 1024))
+LOG_BACKUP_COUNT = int(os.getenv('LOG_BACKUP_COUNT', 5))
+LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', 10000))
+LOG_BATCH_SIZE = int(os.getenv('LOG_BATCH_SIZE', 256))
+# Semicolon-separated "<message prefix>=<rate>" rules; rate is a keep probability ("0.1") or a cap ("50/s")
+LOG_SAMPLING = os.getenv('LOG_SAMPLING', 'DB Query:=50/s')
+
+
+class BatchingFileHandler(logging.handlers.RotatingFileHandler):
+    """
+    Size-rotated file handler whose per-record flush is deferred until the listener finishes a batch.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.batching = False
+
+    def createLock(self):
+        # Used only from the listener's OS thread, so it must not be a green lock
+        self.lock = _threading.RLock()
+
+    def flush(self):
+        if not self.batching:
+            super().flush()
+
+
+class LazyQueueHandler(logging.handlers.QueueHandler):
+    """
+    Enqueues records without formatting them and counts records dropped because the queue is full.
+    """
+
+    def __init__(self, queue):
+        super().__init__(queue)
+        self.dropped = 0
+
+    def createLock(self):
+        self.lock = _threading.RLock()
+
+    def prepare(self, record):
+        # Formatting (message args, exc_info) happens on the listener thread
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except _queue.Full:
+            self.dropped += 1
+
+
+class BatchingQueueListener:
+    """
+    Background OS thread that drains the log queue in batches and routes records
+    to the handlers registered for their logger, flushing once per batch.
+    """
+
+    def __init__(self, queue, routes, batch_size=LOG_BATCH_SIZE):
+        self.queue = queue
+        self.routes = routes  # logger name -> handler
+        self.batch_size = batch_size
+        self.written = 0
+        self._stopping = False
+        self._thread = None
+
+    def start(self):
+        self._thread = _threading.Thread(target=self._run, name='log-listener', daemon=True)
+        self._thread.start()
+
+    def _write(self, batch):
+        handlers = set()
+        for record in batch:
+            handler = self.routes.get(record.name)
+            if handler is None or record.levelno < handler.level:
+                continue
+            handler.batching = True
+            handlers.add(handler)
+            handler.handle(record)
+            self.written += 1
+        for handler in handlers:
+            handler.batching = False
+            handler.flush()
+
+    def _run(self):
+        while True:
+            try:
+                record = self.queue.get(timeout=0.5)
+            except _queue.Empty:
+                if self._stopping:
+                    return
+                continue
+            batch = [record]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except _queue.Empty:
+                    break
+            self._write([r for r in batch if r is not None])
+            if self._stopping and self.queue.empty():
+                return
+
+    def stop(self):
+        self._stopping = True
+        self.queue.put(None)
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+
+class HotPathFilter(logging.Filter):
+    """
+    Samples or rate-limits records whose message template starts with one of the configured prefixes.
+    """
+
+    def __init__(self, rules):
+        super().__init__()
+        self.rules = []  # (prefix, probability or None, max per second or None)
+        for rule in filter(None, (r.strip() for r in rules.split(';'))):
+            prefix, _, rate = rule.rpartition('=')
+            if rate.endswith('/s'):
+                self.rules.append([prefix, None, float(rate[:-2])])
+            else:
+                self.rules.append([prefix, float(rate), None])
+        self._windows = {}  # prefix -> [window start, count]
+        self.suppressed = 0
+
+    def filter(self, record):
+        msg = record.msg if isinstance(record.msg, str) else ''
+        for prefix, probability, per_second in self.rules:
+            if not msg.startswith(prefix):
+                continue
+            if probability is not None:
+                keep = random.random() < probability
+            else:
+                now = time.monotonic()
+                window = self._windows.setdefault(prefix, [now, 0])
+                if now - window[0] >= 1.0:
+                    window[0], window[1] = now, 0
+                window[1] += 1
+                keep = window[1] <= per_second
+            if not keep:
+                self.suppressed += 1
+            return keep
+        return True
+
+
+def _file_handler(path, level):
+    if LOG_MODE == 'queue':
+        handler = BatchingFileHandler(path, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, delay=True)
+    else:
+        handler = logging.handlers.RotatingFileHandler(path, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT)
+    handler.setLevel(level)
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    return handler
+
+
 # App logger (all logs)
 app_logger = logging.getLogger('app_logger')
 app_logger.setLevel(logging.INFO)
-app_handler = logging.FileHandler(APP_LOG_PATH)
-app_handler.setFormatter(logging.Formatter(LOG_FORMAT))
-if not app_logger.hasHandlers():
-    app_logger.addHandler(app_handler)
+app_handler = _file_handler(APP_LOG_PATH, logging.INFO)
 
 # Error logger (errors only)
 error_logger = logging.getLogger('error_logger')
 error_logger.setLevel(logging.ERROR)
-error_handler = logging.FileHandler(ERROR_LOG_PATH)
-error_handler.setFormatter(logging.Formatter(LOG_FORMAT))
-if not error_logger.hasHandlers():
-    error_logger.addHandler(error_handler)
+error_handler = _file_handler(ERROR_LOG_PATH, logging.ERROR)
+
+hot_path_filter = HotPathFilter(LOG_SAMPLING)
+app_logger.addFilter(hot_path_filter)
+
+log_listener = None
+queue_handler = None
+
+if not app_logger.hasHandlers():
+    if LOG_MODE == 'queue':
+        log_queue = _queue.Queue(maxsize=LOG_QUEUE_SIZE)
+        queue_handler = LazyQueueHandler(log_queue)
+        log_listener = BatchingQueueListener(log_queue, {
+            app_logger.name: app_handler,
+            error_logger.name: error_handler,
+        })
+        log_listener.start()
+        atexit.register(log_listener.stop)
+        app_logger.addHandler(queue_handler)
+        error_logger.addHandler(queue_handler)
+    else:
+        app_logger.addHandler(app_handler)
+        error_logger.addHandler(error_handler)
+
+
+def get_logging_stats():
+    return {
+        'mode': LOG_MODE,
+        'queued': queue_handler.queue.qsize() if queue_handler else 0,
+        'dropped': queue_handler.dropped if queue_handler else 0,
+        'written': log_listener.written if log_listener else 0,
+        'suppressed': hot_path_filter.suppressed,
+    }
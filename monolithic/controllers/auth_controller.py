@@ -1,7 +1,7 @@
 
 from flask import request, jsonify
 from monolithic.services.auth_service import register_user, login_user, logout_user
-from monolithic.utils.jwt_utils import get_jwt_user_id
+from monolithic.utils.jwt_utils import current_user_id
 import logging
 from logging_config import app_logger, error_logger
 
@@ -10,7 +10,7 @@ def register():
         data = request.json
         email = data.get('email')
         password = data.get('password')
-        app_logger.info(f"Register attempt for email: {email}")
+        app_logger.info("Register attempt for email: %s", email)
         result, status = register_user(email, password)
         return jsonify(result), status
     except Exception as e:
@@ -22,7 +22,7 @@ def login():
         data = request.json
         email = data.get('email')
         password = data.get('password')
-        app_logger.info(f"Login attempt for email: {email}")
+        app_logger.info("Login attempt for email: %s", email)
         result, status = login_user(email, password)
         return jsonify(result), status
     except Exception as e:
@@ -32,7 +32,7 @@ def login():
 def logout():
     try:
         token = request.headers.get('Authorization', '').replace('Bearer ', '')
-        app_logger.info(f"Logout attempt with token: {token}")
+        app_logger.info("Logout attempt with token: %s", token)
         result, status = logout_user(token)
         return jsonify(result), status
     except Exception as e:
@@ -41,12 +41,8 @@ def logout():
 
 def verify_jwt():
     try:
-        token = request.headers.get('Authorization', '').replace('Bearer ', '')
-        user_id = get_jwt_user_id(request)
-        if not user_id:
-            app_logger.warning("user_id not found in token")
-            return jsonify({'error': 'user_id not found in token'}), 400
-        app_logger.info(f"JWT verified for user_id: {user_id}")
+        user_id = current_user_id()
+        app_logger.info("JWT verified for user_id: %s", user_id)
         return jsonify({'user_id': user_id}), 200
     except Exception as e:
         error_logger.error(f"JWT verify error: {e}", exc_info=True)
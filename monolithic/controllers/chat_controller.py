@@ -1,26 +1,34 @@
 from flask import request, jsonify
 from monolithic.services.chat_service import (
-    list_sessions, create_new_session, list_messages, handle_user_message,
+    list_sessions, create_new_session, list_messages, list_messages_page, handle_user_message,
     delete_session, update_session_title
 )
-from monolithic.utils.jwt_utils import get_jwt_user_id
+from monolithic.utils.jwt_utils import current_user_id
 import logging
 from logging_config import app_logger, error_logger
 
 def get_sessions():
     try:
-        user_id = get_jwt_user_id(request)
-        app_logger.info(f"Get sessions for user_id: {user_id}")
-        return jsonify(list_sessions(user_id)), 200
+        user_id = current_user_id()
+        app_logger.info("Get sessions for user_id: %s", user_id)
+        limit = request.args.get('limit')
+        if limit is not None:
+            limit = int(limit)
+            if limit < 1:
+                raise ValueError("limit must be a positive integer")
+        return jsonify(list_sessions(user_id, limit)), 200
+    except ValueError as e:
+        app_logger.warning("Get sessions bad request: %s", e)
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         error_logger.error(f"Get sessions error: {e}", exc_info=True)
         return jsonify({'error': str(e)}), 500
 
 def create_session():
     try:
-        user_id = get_jwt_user_id(request)
+        user_id = current_user_id()
         title = request.json.get('title', 'New Chat')
-        app_logger.info(f"Create session for user_id: {user_id}, title: {title}")
+        app_logger.info("Create session for user_id: %s, title: %s", user_id, title)
         session_id = create_new_session(user_id, title)
         return jsonify({'session_id': session_id}), 201
     except Exception as e:
@@ -29,19 +37,31 @@ def create_session():
 
 def get_messages(session_id):
     try:
-        user_id = get_jwt_user_id(request)
-        app_logger.info(f"Get messages for session_id: {session_id}, user_id: {user_id}")
-        return jsonify(list_messages(session_id, user_id)), 200
+        user_id = current_user_id()
+        app_logger.info("Get messages for session_id: %s, user_id: %s", session_id, user_id)
+        args = request.args
+        if not any(key in args for key in ('limit', 'before', 'after')):
+            return jsonify(list_messages(session_id, user_id)), 200
+        page = list_messages_page(
+            session_id, user_id,
+            limit=args.get('limit'), before=args.get('before'), after=args.get('after')
+        )
+        return jsonify(page), 200
+    except ValueError as e:
+        app_logger.warning("Get messages bad request: %s", e)
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         error_logger.error(f"Get messages error: {e}", exc_info=True)
         return jsonify({'error': str(e)}), 500
 
 def send_message(session_id):
     try:
-        user_id = get_jwt_user_id(request)
+        user_id = current_user_id()
         text = request.json.get('text')
-        app_logger.info(f"Send message for session_id: {session_id}, user_id: {user_id}")
+        app_logger.info("Send message for session_id: %s, user_id: %s", session_id, user_id)
         msg = handle_user_message(session_id, user_id, text)
+        if 'error' in msg:
+            return jsonify({'error': 'Failed to generate a response'}), 502
         return jsonify(msg), 201
     except Exception as e:
         error_logger.error(f"Send message error: {e}", exc_info=True)
@@ -49,8 +69,8 @@ def send_message(session_id):
 
 def delete_session_route(session_id):
     try:
-        user_id = get_jwt_user_id(request)
-        app_logger.info(f"Delete session {session_id} for user_id: {user_id}")
+        user_id = current_user_id()
+        app_logger.info("Delete session %s for user_id: %s", session_id, user_id)
         success = delete_session(session_id, user_id)
         if success:
             return jsonify({'message': 'Session deleted'}), 200
@@ -62,12 +82,12 @@ def delete_session_route(session_id):
 
 def update_session_title_route(session_id):
     try:
-        user_id = get_jwt_user_id(request)
+        user_id = current_user_id()
         new_title = request.json.get('title')
         if not new_title:
             app_logger.warning("Missing title for session title update")
             return jsonify({'error': 'Missing title'}), 400
-        app_logger.info(f"Update session title for session_id: {session_id}, user_id: {user_id}, new_title: {new_title}")
+        app_logger.info("Update session title for session_id: %s, user_id: %s, new_title: %s", session_id, user_id, new_title)
         success = update_session_title(session_id, user_id, new_title)
         if success:
             return jsonify({'message': 'Session title updated'}), 200
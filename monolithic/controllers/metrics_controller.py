@@ -0,0 +1,179 @@
+import os
+import time
+import hmac
+from flask import Response, request, jsonify, g
+from components.metrics.metrics import render_metrics, Counter, Gauge, HTTP_REQUEST_SECONDS
+from components.postgres.postgres_conn_utils import get_pool_stats
+from components.postgres.message_writer import get_message_writer
+from components.postgres.last_login_writer import get_last_login_writer
+from components.tts.tts_cache import get_tts_cache
+from components.llm_models.response_cache import get_llm_cache
+from monolithic.services.job_executor import get_job_executor
+from monolithic.services.context_builder import get_context_stats
+from monolithic.services.password_hasher import get_password_hasher
+from monolithic.socket.jobs import stream_jobs
+from monolithic.socket.utils import get_connected_socket_count
+import logging
+from logging_config import app_logger, error_logger, get_logging_stats
+
+_http_metrics = {}  # (endpoint, method, status) -> histogram child
+
+
+def _active_rooms(socketio):
+    """
+    Rooms with members on this process, excluding each socket's private sid room.
+    """
+    rooms = socketio.server.manager.rooms.get('/', {})
+    sids = rooms.get(None, {})
+    return sum(1 for room in rooms if room is not None and room not in sids)
+
+
+def _llm_cache_stats():
+    cache = get_llm_cache()
+    return cache.stats() if cache is not None else {}
+
+
+def _stat(source, key, scale=1):
+    """
+    Scrape-time callback for one value of a stats() dict; reports nothing while it is absent.
+    """
+    def callback():
+        stats = source()
+        return stats[key] * scale if key in stats else {}
+    return callback
+
+
+def _events(source, keys):
+    """
+    Scrape-time callback turning stats() counts into an {(event,): count} dict.
+    """
+    def callback():
+        stats = source()
+        return {(key,): stats[key] for key in keys if key in stats}
+    return callback
+
+
+def _job_queues(key, scale=1):
+    return lambda: {(name,): q[key] * scale for name, q in get_job_executor().stats()['queues'].items()}
+
+
+def _stream_jobs(stat):
+    return lambda: {(kind,): count for kind, count in stream_jobs.stats()[stat].items()}
+
+
+def _register_stats_metrics():
+    """
+    Exports the counts components keep in their stats() as callback counters and gauges.
+    """
+    Counter('db_pool_events', 'Database pool checkouts, new/recycled connections, failed health checks, waits and timeouts', ('event',),
+            callback=_events(get_pool_stats, ('checkouts', 'connections_created', 'connections_recycled',
+                                              'health_check_failures', 'rollbacks_on_return', 'waits', 'saturated', 'timeouts')))
+    Counter('db_pool_wait_seconds', 'Time spent waiting for a database connection',
+            callback=_stat(get_pool_stats, 'wait_time_total'))
+
+    Counter('job_queue_jobs', 'Executor jobs by queue and outcome', ('queue', 'event'),
+            callback=lambda: {(name, event): q[event] for name, q in get_job_executor().stats()['queues'].items()
+                              for event in ('submitted', 'started', 'completed', 'failed', 'rejected',
+                                            'expired', 'cancelled', 'killed', 'discarded')})
+    Counter('job_queue_wait_seconds', 'Time executor jobs waited before starting', ('queue',),
+            callback=_job_queues('wait_ms_total', 0.001))
+    Counter('job_queue_run_seconds', 'Time executor jobs ran', ('queue',), callback=_job_queues('run_ms_total', 0.001))
+    Gauge('job_queue_running', 'Executor jobs running in each queue', ('queue',), callback=_job_queues('running'))
+
+    for stat in ('started', 'completed', 'cancelled'):
+        Counter(f'stream_jobs_{stat}', f'Streaming jobs {stat}, by kind', ('kind',), callback=_stream_jobs(stat))
+    Counter('stream_jobs_saved_bytes', 'Audio bytes not sent because a streaming job was cancelled', ('kind',),
+            callback=_stream_jobs('bytes_saved'))
+    Counter('stream_jobs_saved_chars', 'Characters not generated because a streaming job was cancelled', ('kind',),
+            callback=_stream_jobs('chars_saved'))
+    Gauge('stream_jobs_active', 'Streaming jobs in flight', callback=lambda: stream_jobs.stats()['active'])
+
+    tts_stats = lambda: get_tts_cache().stats()
+    Counter('tts_cache_events', 'TTS audio cache hits, misses, coalesced requests and evictions', ('event',),
+            callback=_events(tts_stats, ('memory_hits', 'disk_hits', 'misses', 'coalesced',
+                                         'memory_evictions', 'disk_evictions')))
+    Gauge('tts_cache_entries', 'Clips in the TTS audio cache', ('tier',),
+          callback=lambda: {(tier,): tts_stats()[f'{tier}_entries'] for tier in ('memory', 'disk')})
+    Gauge('tts_cache_bytes', 'Bytes held by the TTS audio cache', ('tier',),
+          callback=lambda: {(tier,): tts_stats()[f'{tier}_bytes'] for tier in ('memory', 'disk')})
+
+    Counter('llm_cache_events', 'LLM response cache lookups and stores', ('event',),
+            callback=_events(_llm_cache_stats, ('hits', 'misses', 'expired', 'stores', 'evictions', 'bypassed')))
+    Gauge('llm_cache_entries', 'Responses in the LLM response cache', callback=_stat(_llm_cache_stats, 'entries'))
+    Gauge('llm_cache_bytes', 'Bytes held by the LLM response cache', callback=_stat(_llm_cache_stats, 'bytes'))
+
+    Counter('context_requests', 'Prompts built by the context builder', callback=_stat(get_context_stats, 'requests'))
+    Counter('context_summary_updates', 'Session summaries written', callback=_stat(get_context_stats, 'summary_updates'))
+
+    writer_stats = lambda: get_message_writer().stats()
+    Counter('message_writer_events', 'Message writer queueing, batches, rows written and failures', ('event',),
+            callback=_events(writer_stats, ('queued', 'queue_full', 'batches', 'exchanges_written',
+                                            'messages_written', 'failed')))
+    Gauge('message_writer_pending', 'Exchanges waiting to be written', callback=_stat(writer_stats, 'pending'))
+
+    login_stats = lambda: get_last_login_writer().stats()
+    Counter('last_login_writer_events', 'Last-login updates recorded, written, failed and dropped', ('event',),
+            callback=_events(login_stats, ('recorded', 'batches', 'written', 'failed', 'dropped')))
+    Gauge('last_login_writer_pending', 'Users with a last-login update waiting', callback=_stat(login_stats, 'pending'))
+
+    hasher_stats = lambda: get_password_hasher().stats()
+    Counter('password_hash_operations', 'Password hashes, verifications, rehashes and rejections', ('event',),
+            callback=_events(hasher_stats, ('hash', 'verify', 'rehashed', 'rejected')))
+    Gauge('password_hash_waiting', 'Password hashing requests waiting for a worker', callback=_stat(hasher_stats, 'waiting'))
+
+    Counter('log_records', 'Log records written, dropped by a full queue, or suppressed by sampling', ('event',),
+            callback=_events(get_logging_stats, ('written', 'dropped', 'suppressed')))
+    Gauge('log_queue_depth', 'Log records waiting for the writer thread', callback=_stat(get_logging_stats, 'queued'))
+
+
+def _start_timer():
+    g.metrics_started = time.perf_counter()
+
+
+def _observe_request(response):
+    started = g.pop('metrics_started', None)
+    if started is not None:
+        key = (request.endpoint or 'unmatched', request.method, str(response.status_code))
+        child = _http_metrics.get(key)
+        if child is None:
+            child = _http_metrics[key] = HTTP_REQUEST_SECONDS.labels(*key)
+        child.observe(time.perf_counter() - started)
+    return response
+
+
+def init_metrics(app, socketio):
+    """
+    Registers REST latency hooks and the scrape-time gauges.
+    """
+    try:
+        app.before_request(_start_timer)
+        app.after_request(_observe_request)
+        Gauge('socketio_connected_sockets', 'Authenticated Socket.IO connections on this process',
+              callback=get_connected_socket_count)
+        Gauge('socketio_active_rooms', 'Socket.IO rooms with members on this process',
+              callback=lambda: _active_rooms(socketio))
+        Gauge('db_pool_connections', 'Database pool connections by state', ('state',),
+              callback=lambda: {(state,): get_pool_stats().get(state, 0) for state in ('in_use', 'idle')})
+        Gauge('job_queue_depth', 'Jobs waiting in each executor queue', ('queue',),
+              callback=_job_queues('depth'))
+        _register_stats_metrics()
+        app_logger.info("Metrics initialized.")
+    except Exception as e:
+        error_logger.error(f"init_metrics error: {e}", exc_info=True)
+
+
+def get_metrics():
+    """
+    Prometheus text exposition of this process's metrics. When METRICS_TOKEN is set
+    the scraper must send it as a bearer token.
+    """
+    token = os.getenv('METRICS_TOKEN')
+    if token:
+        supplied = request.headers.get('Authorization', '').replace('Bearer ', '').strip()
+        if not hmac.compare_digest(supplied.encode('utf-8'), token.encode('utf-8')):
+            return jsonify({'error': 'Unauthorized'}), 401
+    try:
+        return Response(render_metrics(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+    except Exception as e:
+        error_logger.error(f"Get metrics error: {e}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
@@ -1,4 +1,5 @@
 from flask import Blueprint
+from monolithic.utils.jwt_utils import require_auth
 from monolithic.controllers.auth_controller import register, login, logout, verify_jwt
 
 auth_bp = Blueprint('auth', __name__)
@@ -6,4 +7,4 @@ auth_bp = Blueprint('auth', __name__)
 auth_bp.route('/register', methods=['POST'])(register)
 auth_bp.route('/login', methods=['POST'])(login)
 auth_bp.route('/logout', methods=['POST'])(logout)
-auth_bp.route('/verify', methods=['GET'])(verify_jwt)
\ No newline at end of file
+auth_bp.route('/verify', methods=['GET'])(require_auth(verify_jwt))
\ No newline at end of file
@@ -1,10 +1,12 @@
 from flask import Blueprint
+from monolithic.utils.jwt_utils import authenticate_request
 from monolithic.controllers.chat_controller import (
     get_sessions, create_session, get_messages, send_message,
     delete_session_route, update_session_title_route
 )
 
 chat_bp = Blueprint('chat', __name__)
+chat_bp.before_request(authenticate_request)
 
 chat_bp.route('/sessions', methods=['GET'])(get_sessions)
 chat_bp.route('/sessions', methods=['POST'])(create_session)
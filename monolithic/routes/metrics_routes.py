@@ -0,0 +1,6 @@
+from flask import Blueprint
+from monolithic.controllers.metrics_controller import get_metrics
+
+metrics_bp = Blueprint('metrics', __name__)
+
+metrics_bp.route('/metrics', methods=['GET'])(get_metrics)
@@ -1,13 +1,14 @@
 import datetime
 import jwt
-from werkzeug.security import generate_password_hash, check_password_hash
 from flask import current_app, request
 from components.postgres.auth_queries import (
     get_user_by_email_db,
-    user_exists_db,
-    create_user_db,
-    update_last_login_db
+    register_user_db,
+    update_password_hash_db
 )
+from components.postgres.last_login_writer import get_last_login_writer
+from monolithic.services.password_hasher import get_password_hasher, HasherBusy
+from monolithic.utils.jwt_utils import forget_token
 import logging
 from logging_config import app_logger, error_logger
 
@@ -16,18 +17,21 @@ def register_user(email, password):
         if not email or not password:
             app_logger.warning("Missing email or password in register_user")
             return {'error': 'Missing email or password'}, 400
-        if user_exists_db(email):
-            app_logger.warning(f"Email already registered: {email}")
+        # One INSERT ... ON CONFLICT decides uniqueness (no check-then-insert race) and stamps the login
+        password_hash = get_password_hasher().hash(password)
+        user_id = register_user_db(email, password_hash)
+        if user_id is None:
+            app_logger.warning("Email already registered: %s", email)
             return {'error': 'Email already registered'}, 409
-        password_hash = generate_password_hash(password)
-        user_id = create_user_db(email, password_hash)
         token = jwt.encode({
             'user_id': user_id,
             'exp': (datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(hours=24)).timestamp()
         }, current_app.config['SECRET_KEY'], algorithm='HS256')
-        update_last_login_db(user_id)
-        app_logger.info(f"User registered: {email}, user_id: {user_id}")
+        app_logger.info("User registered: %s, user_id: %s", email, user_id)
         return {'message': 'User registered and logged in successfully', 'token': token, 'user_id': user_id}, 201
+    except HasherBusy as e:
+        app_logger.warning("register_user shed: %s", e)
+        return {'error': 'Server busy, please try again'}, 503
     except Exception as e:
         error_logger.error(f"register_user error: {e}", exc_info=True)
         return {'error': str(e)}, 500
@@ -35,24 +39,33 @@ def register_user(email, password):
 def login_user(email, password):
     try:
         user = get_user_by_email_db(email)
-        if not user or not check_password_hash(user[1], password):
-            app_logger.warning(f"Invalid login credentials for email: {email}")
+        valid, new_hash = get_password_hasher().verify_and_update(user[1], password) if user else (False, None)
+        if not valid:
+            app_logger.warning("Invalid login credentials for email: %s", email)
             return {'error': 'Invalid credentials'}, 401
+        if new_hash:
+            # Stored with outdated hash parameters; upgrade now that the plain password is at hand
+            update_password_hash_db(user[0], new_hash)
         token = jwt.encode({
             'user_id': user[0],
             'exp': (datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(hours=24)).timestamp()
         }, current_app.config['SECRET_KEY'], algorithm='HS256')
-        update_last_login_db(user[0])
-        app_logger.info(f"User logged in: {email}, user_id: {user[0]}")
+        get_last_login_writer().record(user[0])
+        app_logger.info("User logged in: %s, user_id: %s", email, user[0])
         return {'token': token}, 200
+    except HasherBusy as e:
+        app_logger.warning("login_user shed: %s", e)
+        return {'error': 'Server busy, please try again'}, 503
     except Exception as e:
         error_logger.error(f"login_user error: {e}", exc_info=True)
         return {'error': str(e)}, 500
 
 def logout_user(token):
     try:
-        app_logger.info(f"Logout called for token: {token}")
-        # JWT is stateless; client should delete token
+        app_logger.info("Logout called for token: %s", token)
+        # JWT is stateless; client should delete token. Dropping it from the verified-token
+        # cache only stops it being served from memory, it still verifies until `exp`
+        forget_token(token)
         return {'message': 'Logged out'}, 200
     except Exception as e:
         error_logger.error(f"logout_user error: {e}", exc_info=True)
@@ -1,28 +1,57 @@
-import sys
+import os
+import json
+import base64
+import time
+import datetime
+import threading
+import eventlet
 from components.postgres.chat_queries import (
     get_sessions_db,
     create_session_db,
     get_messages_db,
-    add_user_message_db,
-    add_ai_message_db,
+    get_messages_page_db,
     delete_session_db,
     update_session_title_db
 )
-from components.llm_models.gemini_flash import get_gemini_response_stream, get_gemini_response
+from components.postgres.message_writer import new_message, get_message_writer
+from components.postgres.session_cache import get_session_cache
+from components.llm_models.gemini_flash import get_gemini_response_stream, get_gemini_response, GeminiError
+from monolithic.services.context_builder import build_context, empty_context, refresh_summary
+from monolithic.services.pipeline_timing import PipelineTimer
+from monolithic.services.job_executor import get_job_executor, JobRejected
+from monolithic.socket.emitter import emit
+from monolithic.socket.jobs import JobCancelled
 import logging
 from logging_config import app_logger, error_logger
 
-def list_sessions(user_id):
+def list_sessions(user_id, limit=None):
+    """
+    Returns the user's sessions, most recently active first, served from the
+    session-list cache when possible.
+    """
     try:
-        app_logger.info(f"Listing sessions for user_id: {user_id}")
-        return get_sessions_db(user_id)
+        app_logger.info("Listing sessions for user_id: %s", user_id)
+        cache = get_session_cache()
+        if cache is None:
+            return get_sessions_db(user_id, limit) or []
+        sessions = cache.get(user_id, limit)
+        if sessions is not None:
+            return sessions
+        version = cache.version(user_id)
+        # Read past the cache's cap so the list can also answer smaller limits and tell if it is complete
+        fetch = None if limit is None else max(limit, cache.max_sessions + 1)
+        sessions = get_sessions_db(user_id, fetch)
+        if sessions is None:
+            return []
+        cache.fill(user_id, sessions, fetch is None or len(sessions) < fetch, version)
+        return sessions[:limit]
     except Exception as e:
         error_logger.error(f"list_sessions error: {e}", exc_info=True)
         return []
 
 def create_new_session(user_id, title):
     try:
-        app_logger.info(f"Creating new session for user_id: {user_id}, title: {title}")
+        app_logger.info("Creating new session for user_id: %s, title: %s", user_id, title)
         return create_session_db(user_id, title)
     except Exception as e:
         error_logger.error(f"create_new_session error: {e}", exc_info=True)
@@ -30,48 +59,244 @@ def create_new_session(user_id, title):
 
 def list_messages(session_id, user_id):
     try:
-        app_logger.info(f"Listing messages for session_id: {session_id}, user_id: {user_id}")
+        app_logger.info("Listing messages for session_id: %s, user_id: %s", session_id, user_id)
         return get_messages_db(session_id)
     except Exception as e:
         error_logger.error(f"list_messages error: {e}", exc_info=True)
         return []
 
-def handle_user_message(session_id, user_id, text, is_first_message=False):
+MESSAGES_PAGE_DEFAULT = int(os.getenv('MESSAGES_PAGE_DEFAULT', 50))
+MESSAGES_PAGE_MAX = int(os.getenv('MESSAGES_PAGE_MAX', 100))
+
+def encode_message_cursor(message):
+    """
+    Opaque cursor for a message's (created_at, id) position.
+    """
+    raw = json.dumps([message['created_at'].isoformat(), str(message['id'])])
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_message_cursor(cursor):
+    """
+    Returns the (created_at, id) tuple encoded in cursor; raises ValueError if it is malformed.
+    """
     try:
-        app_logger.info(f"Handling user message for session_id: {session_id}, user_id: {user_id}")
-        msg_id = add_user_message_db(session_id, text)
-        ai_text_chunks = [chunk for chunk in get_gemini_response_stream(text)] # Streamed chunks
-        ai_text = ''.join(ai_text_chunks)
-        ai_msg_id = add_ai_message_db(session_id, ai_text)
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, message_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        return datetime.datetime.fromisoformat(created_at), str(message_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
 
-        # Auto-generate session title if flagged as first message
-        if is_first_message:
-            prompt = f"Generate strictly only one concise chat title, 3-4 words only, plain text, no symbols for this conversation: {ai_text}"
-            new_title = get_gemini_response(prompt)
-            update_session_title_db(session_id, user_id, new_title)
+def list_messages_page(session_id, user_id, limit=None, before=None, after=None):
+    """
+    Cursor-paginated message history. Without cursors the newest page is returned;
+    `before` pages back through older messages and `after` fetches newer ones.
+    Raises ValueError for malformed cursors or limits.
+    """
+    if before and after:
+        raise ValueError("Use either before or after, not both")
+    limit = int(limit) if limit else MESSAGES_PAGE_DEFAULT
+    if limit < 1:
+        raise ValueError("limit must be positive")
+    limit = min(limit, MESSAGES_PAGE_MAX)
+    before_key = decode_message_cursor(before) if before else None
+    after_key = decode_message_cursor(after) if after else None
+
+    app_logger.info("Listing message page for session_id: %s, user_id: %s", session_id, user_id)
+    messages, has_more = get_messages_page_db(session_id, limit, before=before_key, after=after_key)
+
+    # Older messages exist before the first row unless a newest/before page ran out of history
+    has_older = has_more if after_key is None else True
+    has_newer = has_more if after_key is not None else before_key is not None
+    return {
+        'messages': messages,
+        'before': encode_message_cursor(messages[0]) if messages and has_older else None,
+        'after': encode_message_cursor(messages[-1]) if messages and has_newer else None,
+    }
+
+# Per-stage deadlines in seconds (0 disables); title is measured from message arrival
+PIPELINE_CONTEXT_TIMEOUT = float(os.getenv('PIPELINE_CONTEXT_TIMEOUT', 2))
+PIPELINE_FIRST_CHUNK_TIMEOUT = float(os.getenv('PIPELINE_FIRST_CHUNK_TIMEOUT', 20))
+PIPELINE_LLM_TIMEOUT = float(os.getenv('PIPELINE_LLM_TIMEOUT', 120))
+PIPELINE_TITLE_TIMEOUT = float(os.getenv('PIPELINE_TITLE_TIMEOUT', 15))
+
+def generate_session_title(text, timer=None):
+    """
+    Generates a short session title from the user's first message.
+    """
+    started = time.monotonic()
+    prompt = f"Generate strictly only one concise chat title, 3-4 words only, plain text, no symbols for a conversation that starts with: {text}"
+    try:
+        title = get_gemini_response(prompt)
+    except GeminiError:
+        return None
+    finally:
+        if timer is not None:
+            timer.add('title', started)
+    return title.strip() or None
+
+def _load_context(session_id, text):
+    context = None
+    with eventlet.Timeout(PIPELINE_CONTEXT_TIMEOUT or None, False):
+        context = build_context(session_id, text)
+    if context is None:
+        app_logger.warning("Context for session_id: %s timed out, continuing without history", session_id)
+        context = empty_context(session_id, text)
+    return context
+
+def _stream_reply(text, context, on_chunk, timer, chunks):
+    """
+    Streams the Gemini reply into chunks, enforcing the first-chunk and total deadlines.
+    Chunks received before an error or cancellation stay in the list.
+    """
+    stream = get_gemini_response_stream(text, context)
+    first_chunk = eventlet.Timeout(PIPELINE_FIRST_CHUNK_TIMEOUT or None)
+    deadline = eventlet.Timeout(PIPELINE_LLM_TIMEOUT or None)
+    try:
+        for chunk in stream:
+            if not chunks:
+                first_chunk.cancel()
+                timer.mark('first_chunk')
+            if on_chunk:
+                on_chunk(chunk)
+            # Appended after on_chunk, so a cancelled delivery is not counted as received
+            chunks.append(chunk)
+    except eventlet.Timeout as t:
+        if t is first_chunk:
+            raise TimeoutError(f"No response chunk within {PIPELINE_FIRST_CHUNK_TIMEOUT}s")
+        if t is deadline:
+            raise TimeoutError(f"Response not complete within {PIPELINE_LLM_TIMEOUT}s")
+        raise
+    finally:
+        first_chunk.cancel()
+        deadline.cancel()
+        stream.close()
+
+def _start_title_job(session_id, user_id, text, timer):
+    """
+    Queues title generation on the executor's lowest-priority queue. Returns the job, or None if it was shed.
+    """
+    try:
+        return get_job_executor().submit('title', generate_session_title, text, timer,
+                                         key=(str(user_id), 'title', session_id))
+    except JobRejected as e:
+        app_logger.warning("Title generation for session_id: %s skipped: %s", session_id, e)
+        return None
+
+def _finish_exchange(session_id, user_id, context, user_msg, ai_msg, title_job, timer):
+    """
+    Waits (within its deadline) for the title, persists the exchange and refreshes the summary.
+    """
+    try:
+        new_title = None
+        if title_job is not None:
+            with eventlet.Timeout(timer.remaining(PIPELINE_TITLE_TIMEOUT), False):
+                try:
+                    new_title = title_job.wait()
+                except Exception as e:
+                    error_logger.error(f"Title generation error: {e}", exc_info=True)
+            if not title_job.done:
+                title_job.cancel()
+                app_logger.warning("Title generation for session_id: %s missed its deadline", session_id)
+
+        started = time.monotonic()
+        get_message_writer().write_exchange(session_id, user_id, [user_msg, ai_msg], title=new_title)
+        timer.add('persist', started)
+        if context['backlog'] or context['summary_behind']:
+            # Folding old turns into the summary is off the response path
+            threading.Thread(target=refresh_summary, args=(context,), daemon=True).start()
+
+        if new_title:
             try:
-                socketio = sys.modules.get('server_socketio')
-                if socketio:
-                    socketio.emit('session:title:update', {
-                        'session_id': session_id,
-                        'title': new_title
-                    }, room=str(user_id))
+                emit('session:title:update', {
+                    'session_id': session_id,
+                    'title': new_title
+                }, room=str(user_id))
             except Exception as e:
                 error_logger.error(f"Socket Emit Error: {e}", exc_info=True)
+    except Exception as e:
+        error_logger.error(f"_finish_exchange error: {e}", exc_info=True)
+    finally:
+        timer.release()
+
+def handle_user_message(session_id, user_id, text, is_first_message=False, on_chunk=None,
+                        ai_msg_id=None, background_persist=False, timer=None):
+    """
+    Streams the Gemini reply (with the session's token-budgeted history as
+    context) and persists the user message, reply and any new title as one exchange.
+
+    Title generation starts from the user's text alongside the reply, and
+    message IDs are generated up front, so neither the title nor the database
+    is on the path to the first chunk.
+    on_chunk: Optional callable invoked with each text delta as soon as it arrives.
+    ai_msg_id: Optional pre-generated ID for the reply, so callers can key work (e.g. TTS) on it early.
+    background_persist: Return as soon as the reply is complete and persist on a green thread.
+    timer: Optional PipelineTimer shared with the caller's concurrent stages.
+    """
+    timer = (timer or PipelineTimer(session_id)).hold()
+    title_job = None
+    try:
+        app_logger.info("Handling user message for session_id: %s, user_id: %s", session_id, user_id)
+        if is_first_message:
+            title_job = _start_title_job(session_id, user_id, text, timer)
+
+        started = time.monotonic()
+        context = _load_context(session_id, text)
+        timer.add('context', started)
+        user_msg = new_message(session_id, 'USER', text)
+
+        started = time.monotonic()
+        ai_text_chunks = []
+        try:
+            _stream_reply(text, context, on_chunk, timer, ai_text_chunks)
+        except JobCancelled as e:
+            # The client went away mid-reply. Keep the part it already received so
+            # the history matches what the user saw; the summary is left as is.
+            ai_text = ''.join(ai_text_chunks)
+            messages = [user_msg]
+            if ai_text:
+                messages.append(new_message(session_id, 'AI', ai_text, message_id=ai_msg_id))
+            get_message_writer().write_exchange(session_id, user_id, messages)
+            app_logger.info("Reply for session_id: %s cancelled after %s chars (%s)", session_id, len(ai_text), e)
+            return {
+                'cancelled': str(e),
+                'user_msg_id': user_msg['id'],
+                'ai_msg_id': messages[-1]['id'] if ai_text else None,
+                'ai_text': ai_text,
+                'ai_text_chunks': ai_text_chunks
+            }
+        except Exception:
+            # Keep the user's message even if the reply was cancelled or failed
+            get_message_writer().write_exchange(session_id, user_id, [user_msg])
+            raise
+        timer.add('llm', started)
+        ai_text = ''.join(ai_text_chunks)
+        ai_msg = new_message(session_id, 'AI', ai_text, message_id=ai_msg_id)
+
+        timer.hold()
+        finish_args = (session_id, user_id, context, user_msg, ai_msg, title_job, timer)
+        title_job = None
+        if background_persist:
+            eventlet.spawn_n(_finish_exchange, *finish_args)
+        else:
+            _finish_exchange(*finish_args)
 
         return {
-            'user_msg_id': msg_id,
-            'ai_msg_id': ai_msg_id,
+            'user_msg_id': user_msg['id'],
+            'ai_msg_id': ai_msg['id'],
             'ai_text': ai_text,
             'ai_text_chunks': ai_text_chunks
         }
     except Exception as e:
         error_logger.error(f"handle_user_message error: {e}", exc_info=True)
         return {'error': str(e)}
+    finally:
+        if title_job is not None:
+            title_job.cancel()
+        timer.release()
 
 def delete_session(session_id, user_id):
     try:
-        app_logger.info(f"Deleting session {session_id} for user_id: {user_id}")
+        app_logger.info("Deleting session %s for user_id: %s", session_id, user_id)
         return delete_session_db(session_id, user_id)
     except Exception as e:
         error_logger.error(f"delete_session error: {e}", exc_info=True)
@@ -79,7 +304,7 @@ def delete_session(session_id, user_id):
 
 def update_session_title(session_id, user_id, new_title):
     try:
-        app_logger.info(f"Updating session title for session_id: {session_id}, user_id: {user_id}, new_title: {new_title}")
+        app_logger.info("Updating session title for session_id: %s, user_id: %s, new_title: %s", session_id, user_id, new_title)
         return update_session_title_db(session_id, user_id, new_title)
     except Exception as e:
         error_logger.error(f"update_session_title error: {e}", exc_info=True)
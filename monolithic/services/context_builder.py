@@ -0,0 +1,233 @@
+import os
+import threading
+from collections import OrderedDict
+from components.postgres.postgres_conn_utils import get_pool
+from components.postgres.chat_queries import (
+    get_messages_page_db,
+    get_messages_since_db,
+    get_session_summary_db,
+    update_session_summary_db
+)
+from components.llm_models.gemini_flash import get_gemini_response
+from components.metrics.metrics import CONTEXT_PROMPT_TOKENS
+import logging
+from logging_config import app_logger, error_logger
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv('CONTEXT_TOKEN_BUDGET', 4000))
+CONTEXT_HISTORY_LIMIT = int(os.getenv('CONTEXT_HISTORY_LIMIT', 50))
+SUMMARY_MIN_BACKLOG_TOKENS = int(os.getenv('SUMMARY_MIN_BACKLOG_TOKENS', 800))
+SUMMARY_MAX_WORDS = int(os.getenv('SUMMARY_MAX_WORDS', 250))
+SUMMARY_CACHE_SIZE = int(os.getenv('SUMMARY_CACHE_SIZE', 1000))
+
+_ROLES = {'USER': 'user', 'AI': 'model'}
+_NO_SUMMARY = (None, None, None)
+
+# session_id -> (summary, until_created_at, until_id), most recently used last
+_summary_cache = OrderedDict()
+_summary_lock = threading.Lock()
+# Sessions with a summary update running in this process
+_refreshing = set()
+
+_stats = {
+    'requests': 0,
+    'prompt_tokens_total': 0,
+    'prompt_tokens_max': 0,
+    'prompt_tokens_last': 0,
+    'summary_updates': 0,
+}
+
+
+def estimate_tokens(text):
+    """
+    Cheap token estimate (~4 characters per token) used for budgeting.
+    """
+    return (len(text) + 3) // 4 if text else 0
+
+
+def _cache_summary(session_id, summary):
+    with _summary_lock:
+        _summary_cache[session_id] = summary
+        _summary_cache.move_to_end(session_id)
+        while len(_summary_cache) > SUMMARY_CACHE_SIZE:
+            _summary_cache.popitem(last=False)
+
+
+def _get_summary(session_id):
+    with _summary_lock:
+        summary = _summary_cache.get(session_id)
+        if summary is not None:
+            _summary_cache.move_to_end(session_id)
+            return summary
+    summary = get_session_summary_db(session_id) or _NO_SUMMARY
+    _cache_summary(session_id, summary)
+    return summary
+
+
+def _key(message):
+    return message['created_at'], str(message['id'])
+
+
+def _to_contents(messages):
+    """
+    Converts stored messages to Gemini contents, merging consecutive turns of the same role.
+    """
+    contents = []
+    for message in messages:
+        role = _ROLES.get(message['sender'])
+        if role is None:
+            continue
+        if contents and contents[-1]['role'] == role:
+            contents[-1]['parts'].append({'text': message['text']})
+        else:
+            contents.append({'role': role, 'parts': [{'text': message['text']}]})
+    return contents
+
+
+def build_context(session_id, user_text):
+    """
+    Assembles the prompt context for a new user message.
+
+    The most recent turns are included newest-first until CONTEXT_TOKEN_BUDGET
+    (minus the new message and the rolling summary) is spent. Turns that no
+    longer fit and are not yet part of the summary are returned as `backlog`
+    for refresh_summary(); `summary_behind` is set when unsummarized turns also
+    lie before the CONTEXT_HISTORY_LIMIT window. Call this before the new user
+    message is persisted.
+    """
+    try:
+        summary, until_at, until_id = _get_summary(session_id)
+        history, has_more = get_messages_page_db(session_id, CONTEXT_HISTORY_LIMIT)
+        summary_behind = has_more
+        if until_at is not None:
+            unsummarized = [m for m in history if _key(m) > (until_at, until_id)]
+            # Older turns are only unsummarized if the cursor is not inside the window
+            summary_behind = has_more and len(unsummarized) == len(history)
+            history = unsummarized
+
+        fixed_tokens = estimate_tokens(user_text) + estimate_tokens(summary)
+        budget = CONTEXT_TOKEN_BUDGET - fixed_tokens
+        used = 0
+        included = 0
+        for message in reversed(history):
+            cost = estimate_tokens(message['text'])
+            if used + cost > budget:
+                break
+            used += cost
+            included += 1
+
+        recent = history[len(history) - included:]
+        backlog = history[:len(history) - included]
+        prompt_tokens = fixed_tokens + used
+        _record_prompt_tokens(prompt_tokens)
+        app_logger.info("Context for session_id: %s: %s turns, %s prompt tokens, %s backlog turns",
+                        session_id, included, prompt_tokens, len(backlog))
+        return {
+            'session_id': session_id,
+            'contents': _to_contents(recent),
+            'system_instruction': f"Summary of the earlier conversation: {summary}" if summary else None,
+            'summary': summary,
+            'summary_until': (until_at, until_id) if until_at is not None else None,
+            'summary_behind': summary_behind,
+            'window_start': _key(history[0]) if history else None,
+            'backlog': backlog,
+            'prompt_tokens': prompt_tokens,
+        }
+    except Exception as e:
+        error_logger.error(f"build_context error: {e}", exc_info=True)
+        return empty_context(session_id, user_text)
+
+
+def empty_context(session_id, user_text):
+    """
+    Context without history, used when the history could not be loaded in time.
+    """
+    return {'session_id': session_id, 'contents': [], 'system_instruction': None,
+            'summary': None, 'summary_until': None, 'summary_behind': False, 'window_start': None,
+            'backlog': [], 'prompt_tokens': estimate_tokens(user_text)}
+
+
+def _unsummarized_backlog(context, conn):
+    """
+    Every unsummarized turn that is out of the prompt, oldest first, and whether
+    more are waiting. Turns before the history window are read from the database,
+    so turns that left the window unsummarized are never skipped.
+    """
+    backlog = context.get('backlog') or []
+    if not context.get('summary_behind'):
+        return backlog, False
+    older, has_more = get_messages_since_db(context['session_id'], context.get('summary_until'),
+                                            CONTEXT_HISTORY_LIMIT, conn=conn)
+    if older is None:
+        return [], False
+    window_start = context.get('window_start')
+    if window_start is not None:
+        older = [m for m in older if _key(m) < window_start]
+        has_more = has_more and len(older) == CONTEXT_HISTORY_LIMIT
+    # Only continue with the window's backlog if the older turns reach it, so the summary stays contiguous
+    return (older if has_more else older + backlog), has_more
+
+
+def refresh_summary(context):
+    """
+    Folds unsummarized turns that are out of the prompt into the session's
+    rolling summary once SUMMARY_MIN_BACKLOG_TOKENS of them have built up; a
+    full page of turns from before the history window is folded regardless.
+    Only the new turns are sent along with the previous summary, so the cost
+    does not grow with session length.
+
+    Runs on its own thread, outside any request, so it uses pooled connections
+    directly. Returns True if the summary was updated and saved.
+    """
+    session_id = context['session_id']
+    with _summary_lock:
+        if session_id in _refreshing:
+            return False
+        _refreshing.add(session_id)
+    try:
+        with get_pool().connection() as conn:
+            backlog, full_page = _unsummarized_backlog(context, conn)
+        if not backlog:
+            return False
+        if not full_page and sum(estimate_tokens(m['text']) for m in backlog) < SUMMARY_MIN_BACKLOG_TOKENS:
+            return False
+        transcript = '\n'.join(f"{m['sender']}: {m['text']}" for m in backlog if m['sender'] in _ROLES)
+        prompt = (
+            f"Update the running summary of a conversation between a user and an AI assistant. "
+            f"Keep facts, decisions, names and open questions; stay under {SUMMARY_MAX_WORDS} words; plain text only.\n\n"
+            f"Current summary:\n{context.get('summary') or '(none)'}\n\n"
+            f"New turns:\n{transcript}"
+        )
+        new_summary = get_gemini_response(prompt, use_cache=False)
+        if not new_summary:
+            return False
+        last = backlog[-1]
+        summary = (new_summary.strip(), last['created_at'], str(last['id']))
+        with get_pool().connection() as conn:
+            saved = update_session_summary_db(session_id, *summary, conn=conn)
+        if not saved:
+            app_logger.warning("Summary for session_id: %s was not saved", session_id)
+            return False
+        _cache_summary(session_id, summary)
+        _stats['summary_updates'] += 1
+        app_logger.info("Summary updated for session_id: %s with %s turns", session_id, len(backlog))
+        return True
+    except Exception as e:
+        error_logger.error(f"refresh_summary error: {e}", exc_info=True)
+        return False
+    finally:
+        with _summary_lock:
+            _refreshing.discard(session_id)
+
+
+def _record_prompt_tokens(tokens):
+    CONTEXT_PROMPT_TOKENS.observe(tokens)
+    _stats['requests'] += 1
+    _stats['prompt_tokens_total'] += tokens
+    _stats['prompt_tokens_last'] = tokens
+    _stats['prompt_tokens_max'] = max(_stats['prompt_tokens_max'], tokens)
+
+
+def get_context_stats():
+    stats = dict(_stats)
+    stats['prompt_tokens_avg'] = stats['prompt_tokens_total'] / stats['requests'] if stats['requests'] else 0
+    return stats
@@ -0,0 +1,280 @@
+import os
+import time
+import atexit
+import threading
+from collections import deque
+import eventlet
+from eventlet.event import Event
+from greenlet import GreenletExit
+import logging
+from logging_config import app_logger, error_logger
+
+
+class JobRejected(Exception):
+    """Raised by submit() when the queue is full or the executor is draining."""
+
+
+class ExecutorJob:
+    """
+    Handle for a submitted job. wait() returns the job's result (None if it was
+    dropped or cancelled) or raises its exception.
+    """
+
+    def __init__(self, queue, func, args, kwargs, key):
+        self.queue = queue
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.key = key
+        self.state = 'pending'
+        self.submitted_at = time.monotonic()
+        self._event = Event()
+        self._thread = None
+        self._begun = False
+        self._drop_callbacks = []
+
+    @property
+    def done(self):
+        return self._event.ready()
+
+    def wait(self):
+        return self._event.wait()
+
+    def on_drop(self, callback):
+        """
+        Registers callback(job) to run if the job is dropped before it starts
+        (expired, cancelled or discarded on shutdown), e.g. to release resources.
+        """
+        self._drop_callbacks.append(callback)
+
+    def cancel(self):
+        """
+        Cancels a pending job, or kills a running one.
+        """
+        if self.state == 'pending':
+            self.queue.remove(self)
+            self._drop('cancelled')
+        elif self.state == 'running':
+            self.state = 'cancelled'
+            self.queue.stats['killed'] += 1
+            self._resolve(None)
+            # A thread that has not begun yet sees the state and exits on its own
+            if self._begun:
+                self._thread.kill()
+
+    def _resolve(self, result, exc=None):
+        if self._event.ready():
+            return
+        if exc is not None:
+            self._event.send_exception(exc)
+        else:
+            self._event.send(result)
+
+    def _drop(self, state):
+        self.state = state
+        self.queue.stats[state] += 1
+        self._resolve(None)
+        for callback in self._drop_callbacks:
+            try:
+                callback(self)
+            except Exception as e:
+                error_logger.error(f"ExecutorJob drop callback error: {e}", exc_info=True)
+
+
+class JobQueue:
+    """
+    A named FIFO queue with its own priority (lower runs first), concurrency
+    limit, depth limit and optional maximum wait before a job is dropped.
+    """
+
+    def __init__(self, name, priority, concurrency, max_depth=1000, max_wait=None):
+        self.name = name
+        self.priority = priority
+        self.concurrency = concurrency
+        self.max_depth = max_depth
+        self.max_wait = max_wait
+        self.pending = deque()
+        self.running = 0
+        self.stats = {
+            'submitted': 0,
+            'started': 0,
+            'completed': 0,
+            'failed': 0,
+            'rejected': 0,
+            'expired': 0,
+            'cancelled': 0,
+            'killed': 0,
+            'discarded': 0,
+            'wait_ms_total': 0.0,
+            'wait_ms_max': 0.0,
+            'run_ms_total': 0.0,
+        }
+
+    def remove(self, job):
+        try:
+            self.pending.remove(job)
+        except ValueError:
+            pass
+
+
+class JobExecutor:
+    """
+    In-process executor for background work on green threads.
+
+    Jobs wait in named queues. Whenever a worker slot is free (at most
+    max_workers overall, and each queue's own concurrency limit), the oldest
+    job of the highest-priority queue that has capacity is started. Full
+    queues reject new jobs so load is shed at the edge; jobs that waited
+    longer than their queue's max_wait are dropped instead of run late.
+    """
+
+    def __init__(self, queues, max_workers=32):
+        self.max_workers = max_workers
+        self._queues = {queue.name: queue for queue in sorted(queues, key=lambda q: q.priority)}
+        self._running = 0
+        self._accepting = True
+        self._lock = threading.Lock()
+
+    def submit(self, queue_name, func, *args, key=None, **kwargs):
+        """
+        Queues func(*args, **kwargs). key: optional tuple used by cancel_pending().
+        Returns an ExecutorJob; raises JobRejected if the job cannot be queued.
+        """
+        queue = self._queues[queue_name]
+        with self._lock:
+            if not self._accepting:
+                queue.stats['rejected'] += 1
+                raise JobRejected("Executor is shutting down")
+            if len(queue.pending) >= queue.max_depth:
+                queue.stats['rejected'] += 1
+                app_logger.warning("Job queue %s is full (%s pending), rejecting job", queue_name, len(queue.pending))
+                raise JobRejected(f"Job queue {queue_name} is full")
+            job = ExecutorJob(queue, func, args, kwargs, key)
+            queue.pending.append(job)
+            queue.stats['submitted'] += 1
+        self._dispatch()
+        return job
+
+    def _next_job(self):
+        for queue in self._queues.values():
+            if queue.pending and queue.running < queue.concurrency:
+                return queue.pending.popleft()
+        return None
+
+    def _dispatch(self):
+        expired = []
+        with self._lock:
+            while self._running < self.max_workers:
+                job = self._next_job()
+                if job is None:
+                    break
+                queue = job.queue
+                waited = time.monotonic() - job.submitted_at
+                if queue.max_wait and waited > queue.max_wait:
+                    expired.append(job)
+                    continue
+                queue.stats['started'] += 1
+                queue.stats['wait_ms_total'] += waited * 1000
+                queue.stats['wait_ms_max'] = max(queue.stats['wait_ms_max'], waited * 1000)
+                queue.running += 1
+                self._running += 1
+                job.state = 'running'
+                job._thread = eventlet.spawn(self._run, job)
+        for job in expired:
+            app_logger.warning("Dropping job from queue %s after waiting longer than %ss", job.queue.name, job.queue.max_wait)
+            job._drop('expired')
+
+    def _run(self, job):
+        queue = job.queue
+        started = time.monotonic()
+        job._begun = True
+        try:
+            if job.state == 'cancelled':
+                return
+            result = job.func(*job.args, **job.kwargs)
+            job.state = 'completed'
+            queue.stats['completed'] += 1
+            job._resolve(result)
+        except GreenletExit:
+            job._resolve(None)
+        except Exception as e:
+            job.state = 'failed'
+            queue.stats['failed'] += 1
+            error_logger.error(f"Job in queue {queue.name} failed: {e}", exc_info=True)
+            job._resolve(None, e)
+        finally:
+            queue.stats['run_ms_total'] += (time.monotonic() - started) * 1000
+            with self._lock:
+                queue.running -= 1
+                self._running -= 1
+            self._dispatch()
+
+    def cancel_pending(self, *key_prefix):
+        """
+        Cancels queued (not yet running) jobs whose key starts with key_prefix. Returns the number cancelled.
+        """
+        with self._lock:
+            jobs = [job for queue in self._queues.values() for job in queue.pending
+                    if job.key is not None and tuple(job.key[:len(key_prefix)]) == key_prefix]
+        for job in jobs:
+            job.cancel()
+        return len(jobs)
+
+    def drain(self, timeout=30.0):
+        """
+        Stops accepting jobs and waits up to timeout seconds for queued and running jobs
+        to finish. Jobs still queued after that are discarded. Returns True if fully drained.
+        """
+        with self._lock:
+            self._accepting = False
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if not self._running and not any(queue.pending for queue in self._queues.values()):
+                app_logger.info("Job executor drained")
+                return True
+            eventlet.sleep(0.05)
+        with self._lock:
+            leftover = [job for queue in self._queues.values() for job in queue.pending]
+            for queue in self._queues.values():
+                queue.pending.clear()
+        for job in leftover:
+            job._drop('discarded')
+        app_logger.warning("Job executor drain timed out with %s running and %s queued jobs", self._running, len(leftover))
+        return False
+
+    def stats(self):
+        with self._lock:
+            stats = {'running': self._running, 'max_workers': self.max_workers, 'queues': {}}
+            for name, queue in self._queues.items():
+                queue_stats = dict(queue.stats, depth=len(queue.pending), running=queue.running,
+                                   concurrency=queue.concurrency, priority=queue.priority)
+                started = queue_stats['started']
+                queue_stats['wait_ms_avg'] = queue_stats['wait_ms_total'] / started if started else 0.0
+                stats['queues'][name] = queue_stats
+        return stats
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_job_executor():
+    """
+    Shared executor with the tts (interactive tts:start), auto_tts and title
+    queues, in that priority order, configured from JOB_* environment variables.
+    The auto_tts and title limits together stay below max_workers by default,
+    so interactive TTS always finds a free worker.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            max_depth = int(os.getenv('JOB_QUEUE_MAX_DEPTH', 200))
+            _executor = JobExecutor([
+                JobQueue('tts', 0, int(os.getenv('JOB_TTS_CONCURRENCY', 16)), max_depth),
+                JobQueue('auto_tts', 1, int(os.getenv('JOB_AUTO_TTS_CONCURRENCY', 12)), max_depth,
+                         max_wait=float(os.getenv('JOB_AUTO_TTS_MAX_WAIT', 15)) or None),
+                JobQueue('title', 2, int(os.getenv('JOB_TITLE_CONCURRENCY', 4)), max_depth,
+                         max_wait=float(os.getenv('JOB_TITLE_MAX_WAIT', 10)) or None),
+            ], max_workers=int(os.getenv('JOB_MAX_WORKERS', 24)))
+            atexit.register(_executor.drain, float(os.getenv('JOB_DRAIN_TIMEOUT', 30)))
+    return _executor
@@ -0,0 +1,118 @@
+import os
+import time
+import threading
+from eventlet import tpool
+from werkzeug.security import generate_password_hash, check_password_hash
+from components.metrics.metrics import PASSWORD_HASH_WAIT_SECONDS, PASSWORD_HASH_SECONDS
+import logging
+from logging_config import app_logger, error_logger
+
+
+class HasherBusy(Exception):
+    """Raised when a hashing request could not get a worker within the queue limits."""
+
+
+class PasswordHasher:
+    """
+    Runs password hashing and verification on eventlet's OS thread pool
+    (tpool) instead of the hub, so a burst of logins does not freeze other
+    green threads. hashlib's scrypt and pbkdf2 release the GIL, so the
+    workers use several cores.
+
+    At most `concurrency` hashes run at once. Up to `max_queue` further
+    requests wait, each for at most `queue_timeout` seconds; beyond that
+    HasherBusy is raised so the caller can shed the request.
+    """
+
+    def __init__(self, method='scrypt', concurrency=4, max_queue=64, queue_timeout=5.0):
+        self.method = method
+        self.concurrency = concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._slots = threading.BoundedSemaphore(concurrency)
+        self._waiting = 0
+        self._lock = threading.Lock()
+        self._current_prefix = None
+        self._wait = {op: PASSWORD_HASH_WAIT_SECONDS.labels(op) for op in ('hash', 'verify')}
+        self._run = {op: PASSWORD_HASH_SECONDS.labels(op) for op in ('hash', 'verify')}
+        self._stats = {'hash': 0, 'verify': 0, 'rejected': 0, 'rehashed': 0}
+
+    def _execute(self, operation, func, *args):
+        with self._lock:
+            if self._waiting >= self.max_queue:
+                self._stats['rejected'] += 1
+                raise HasherBusy("Password hashing queue is full")
+            self._waiting += 1
+        started = time.perf_counter()
+        try:
+            acquired = self._slots.acquire(timeout=self.queue_timeout)
+        finally:
+            with self._lock:
+                self._waiting -= 1
+        self._wait[operation].observe(time.perf_counter() - started)
+        if not acquired:
+            self._stats['rejected'] += 1
+            raise HasherBusy(f"No password hashing worker free within {self.queue_timeout}s")
+        try:
+            started = time.perf_counter()
+            result = tpool.execute(func, *args)
+            self._run[operation].observe(time.perf_counter() - started)
+            self._stats[operation] += 1
+            return result
+        finally:
+            self._slots.release()
+
+    def hash(self, password):
+        return self._execute('hash', generate_password_hash, password, self.method)
+
+    def verify(self, password_hash, password):
+        return self._execute('verify', check_password_hash, password_hash, password)
+
+    def _method_prefix(self):
+        # The "method:params" part of a fresh hash, e.g. "scrypt:32768:8:1"; computed once
+        if self._current_prefix is None:
+            self._current_prefix = self.hash('').split('$', 1)[0]
+        return self._current_prefix
+
+    def needs_rehash(self, password_hash):
+        """
+        True if password_hash was made with other parameters than the configured method.
+        """
+        return password_hash.split('$', 1)[0] != self._method_prefix()
+
+    def verify_and_update(self, password_hash, password):
+        """
+        Verifies password. Returns (valid, new_hash); new_hash is set when the
+        password is valid but stored with outdated parameters and should be saved.
+        """
+        if not self.verify(password_hash, password):
+            return False, None
+        if not self.needs_rehash(password_hash):
+            return True, None
+        self._stats['rehashed'] += 1
+        return True, self.hash(password)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, waiting=self._waiting, concurrency=self.concurrency)
+
+
+_hasher = None
+_hasher_lock = threading.Lock()
+
+
+def get_password_hasher():
+    """
+    Shared hasher configured from PASSWORD_HASH_* environment variables.
+    """
+    global _hasher
+    with _hasher_lock:
+        if _hasher is None:
+            _hasher = PasswordHasher(
+                method=os.getenv('PASSWORD_HASH_METHOD', 'scrypt'),
+                concurrency=int(os.getenv('PASSWORD_HASH_CONCURRENCY', min(4, os.cpu_count() or 1))),
+                max_queue=int(os.getenv('PASSWORD_HASH_MAX_QUEUE', 64)),
+                queue_timeout=float(os.getenv('PASSWORD_HASH_QUEUE_TIMEOUT', 5)),
+            )
+            app_logger.info("Password hasher using %s with %s workers", _hasher.method, _hasher.concurrency)
+    return _hasher
@@ -0,0 +1,72 @@
+import time
+import threading
+from components.metrics.metrics import PIPELINE_STAGE_SECONDS
+import logging
+from logging_config import app_logger, error_logger
+
+_stats = {}  # stage -> {'count', 'total_ms', 'max_ms'}
+_stats_lock = threading.Lock()
+
+
+class PipelineTimer:
+    """
+    Per-message stage timings for the user:message pipeline.
+
+    Stages overlap, so each one records either a point in time since the
+    message arrived (mark, e.g. first_chunk) or its own duration (add, e.g.
+    persist). Every concurrent participant hold()s the timer and release()s
+    it when done; the breakdown is logged and aggregated after the last release.
+    """
+
+    def __init__(self, session_id):
+        self.session_id = session_id
+        self.started = time.monotonic()
+        self.stages = {}
+        self._holders = 0
+
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    def remaining(self, deadline):
+        """
+        Seconds left until `deadline` seconds after the message arrived (None if no deadline).
+        """
+        if not deadline:
+            return None
+        return max(deadline - self.elapsed(), 0.0)
+
+    def mark(self, stage):
+        self.stages.setdefault(stage, self.elapsed() * 1000)
+
+    def add(self, stage, started):
+        self.stages[stage] = (time.monotonic() - started) * 1000
+
+    def hold(self):
+        self._holders += 1
+        return self
+
+    def release(self):
+        self._holders -= 1
+        if self._holders == 0:
+            self._finish()
+
+    def _finish(self):
+        self.stages['total'] = self.elapsed() * 1000
+        app_logger.info("Pipeline timings for session_id: %s: %s", self.session_id,
+                        ' '.join(f"{stage}={ms:.0f}ms" for stage, ms in self.stages.items()))
+        for stage, ms in self.stages.items():
+            PIPELINE_STAGE_SECONDS.labels(stage).observe(ms / 1000)
+        with _stats_lock:
+            for stage, ms in self.stages.items():
+                stats = _stats.setdefault(stage, {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0})
+                stats['count'] += 1
+                stats['total_ms'] += ms
+                stats['max_ms'] = max(stats['max_ms'], ms)
+
+
+def get_pipeline_stats():
+    with _stats_lock:
+        return {
+            stage: dict(stats, avg_ms=stats['total_ms'] / stats['count'])
+            for stage, stats in _stats.items()
+        }
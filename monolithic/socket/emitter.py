@@ -0,0 +1,73 @@
+import os
+import threading
+from flask_socketio import SocketIO
+from components.metrics.metrics import SOCKET_EMITS, SOCKET_EMIT_BYTES
+import logging
+from logging_config import app_logger, error_logger
+
+_emitter = None
+_emitter_lock = threading.Lock()
+
+_emit_metrics = {}  # event -> (count child, size child)
+
+
+def _payload_size(data):
+    """
+    Cheap payload size estimate: lengths of the top-level str/bytes values, without serializing.
+    """
+    if isinstance(data, (str, bytes)):
+        return len(data)
+    if isinstance(data, dict):
+        return sum(len(value) if isinstance(value, (str, bytes)) else 8 for value in data.values())
+    return 8
+
+
+class InstrumentedSocketIO(SocketIO):
+    """
+    SocketIO that counts emits and records approximate payload sizes per event name.
+    """
+
+    def emit(self, event, *args, **kwargs):
+        metrics = _emit_metrics.get(event)
+        if metrics is None:
+            metrics = _emit_metrics[event] = (SOCKET_EMITS.labels(event), SOCKET_EMIT_BYTES.labels(event))
+        metrics[0].inc()
+        metrics[1].observe(_payload_size(args[0]) if args else 0)
+        return super().emit(event, *args, **kwargs)
+
+
+def set_emitter(emitter):
+    """
+    Installs the object services use to emit Socket.IO events (anything with
+    emit(event, data, room=...)). server.py installs its SocketIO instance;
+    tests can install a recorder.
+    """
+    global _emitter
+    _emitter = emitter
+
+
+def get_emitter():
+    """
+    Returns the installed emitter. In a process without a SocketIO server
+    (e.g. a standalone worker script) a write-only emitter is created on the
+    SOCKETIO_MESSAGE_QUEUE, so events still reach clients on any server.
+    """
+    global _emitter
+    with _emitter_lock:
+        if _emitter is None and os.getenv('SOCKETIO_MESSAGE_QUEUE'):
+            _emitter = InstrumentedSocketIO(message_queue=os.getenv('SOCKETIO_MESSAGE_QUEUE'),
+                                            channel=os.getenv('SOCKETIO_CHANNEL', 'flask-socketio'))
+            app_logger.info("Created write-only Socket.IO emitter on the message queue")
+    return _emitter
+
+
+def emit(event, data, room=None):
+    """
+    Emits an event through the installed emitter. Returns False if none is available.
+    """
+    emitter = get_emitter()
+    if emitter is None:
+        app_logger.warning("No Socket.IO emitter installed, dropping %s", event)
+        return False
+    emitter.emit(event, data, room=room)
+    return True
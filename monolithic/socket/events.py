@@ -1,59 +1,189 @@
 import os
+import uuid
 import base64
 import logging
-from flask_socketio import join_room
+from flask import request
+from flask_socketio import join_room, leave_room, ConnectionRefusedError
 from monolithic.services.chat_service import handle_user_message
+from monolithic.services.pipeline_timing import PipelineTimer
+from monolithic.services.job_executor import get_job_executor, JobRejected
 from monolithic.socket.utils import (
-    emit_stream_chunks, emit_response_end, 
-    get_user_room, stream_tts_audio
+    ResponseStreamEmitter, emit_response_end,
+    get_user_room, get_audio_room, stream_tts_audio, TTSSegmentFeed,
+    register_audio_client, unregister_audio_client,
+    set_socket_user, get_socket_user, clear_socket_user
 )
-from monolithic.utils.text_processing import clean_markdown_for_tts
+from monolithic.utils.jwt_utils import extract_token, verify_token
+from monolithic.socket.jobs import stream_jobs
 from logging_config import app_logger, error_logger
-from components.tts.google_chirp import generate_tts_audio
+
+def _authenticated_user(claimed_user_id=None):
+    """
+    Returns the user verified at connect time for this socket. A user_id sent in
+    an event payload is only accepted if it matches; otherwise None is returned.
+    """
+    user_id = get_socket_user(request.sid)
+    if user_id and claimed_user_id and str(claimed_user_id) != user_id:
+        app_logger.warning("Socket %s sent user_id %s but is authenticated as %s", request.sid, claimed_user_id, user_id)
+        return None
+    return user_id
+
+def _join_user_rooms(user_id, options):
+    join_room(get_user_room(user_id))
+    # Clients opt into binary tts:audio frames; base64 stays the default
+    _join_audio_room(user_id, options.get('audioTransport'),
+                     options.get('audioEncoding'), options.get('sampleRate'))
+
+def _join_audio_room(user_id, transport=None, encoding=None, sample_rate=None):
+    channel, previous = register_audio_client(request.sid, user_id, transport, encoding, sample_rate)
+    if previous and previous != channel:
+        leave_room(get_audio_room(user_id, previous))
+    join_room(get_audio_room(user_id, channel))
+    return channel
+
+def _submit_tts(socketio, queue_name, user_id, message_id, text=None, timer=None, error_code='TTS_ERROR', **kwargs):
+    """
+    Queues stream_tts_audio on the job executor. If the job is shed (queue full,
+    waited too long or cancelled before starting) the client gets tts:error
+    with code TTS_BUSY and the caller's timer hold is released.
+    """
+    def dropped(job=None):
+        if timer is not None:
+            timer.release()
+        if job is None or job.state != 'cancelled':
+            socketio.emit('tts:error', {
+                'messageId': message_id,
+                'code': 'TTS_BUSY',
+                'message': 'Audio generation is busy, please try again'
+            }, room=get_user_room(user_id))
+
+    try:
+        job = get_job_executor().submit(
+            queue_name, stream_tts_audio, socketio, user_id, message_id, text,
+            timer=timer, error_code=error_code, key=(str(user_id), 'tts', message_id), **kwargs
+        )
+    except JobRejected as e:
+        app_logger.warning("TTS for message_id: %s shed: %s", message_id, e)
+        dropped()
+        return None
+    job.on_drop(dropped)
+    return job
 
 def register_socket_events(socketio):
+    @socketio.on('connect')
+    def on_connect(auth=None):
+        # Verify once per connection; events then trust the socket's user
+        auth = auth if isinstance(auth, dict) else {}
+        token = auth.get('token') or request.args.get('token') or extract_token(request)
+        user_id = verify_token(token)
+        if not user_id:
+            app_logger.warning("Socket connect rejected for sid: %s", request.sid)
+            raise ConnectionRefusedError('unauthorized')
+        set_socket_user(request.sid, user_id)
+        _join_user_rooms(user_id, auth)
+
     @socketio.on('user:join')
     def on_join(data):
         try:
-            user_id = data.get('user_id')
-            app_logger.info(f"Socket user:join for user_id: {user_id}")
+            user_id = _authenticated_user(data.get('user_id'))
+            app_logger.info("Socket user:join for user_id: %s", user_id)
             if user_id:
-                join_room(get_user_room(user_id))
+                _join_user_rooms(user_id, data)
         except Exception as e:
             error_logger.error(f"Socket user:join error: {e}", exc_info=True)
 
+    @socketio.on('disconnect')
+    def on_disconnect(*args):
+        try:
+            clear_socket_user(request.sid)
+            # Nobody is left to hear this user's streams on this worker; stop them
+            user_id = unregister_audio_client(request.sid)
+            if user_id:
+                get_job_executor().cancel_pending(user_id)
+                stream_jobs.cancel(user_id, reason='Client disconnected')
+        except Exception as e:
+            error_logger.error(f"Socket disconnect error: {e}", exc_info=True)
+
     @socketio.on('user:message')
     def on_user_message(data):
         try:
             session_id = data.get('session_id')
-            user_id = data.get('user_id')
+            user_id = _authenticated_user(data.get('user_id'))
             text = data.get('text')
             is_first_message = data.get('is_first_message', False)
-            app_logger.info(f"Socket user:message for session_id: {session_id}, user_id: {user_id}")
+            app_logger.info("Socket user:message for session_id: %s, user_id: %s", session_id, user_id)
             if session_id and user_id and text:
-                result = handle_user_message(session_id, user_id, text, is_first_message=is_first_message)
-                
-                # Stream text response chunks
-                emit_stream_chunks(socketio, user_id, session_id, result.get('ai_text_chunks', []), delay=float(os.getenv('STREAM_DELAY', 0.5)))
-                app_logger.info(f"Delay used: {os.getenv('STREAM_DELAY', 0.5)}")
-                
-                # Send complete response and trigger auto TTS
-                ai_msg_id = result.get('ai_msg_id')
-                ai_text = result.get('ai_text')
-                emit_response_end(socketio, user_id, session_id, ai_msg_id, ai_text)
-                
-                # Generate and stream TTS audio with auto-play flag
-                stream_tts_audio(socketio, user_id, ai_msg_id, ai_text, auto_play=True)
+                timer = PipelineTimer(session_id).hold()
+                try:
+                    _run_message_pipeline(session_id, user_id, text, is_first_message, timer)
+                finally:
+                    timer.release()
         except Exception as e:
             error_logger.error(f"Socket user:message error: {e}", exc_info=True)
 
+    def _run_message_pipeline(session_id, user_id, text, is_first_message, timer):
+        """
+        Streams response chunks as Gemini produces them while TTS for the reply
+        starts from the first complete sentence; the title and persistence run
+        on their own green threads inside handle_user_message.
+        """
+        ai_msg_id = str(uuid.uuid4())
+        job = stream_jobs.start('response', user_id, session_id)
+        emitter = ResponseStreamEmitter(socketio, user_id, session_id)
+        tts_feed = TTSSegmentFeed()
+        auto_tts = []
+
+        def submit_auto_tts():
+            # Queued only once there is a segment to speak, so the job never holds
+            # an executor worker while Gemini is still thinking
+            auto_tts.append(_submit_tts(
+                socketio, 'auto_tts', user_id, ai_msg_id, timer=timer.hold(),
+                error_code='AUTO_TTS_ERROR', auto_play=True, feed=tts_feed
+            ))
+
+        def on_chunk(chunk):
+            job.raise_if_cancelled()
+            emitter.push(chunk)
+            tts_feed.push(chunk)
+            if not auto_tts and tts_feed.pending_chars():
+                submit_auto_tts()
+            job.bytes_sent += len(chunk)
+
+        result = {}
+        try:
+            result = handle_user_message(
+                session_id, user_id, text, is_first_message=is_first_message,
+                on_chunk=on_chunk, ai_msg_id=ai_msg_id, background_persist=True, timer=timer
+            )
+        finally:
+            stream_jobs.finish(job)
+            if job.cancelled or 'error' in result:
+                tts_feed.abort()
+            else:
+                tts_feed.close()
+                if not auto_tts:
+                    submit_auto_tts()
+        if job.cancelled:
+            app_logger.info("Response stream for session_id: %s cancelled (%s)", session_id, job.reason)
+            return
+        emitter.close()
+        if 'error' in result:
+            socketio.emit('ai:response:error', {
+                'session_id': session_id,
+                'message': 'Failed to generate a response'
+            }, room=get_user_room(user_id))
+            return
+
+        # Send complete response; auto-play TTS is already streaming
+        emit_response_end(socketio, user_id, session_id, result.get('ai_msg_id'), result.get('ai_text'))
+
     @socketio.on('tts:start')
     def on_tts_start(data):
         try:
             # Extract all required data first
             message_id = data.get('messageId')
             text = data.get('text')
-            user_id = data.get('userId')
+            user_id = _authenticated_user(data.get('userId'))
             
             # Validate required fields
             if not all([message_id, text, user_id]):
@@ -63,43 +193,17 @@ def register_socket_events(socketio):
             voice = data.get('voice')
             speaking_rate = data.get('speakingRate')
             pitch = data.get('pitch')
+            # Switches this connection's audio format for this and later messages
+            if data.get('encoding') or data.get('sampleRate'):
+                _join_audio_room(user_id, encoding=data.get('encoding'), sample_rate=data.get('sampleRate'))
 
-            app_logger.info(f"Socket tts:start for message_id: {message_id}, user_id: {user_id}")
-
-            # Clean markdown and prepare text for TTS
-            clean_text = clean_markdown_for_tts(text)
-            app_logger.debug(f"Original text: {text[:30]}...")
-            app_logger.debug(f"Cleaned text for TTS: {clean_text[:30]}...")
-            
-            # Generate audio from cleaned text
-            audio_b64 = generate_tts_audio(clean_text, voice, speaking_rate, pitch)
-            audio_bytes = base64.b64decode(audio_b64)
-
-            # Stream audio in chunks
-            chunk_size = 8192  # Increased chunk size for better performance
-            total_chunks = (len(audio_bytes) + chunk_size - 1) // chunk_size
+            app_logger.info("Socket tts:start for message_id: %s, user_id: %s", message_id, user_id)
 
-            # Send audio chunks
-            user_room = get_user_room(user_id)
-            for i in range(total_chunks):
-                chunk = audio_bytes[i*chunk_size:(i+1)*chunk_size]
-                chunk_b64 = base64.b64encode(chunk).decode('utf-8')
-                is_last = i == total_chunks - 1
-
-                # Emit chunk
-                socketio.emit('tts:audio', {
-                    'messageId': message_id,
-                    'chunkSeq': i,
-                    'bytes': chunk_b64,
-                    'isLast': is_last
-                }, room=user_room)
-
-                # If this is the last chunk, let client know processing is complete
-                if is_last:
-                    socketio.emit('tts:ready', {
-                        'messageId': message_id,
-                        'duration': None  # Could add audio duration if needed
-                    }, room=user_room)
+            # Clean, segment, synthesize and stream audio in order, ahead of auto-play and titles
+            _submit_tts(
+                socketio, 'tts', user_id, message_id, text,
+                voice=voice, speaking_rate=speaking_rate, pitch=pitch
+            )
 
         except ValueError as e:
             # Handle validation errors
@@ -108,7 +212,7 @@ def register_socket_events(socketio):
                 'messageId': data.get('messageId'),
                 'code': 'VALIDATION_ERROR',
                 'message': str(e)
-            }, room=get_user_room(data.get('userId')))
+            }, room=request.sid)
         except Exception as e:
             # Handle other errors
             error_logger.error(f"Socket tts:start error: {e}", exc_info=True)
@@ -116,20 +220,24 @@ def register_socket_events(socketio):
                 'messageId': data.get('messageId'),
                 'code': 'TTS_ERROR',
                 'message': 'Failed to generate audio'
-            }, room=get_user_room(data.get('userId')))
+            }, room=request.sid)
 
     @socketio.on('tts:stop')
     def on_tts_stop(data):
         try:
             # Extract and validate required fields
             message_id = data.get('messageId')
-            user_id = data.get('userId')
+            user_id = _authenticated_user(data.get('userId'))
             
             if not all([message_id, user_id]):
                 raise ValueError("Missing required fields: messageId or userId")
                 
-            app_logger.info(f"Socket tts:stop for message_id: {message_id}, user_id: {user_id}")
+            app_logger.info("Socket tts:stop for message_id: %s, user_id: %s", message_id, user_id)
             
+            # Drop it if still queued, otherwise stop synthesis and the audio emit loop
+            get_job_executor().cancel_pending(user_id, 'tts', message_id)
+            stream_jobs.cancel(user_id, message_id, kind='tts', reason='Stopped by user')
+
             # Get user room once
             user_room = get_user_room(user_id)
             
@@ -0,0 +1,155 @@
+import threading
+import eventlet
+from greenlet import GreenletExit
+import logging
+from logging_config import app_logger, error_logger
+
+
+class JobCancelled(Exception):
+    """Raised inside a streaming job once it has been cancelled."""
+
+
+class StreamJob:
+    """
+    A cancellable unit of streaming work for one message (TTS audio or an AI response).
+
+    Green threads spawned through the job are killed on cancel, which aborts
+    in-flight upstream requests; the job's own loop notices via raise_if_cancelled().
+    """
+
+    def __init__(self, registry, kind, user_id, message_id):
+        self.registry = registry
+        self.kind = kind
+        self.user_id = str(user_id)
+        self.message_id = message_id
+        self.cancelled = False
+        self.reason = None
+        self.bytes_sent = 0
+        self._threads = set()
+
+    @property
+    def key(self):
+        return (self.kind, self.user_id, self.message_id)
+
+    def spawn(self, func, *args, **kwargs):
+        """
+        Runs func on a green thread that is killed if the job is cancelled.
+        """
+        self.raise_if_cancelled()
+        gt = eventlet.spawn(func, *args, **kwargs)
+        self._threads.add(gt)
+        gt.link(lambda finished: self._threads.discard(finished))
+        return gt
+
+    def wait(self, gt):
+        """
+        Waits for a green thread spawned by this job, translating a kill into JobCancelled.
+        """
+        try:
+            return gt.wait()
+        except GreenletExit:
+            raise JobCancelled(self.reason)
+        finally:
+            self.raise_if_cancelled()
+
+    def raise_if_cancelled(self):
+        if self.cancelled:
+            raise JobCancelled(self.reason)
+
+    def cancel(self, reason):
+        if self.cancelled:
+            return False
+        self.cancelled = True
+        self.reason = reason
+        for gt in list(self._threads):
+            gt.kill()
+        return True
+
+    def close(self):
+        """
+        Kills any green threads still running when the job ends (e.g. after an error).
+        """
+        for gt in list(self._threads):
+            gt.kill()
+
+    def record_unsent(self, nbytes=0, nchars=0):
+        """
+        Counts work skipped because the job was cancelled: output bytes never emitted
+        and input characters never sent upstream.
+        """
+        self.registry.record_saved(self.kind, nbytes, nchars)
+
+
+class JobRegistry:
+    """
+    Tracks in-flight streaming jobs per (kind, user, message) so they can be cancelled.
+    """
+
+    def __init__(self):
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._stats = {
+            'started': {},
+            'completed': {},
+            'cancelled': {},
+            'bytes_saved': {},
+            'chars_saved': {},
+        }
+
+    def _count(self, stat, kind, amount=1):
+        self._stats[stat][kind] = self._stats[stat].get(kind, 0) + amount
+
+    def start(self, kind, user_id, message_id):
+        """
+        Registers a new job, cancelling any job already running for the same message.
+        """
+        job = StreamJob(self, kind, user_id, message_id)
+        with self._lock:
+            previous = self._jobs.get(job.key)
+            self._jobs[job.key] = job
+            self._count('started', kind)
+        if previous is not None and previous.cancel('Superseded by a new request'):
+            with self._lock:
+                self._count('cancelled', kind)
+        return job
+
+    def finish(self, job):
+        job.close()
+        with self._lock:
+            if self._jobs.get(job.key) is job:
+                del self._jobs[job.key]
+            if not job.cancelled:
+                self._count('completed', job.kind)
+
+    def cancel(self, user_id, message_id=None, kind=None, reason='Cancelled'):
+        """
+        Cancels the user's jobs, optionally narrowed to one message and/or kind. Returns the number cancelled.
+        """
+        with self._lock:
+            jobs = [job for job in self._jobs.values()
+                    if job.user_id == str(user_id)
+                    and (message_id is None or job.message_id == message_id)
+                    and (kind is None or job.kind == kind)]
+        cancelled = 0
+        for job in jobs:
+            if job.cancel(reason):
+                cancelled += 1
+                with self._lock:
+                    self._count('cancelled', job.kind)
+        if cancelled:
+            app_logger.info("Cancelled %s job(s) for user_id: %s, message_id: %s, reason: %s", cancelled, user_id, message_id, reason)
+        return cancelled
+
+    def record_saved(self, kind, nbytes=0, nchars=0):
+        with self._lock:
+            self._count('bytes_saved', kind, nbytes)
+            self._count('chars_saved', kind, nchars)
+
+    def stats(self):
+        with self._lock:
+            stats = {name: dict(values) for name, values in self._stats.items()}
+            stats['active'] = len(self._jobs)
+        return stats
+
+
+stream_jobs = JobRegistry()
@@ -1,71 +1,442 @@
+import os
 import time
 import base64
+import threading
 import logging
 from logging_config import app_logger, error_logger
-from monolithic.utils.text_processing import clean_markdown_for_tts
-from components.tts.google_chirp import generate_tts_audio
+from collections import deque
+from monolithic.utils.text_processing import clean_markdown_for_tts, split_tts_segments, StreamingTTSCleaner
+from components.tts.google_chirp import get_tts_audio, normalize_audio_format
+from components.tts.audio_duration import audio_duration
+from monolithic.socket.jobs import stream_jobs, JobCancelled
 
-def stream_tts_audio(socketio, user_id, message_id, text, auto_play=False):
+class TTSSegmentFeed:
+    """
+    Source of TTS segments for one message, filled while the AI response streams.
+
+    push() cleans deltas incrementally and queues each complete segment; the
+    first sentence is queued on its own as soon as it is complete, and later
+    text is packed into the last queued segment while it waits. close() queues
+    the remainder. from_text() builds an already-closed feed for a full text.
+    """
+
+    def __init__(self, max_chars=None):
+        self.max_chars = int(max_chars or os.getenv('TTS_SEGMENT_MAX_CHARS', 600))
+        self._cleaner = StreamingTTSCleaner()
+        self._segments = deque()
+        self._queued = 0
+        self._closed = False
+        self._aborted = False
+        self._cond = threading.Condition()
+
+    @classmethod
+    def from_text(cls, text):
+        feed = cls()
+        feed._add(clean_markdown_for_tts(text))
+        feed.close()
+        return feed
+
+    def _add(self, text):
+        segments = split_tts_segments(text, self.max_chars, split_first=self._queued == 0)
+        with self._cond:
+            for segment in segments:
+                # Never merge into the first segment; it goes out alone for a fast start
+                if self._segments and self._queued > 1 and len(self._segments[-1]) + 1 + len(segment) <= self.max_chars:
+                    self._segments[-1] = f"{self._segments[-1]} {segment}"
+                else:
+                    self._segments.append(segment)
+                    self._queued += 1
+            self._cond.notify_all()
+
+    def push(self, delta):
+        text = self._cleaner.feed(delta)
+        if text:
+            self._add(text)
+
+    def close(self):
+        if self._closed:
+            return
+        text = self._cleaner.flush()
+        if text:
+            self._add(text)
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def abort(self):
+        """
+        Ends the feed without speaking anything further (the response failed or was cancelled).
+        """
+        with self._cond:
+            self._aborted = self._closed = True
+            self._cond.notify_all()
+
+    def get_nowait(self):
+        """
+        Returns the next queued segment, or None if none is ready yet.
+        """
+        with self._cond:
+            if self._aborted or not self._segments:
+                return None
+            return self._segments.popleft()
+
+    def get(self, job=None):
+        """
+        Waits for the next segment; returns None once the feed is closed and empty.
+        """
+        with self._cond:
+            while True:
+                if self._aborted:
+                    raise JobCancelled('Response did not complete')
+                if self._segments:
+                    return self._segments.popleft()
+                if self._closed:
+                    return None
+                self._cond.wait(0.1)
+                if job is not None:
+                    job.raise_if_cancelled()
+
+    def pending_chars(self):
+        with self._cond:
+            return sum(len(segment) for segment in self._segments)
+
+
+def stream_tts_audio(socketio, user_id, message_id, text=None, auto_play=False,
+                     voice=None, speaking_rate=None, pitch=None, error_code='AUTO_TTS_ERROR',
+                     feed=None, timer=None):
     """
     Generate and stream TTS audio for the given text
     auto_play: If True, indicates this is auto-generated TTS that should play automatically
+    feed: Optional TTSSegmentFeed used instead of text, so audio can start while the response is still streaming
+    timer: Optional PipelineTimer (held by the caller) that records time to first audio
+
+    Runs as a cancellable job in stream_jobs: the cleaned text is split into
+    sentence segments which are synthesized concurrently (bounded by
+    TTS_SEGMENT_CONCURRENCY) and emitted strictly in order. Each segment is
+    synthesized once per audio format the user's clients asked for. tts:stop or
+    the user's last socket disconnecting kills in-flight synthesis and stops the emit loop.
     """
+    job = stream_jobs.start('tts', user_id, message_id)
+    in_flight = deque()
+    started = time.monotonic()
     try:
         user_room = get_user_room(user_id)
         
-        # Clean text for TTS
-        clean_text = clean_markdown_for_tts(text)
-        app_logger.debug(f"Auto TTS: Cleaned text for message {message_id}")
-        
-        # Generate audio
-        audio_b64 = generate_tts_audio(clean_text)
-        audio_bytes = base64.b64decode(audio_b64)
-        
-        # Stream in chunks
-        chunk_size = 8192
-        total_chunks = (len(audio_bytes) + chunk_size - 1) // chunk_size
-        
-        for i in range(total_chunks):
-            chunk = audio_bytes[i*chunk_size:(i+1)*chunk_size]
-            chunk_b64 = base64.b64encode(chunk).decode('utf-8')
-            is_last = i == total_chunks - 1
-            
-            socketio.emit('tts:audio', {
-                'messageId': message_id,
-                'chunkSeq': i,
-                'bytes': chunk_b64,
-                'isLast': is_last,
-                'autoPlay': auto_play
-            }, room=user_room)
-            
-            if is_last:
-                socketio.emit('tts:ready', {
-                    'messageId': message_id,
-                    'autoPlay': auto_play
-                }, room=user_room)
-                app_logger.info(f"Auto TTS: Completed streaming audio for message {message_id}")
-                
+        # Clean text for TTS and split it at sentence boundaries
+        if feed is None:
+            feed = TTSSegmentFeed.from_text(text)
+
+        concurrency = int(os.getenv('TTS_SEGMENT_CONCURRENCY', 3))
+        # (encoding, sample_rate) -> channels that receive it
+        formats = {}
+        for channel in get_audio_channels(user_id):
+            formats.setdefault(channel[1:], []).append(channel)
+        chunk_seqs = dict.fromkeys(formats, 0)
+        durations = dict.fromkeys(formats, 0.0)
+
+        def synthesize(segment):
+            in_flight.append({
+                audio_format: job.spawn(get_tts_audio, segment, voice, speaking_rate, pitch, *audio_format)
+                for audio_format in formats
+            })
+
+        def fill():
+            while len(in_flight) < concurrency:
+                segment = feed.get_nowait()
+                if segment is None:
+                    return
+                synthesize(segment)
+
+        segment_index = 0
+        while True:
+            fill()
+            if not in_flight:
+                segment = feed.get(job)
+                if segment is None:
+                    break
+                synthesize(segment)
+            clips = in_flight.popleft()
+            fill()
+            # Only the final segment is flagged last; with a live feed that may mean waiting for the next one
+            if not in_flight:
+                segment = feed.get(job)
+                if segment is not None:
+                    synthesize(segment)
+            for audio_format, clip in clips.items():
+                audio_bytes = job.wait(clip)
+                duration = audio_duration(audio_bytes, *audio_format)
+                if durations[audio_format] is not None:
+                    durations[audio_format] = None if duration is None else durations[audio_format] + duration
+                chunk_seqs[audio_format] = emit_audio_chunks(
+                    socketio, user_id, message_id, audio_bytes, formats[audio_format],
+                    first_seq=chunk_seqs[audio_format], segment_index=segment_index,
+                    is_last_segment=not in_flight, auto_play=auto_play,
+                    duration=duration, job=job
+                )
+            if timer is not None:
+                timer.mark('tts_first_audio')
+            segment_index += 1
+
+        if not segment_index:
+            raise ValueError("No speakable text for TTS")
+
+        # Formats differ only by encoder padding; report the first one that could be measured
+        duration = next((d for d in durations.values() if d is not None), None)
+        socketio.emit('tts:ready', {
+            'messageId': message_id,
+            'duration': round(duration, 3) if duration is not None else None,
+            'autoPlay': auto_play
+        }, room=user_room)
+        app_logger.info("TTS: Completed streaming %s audio segments for message %s", segment_index, message_id)
+
+    except JobCancelled as e:
+        _record_cancelled_tts(job, in_flight, feed)
+        app_logger.info("TTS: Job for message %s cancelled (%s) after %s bytes", message_id, e, job.bytes_sent)
     except Exception as e:
         error_logger.error(f"stream_tts_audio error: {e}", exc_info=True)
         socketio.emit('tts:error', {
             'messageId': message_id,
-            'code': 'AUTO_TTS_ERROR',
+            'code': error_code,
             'message': 'Failed to generate audio'
         }, room=get_user_room(user_id))
+    finally:
+        stream_jobs.finish(job)
+        if timer is not None:
+            timer.add('tts', started)
+            timer.release()
 
-def emit_stream_chunks(socketio, user_id, session_id, chunks, delay=0.5):
+def _record_cancelled_tts(job, in_flight, feed):
     """
-    Emits AI response chunks to the user room with a delay for readable streaming.
+    Records audio that was synthesized but never sent and text that was never synthesized.
+    """
+    unsent_bytes = 0
+    for gt in (clip for clips in in_flight for clip in clips.values()):
+        if gt.dead:
+            try:
+                unsent_bytes += len(gt.wait())
+            except BaseException:
+                pass
+    job.record_unsent(nbytes=unsent_bytes, nchars=feed.pending_chars() if feed is not None else 0)
+
+# Users authenticated at Socket.IO connect time: sid -> user_id
+_socket_users = {}
+
+def set_socket_user(sid, user_id):
+    _socket_users[sid] = str(user_id)
+
+def get_socket_user(sid):
+    return _socket_users.get(sid)
+
+def clear_socket_user(sid):
+    return _socket_users.pop(sid, None)
+
+def get_connected_socket_count():
+    return len(_socket_users)
+
+AUDIO_TRANSPORTS = ('base64', 'binary')
+AUDIO_CHUNK_SIZE = 8192
+# Bytes per tts:audio chunk, roughly 0.3-0.5s of speech at Google's default bitrates
+AUDIO_CHUNK_SIZES = {'MP3': 8192, 'OGG_OPUS': 4096, 'LINEAR16': 32768}
+
+# Audio channel negotiated by each locally connected client:
+# user_id -> {sid: (transport, encoding, sample_rate)}
+_audio_clients = {}
+
+def get_audio_room(user_id, channel):
+    """
+    Returns the room for a user's clients that receive tts:audio on the given
+    (transport, encoding, sample_rate) channel.
+    """
+    transport, encoding, sample_rate = channel
+    return f"{get_user_room(user_id)}:audio:{transport}:{encoding}:{sample_rate or 'default'}"
+
+def register_audio_client(sid, user_id, transport=None, encoding=None, sample_rate=None):
+    """
+    Records the client's audio channel. Settings left out keep the client's
+    previous value, or the default for a new client.
+    Returns (channel, previous channel or None).
+    """
+    clients = _audio_clients.setdefault(str(user_id), {})
+    previous = clients.get(sid)
+    if previous:
+        transport = transport or previous[0]
+        if not encoding:
+            encoding = previous[1]
+            sample_rate = sample_rate or previous[2]
+    if transport not in AUDIO_TRANSPORTS:
+        transport = 'base64'
+    channel = (transport,) + normalize_audio_format(encoding, sample_rate)
+    clients[sid] = channel
+    return channel, previous
+
+def unregister_audio_client(sid):
+    """
+    Forgets a disconnected client. Returns its user_id if that was the user's last local client, else None.
+    """
+    for user_id, clients in list(_audio_clients.items()):
+        if clients.pop(sid, None) is not None and not clients:
+            _audio_clients.pop(user_id, None)
+            return user_id
+    return None
+
+def get_audio_channels(user_id):
+    """
+    Distinct audio channels in use by the user's clients on this process. When
+    none are known locally (e.g. the client is connected to another worker)
+    every transport is used with the default format; clients elsewhere that
+    negotiated another format are not reached (documented limitation).
+    """
+    clients = _audio_clients.get(str(user_id))
+    if not clients:
+        return tuple((transport,) + normalize_audio_format() for transport in AUDIO_TRANSPORTS)
+    return tuple(sorted(set(clients.values()), key=lambda c: (AUDIO_TRANSPORTS.index(c[0]), c[1], c[2] or 0)))
+
+def emit_audio_chunks(socketio, user_id, message_id, audio_bytes, channels, first_seq=0,
+                      segment_index=0, is_last_segment=True, auto_play=False, chunk_size=None,
+                      duration=None, job=None):
+    """
+    Emits one segment of audio as tts:audio chunks to each channel's room; all
+    channels must share the audio's encoding and sample rate. Binary clients get
+    raw bytes attachments, base64 clients get text. Returns the next chunkSeq.
+    Each segment is a complete file (its own WAV header or Ogg stream), so the
+    first chunk is flagged segmentStart and clients decode segments separately.
+    chunk_size: Defaults to AUDIO_CHUNK_SIZES for the encoding.
+    duration: Seconds of audio in the segment, sent as segmentDuration.
+    job: Optional StreamJob; the loop yields between chunks and stops once it is cancelled.
+    """
+    _, encoding, sample_rate = channels[0]
+    chunk_size = chunk_size or AUDIO_CHUNK_SIZES.get(encoding, AUDIO_CHUNK_SIZE)
+    view = memoryview(audio_bytes)
+    total_chunks = max((len(view) + chunk_size - 1) // chunk_size, 1)
+    for i in range(total_chunks):
+        if job is not None and job.cancelled:
+            job.record_unsent(len(view) - i*chunk_size)
+            job.raise_if_cancelled()
+        chunk = view[i*chunk_size:(i+1)*chunk_size]
+        payload = {
+            'messageId': message_id,
+            'chunkSeq': first_seq + i,
+            'segment': segment_index,
+            'segmentStart': i == 0,
+            'segmentEnd': i == total_chunks - 1,
+            'isLast': is_last_segment and i == total_chunks - 1,
+            'autoPlay': auto_play,
+            'encoding': encoding,
+            'sampleRate': sample_rate,
+            'segmentDuration': round(duration, 3) if duration is not None else None
+        }
+        for channel in channels:
+            if channel[0] == 'binary':
+                # python-socketio only recognises bytes as attachments; a single-chunk segment is sent without copying
+                data = audio_bytes if total_chunks == 1 and isinstance(audio_bytes, bytes) else chunk.tobytes()
+            else:
+                data = base64.b64encode(chunk).decode('ascii')
+            socketio.emit('tts:audio', dict(payload, bytes=data), room=get_audio_room(user_id, channel))
+        if job is not None:
+            job.bytes_sent += len(chunk)
+            socketio.sleep(0)  # let tts:stop run between chunks
+    return first_seq + total_chunks
+
+class ResponseStreamEmitter:
+    """
+    Coalesces AI response deltas into sequenced ai:response:chunk frames.
+
+    Pending text is flushed once per time window or as soon as it reaches the
+    frame byte budget. The window widens while the clients' Engine.IO send
+    queues are backed up and narrows again once they drain, so a slow transport
+    receives fewer, larger frames instead of an ever-growing backlog.
+    """
+
+    def __init__(self, socketio, user_id, session_id, window_ms=None, max_window_ms=None, max_frame_bytes=None):
+        self.socketio = socketio
+        self.user_id = user_id
+        self.session_id = session_id
+        self.room = get_user_room(user_id)
+        self.min_window = float(window_ms or os.getenv('STREAM_WINDOW_MS', 50)) / 1000
+        self.max_window = float(max_window_ms or os.getenv('STREAM_MAX_WINDOW_MS', 500)) / 1000
+        self.max_frame_bytes = int(max_frame_bytes or os.getenv('STREAM_MAX_FRAME_BYTES', 2048))
+        self.window = self.min_window
+        self.seq = 0
+        self.deltas = 0
+        self._pending = []
+        self._pending_bytes = 0
+        self._flush_scheduled = False
+        self._lock = threading.Lock()
+
+    def push(self, text):
+        """
+        Queues a text delta; never sleeps, so delivery keeps pace with generation.
+        """
+        if not text:
+            return
+        self.deltas += 1
+        self._pending.append(text)
+        self._pending_bytes += len(text.encode('utf-8'))
+        if self._pending_bytes >= self.max_frame_bytes:
+            self.flush()
+        elif not self._flush_scheduled:
+            self._flush_scheduled = True
+            self.socketio.start_background_task(self._flush_after_window)
+
+    def _flush_after_window(self):
+        self.socketio.sleep(self.window)
+        self._flush_scheduled = False
+        self.flush()
+
+    def flush(self):
+        with self._lock:
+            if not self._pending:
+                return
+            chunk = ''.join(self._pending)
+            self._pending = []
+            self._pending_bytes = 0
+            self.socketio.emit('ai:response:chunk', {
+                'session_id': self.session_id,
+                'chunk': chunk,
+                'seq': self.seq
+            }, room=self.room)
+            self.seq += 1
+        self._adapt_window()
+
+    def _adapt_window(self):
+        backlog = self._transport_backlog()
+        if backlog > 1:
+            self.window = min(self.window * 2, self.max_window)
+        elif backlog == 0:
+            self.window = max(self.window / 2, self.min_window)
+
+    def _transport_backlog(self):
+        """
+        Largest number of packets still waiting in the send queue of any socket in the room.
+        """
+        try:
+            server = self.socketio.server
+            backlog = 0
+            for _, eio_sid in server.manager.get_participants('/', self.room):
+                eio_socket = server.eio.sockets.get(eio_sid)
+                if eio_socket is not None:
+                    backlog = max(backlog, eio_socket.queue.qsize())
+            return backlog
+        except Exception:
+            return 0
+
+    def close(self):
+        """
+        Flushes any remaining text immediately.
+        """
+        self.flush()
+        app_logger.info("Emitted %s AI response frames (%s deltas) to user_id: %s, session_id: %s", self.seq, self.deltas, self.user_id, self.session_id)
+
+
+def emit_stream_chunks(socketio, user_id, session_id, chunks):
+    """
+    Emits AI response chunks to the user room, coalesced into sequenced frames.
     """
     try:
-        room = get_user_room(user_id)
+        emitter = ResponseStreamEmitter(socketio, user_id, session_id)
         for chunk in chunks:
-            socketio.emit('ai:response:chunk', {
-                'session_id': session_id,
-                'chunk': chunk
-            }, room=room)
-            socketio.sleep(delay)
-        app_logger.info(f"Emitted {len(chunks)} AI response chunks to user_id: {user_id}, session_id: {session_id}")
+            emitter.push(chunk)
+        emitter.close()
     except Exception as e:
         error_logger.error(f"emit_stream_chunks error: {e}", exc_info=True)
 
@@ -93,6 +464,6 @@ def emit_response_end(socketio, user_id, session_id, ai_msg_id, ai_text):
                 'text': ai_text
             }
         }, room=room)
-        app_logger.info(f"Emitted AI response end to user_id: {user_id}, session_id: {session_id}")
+        app_logger.info("Emitted AI response end to user_id: %s, session_id: %s", user_id, session_id)
     except Exception as e:
         error_logger.error(f"emit_response_end error: {e}", exc_info=True)
@@ -1,20 +1,153 @@
-from flask import current_app, jsonify
+import os
+import time
+import hashlib
+import functools
+import threading
+from collections import OrderedDict
+from flask import current_app, jsonify, request, g
 import jwt
 import logging
 from logging_config import app_logger, error_logger
 
-def get_jwt_user_id(request):
+
+class VerifiedTokenCache:
+    """
+    Bounded LRU of verified tokens keyed by SHA-256 digest.
+    Entries expire at the token's own `exp` (or after max_ttl, whichever is first),
+    so a cached token is never accepted for longer than jwt.decode would accept it.
+    """
+
+    def __init__(self, max_size=10000, max_ttl=300.0):
+        self.max_size = max_size
+        self.max_ttl = max_ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0}
+
+    def get(self, digest):
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None:
+                self.stats['misses'] += 1
+                return None
+            user_id, expires_at = entry
+            if expires_at <= time.time():
+                del self._entries[digest]
+                self.stats['misses'] += 1
+                return None
+            self._entries.move_to_end(digest)
+            self.stats['hits'] += 1
+            return user_id
+
+    def __len__(self):
+        return len(self._entries)
+
+    def put(self, digest, user_id, exp=None):
+        expires_at = time.time() + self.max_ttl
+        if exp is not None:
+            expires_at = min(expires_at, float(exp))
+        with self._lock:
+            self._entries[digest] = (user_id, expires_at)
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def discard(self, digest):
+        with self._lock:
+            self._entries.pop(digest, None)
+
+
+_token_cache = VerifiedTokenCache(
+    max_size=int(os.getenv('JWT_CACHE_SIZE', 10000)),
+    max_ttl=float(os.getenv('JWT_CACHE_TTL', 300)),
+)
+
+
+def extract_token(req):
+    """
+    Returns the bearer token from the Authorization header, or None.
+    """
+    token = req.headers.get('Authorization', '').replace('Bearer ', '').strip()
+    return token or None
+
+
+def _digest(token):
+    return hashlib.sha256(token.encode('utf-8')).digest()
+
+
+def forget_token(token):
+    """
+    Drops a token from the verified-token cache, e.g. on logout. JWTs are stateless,
+    so this does not revoke the token: it still verifies until its `exp`.
+    """
+    if token:
+        _token_cache.discard(_digest(token))
+
+
+def verify_token(token):
+    """
+    Verifies a JWT once and caches the result until the token expires.
+    Returns the user_id, or None if the token is missing or invalid.
+    """
+    if not token:
+        return None
+    digest = _digest(token)
+    user_id = _token_cache.get(digest)
+    if user_id is not None:
+        return user_id
     try:
-        token = request.headers.get('Authorization', '').replace('Bearer ', '')
-        if not token:
-            app_logger.warning("Missing token in get_jwt_user_id")
-            return jsonify({'error': 'Missing token'}), 400
-        if not is_jwt_valid(token):
-            app_logger.warning("Invalid token in get_jwt_user_id")
-            return jsonify({'error': 'Invalid token'}), 401
         payload = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=['HS256'])
-        app_logger.info(f"JWT decoded for user_id: {payload.get('user_id')}")
-        return payload['user_id']
+        user_id = payload.get('user_id')
+        if not user_id:
+            return None
+        _token_cache.put(digest, user_id, payload.get('exp'))
+        return user_id
+    except jwt.InvalidTokenError as e:
+        app_logger.warning(f"Invalid token: {e}")
+        return None
+
+
+def authenticate_request():
+    """
+    before_request hook: verifies the bearer token once and attaches the user to `g.user_id`.
+    """
+    if request.method == 'OPTIONS':
+        return None
+    token = extract_token(request)
+    if not token:
+        return jsonify({'error': 'Missing token'}), 400
+    user_id = verify_token(token)
+    if not user_id:
+        return jsonify({'error': 'Invalid token'}), 401
+    g.user_id = user_id
+    return None
+
+
+def require_auth(view):
+    """
+    Applies authenticate_request to a single view instead of a whole blueprint.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        rejection = authenticate_request()
+        if rejection is not None:
+            return rejection
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def current_user_id():
+    """
+    The user authenticated for this request by authenticate_request.
+    """
+    return g.get('user_id')
+
+
+def get_jwt_user_id(request):
+    try:
+        if g.get('user_id'):
+            return g.user_id
+        return verify_token(extract_token(request))
     except Exception as e:
         error_logger.error(f"get_jwt_user_id error: {e}", exc_info=True)
         return None
@@ -25,8 +158,11 @@ def is_jwt_valid(token):
     Returns True if valid, False otherwise.
     """
     try:
-        payload = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=['HS256'])
-        return True
+        return verify_token(token) is not None
     except Exception as e:
         error_logger.error(f"is_jwt_valid error: {e}", exc_info=True)
-        return False
\ No newline at end of file
+        return False
+
+
+def get_token_cache_stats():
+    return dict(_token_cache.stats, size=len(_token_cache))
@@ -1,7 +1,33 @@
 from markdown_it import MarkdownIt
 from mdit_plain.renderer import RendererPlain
+import os
 import re
 
+# Built once: constructing MarkdownIt per call dominated the cost of short texts.
+# Rendering keeps no state between calls and never yields, so sharing it across green threads is safe.
+_parser = MarkdownIt(renderer_cls=RendererPlain)
+
+# Fix spacing around punctuation
+_SPACE_BEFORE_PUNCT = re.compile(r'\s+([.,!?])')
+
+# Replace common symbols with spoken words
+_REPLACEMENTS = {
+    '/': ' slash ',
+    '\\': ' backslash ',
+    '=': ' equals ',
+    '>': ' greater than ',
+    '<': ' less than ',
+    '{}': ' curly braces ',
+    '()': ' parentheses ',
+    '[]': ' square brackets ',
+    'e.g.': 'for example',
+    'i.e.': 'that is',
+    'etc.': 'etcetera'
+}
+_REPLACEMENT_PATTERN = re.compile(
+    '|'.join(re.escape(old) for old in sorted(_REPLACEMENTS, key=len, reverse=True))
+)
+
 def clean_markdown_for_tts(markdown_text):
     """
     Convert markdown to plain text suitable for TTS processing.
@@ -13,36 +39,203 @@ def clean_markdown_for_tts(markdown_text):
     Returns:
         str: Clean plain text suitable for TTS
     """
-    # Initialize markdown parser with plain text renderer
-    parser = MarkdownIt(renderer_cls=RendererPlain)
-    
     # Convert markdown to plain text
-    text = parser.render(markdown_text)
-    
+    text = _parser.render(markdown_text)
+
     # Clean up any remaining artifacts
-    
-    # Fix spacing around punctuation
-    text = re.sub(r'\s+([.,!?])', r'\1', text)
-    
-    # Replace common symbols with spoken words
-    replacements = {
-        '/': ' slash ',
-        '\\': ' backslash ',
-        '=': ' equals ',
-        '>': ' greater than ',
-        '<': ' less than ',
-        '{}': ' curly braces ',
-        '()': ' parentheses ',
-        '[]': ' square brackets ',
-        'e.g.': 'for example',
-        'i.e.': 'that is',
-        'etc.': 'etcetera'
-    }
-    
-    for old, new in replacements.items():
-        text = text.replace(old, new)
-    
+    text = _SPACE_BEFORE_PUNCT.sub(r'\1', text)
+    text = _REPLACEMENT_PATTERN.sub(lambda m: _REPLACEMENTS[m.group(0)], text)
+
     # Normalize whitespace
-    text = ' '.join(text.split())
-    
-    return text.strip()
+    return ' '.join(text.split())
+
+
+_FENCE_LINE = re.compile(r'^ {0,3}(```|~~~)', re.MULTILINE)
+_SENTENCE_BOUNDARY = re.compile(r'[.!?] +(?=\S)')
+# A period after these is not a sentence end: titles and common abbreviations,
+# single capital initials ("J. Smith") and dotted initialisms ("e.g.", "U.S.")
+_ABBREVIATIONS = frozenset({
+    'mr', 'mrs', 'ms', 'dr', 'prof', 'sr', 'jr', 'st', 'mt', 'vs', 'etc', 'approx',
+    'fig', 'vol', 'inc', 'ltd', 'jan', 'feb', 'mar', 'apr', 'jun', 'jul',
+    'aug', 'sep', 'sept', 'oct', 'nov', 'dec',
+})
+_INITIALS = re.compile(r'(?:[A-Z]|(?:[A-Za-z]\.)+[A-Za-z])')
+
+def _is_abbreviation(text, dot):
+    """
+    True if the period at text[dot] ends an abbreviation or initial rather than a sentence.
+    """
+    if text[dot] != '.':
+        return False
+    start = dot
+    while start and not text[start - 1].isspace():
+        start -= 1
+    word = text[start:dot].lstrip('(["\'')
+    return word.lower() in _ABBREVIATIONS or bool(_INITIALS.fullmatch(word))
+
+# Start of a list item line; "2. " here is a list marker, not a sentence end
+_LIST_ITEM = re.compile(r'^ {0,3}(?:\d{1,9}[.)]|[-+*])(?: |$)', re.MULTILINE)
+_CODE_SPAN = re.compile(r'`[^`]*`')
+_EMPHASIS_RUN = re.compile(r'\*+|_+')
+
+def _emphasis_balanced(text):
+    """
+    True if every * and _ run that can open or close emphasis is matched.
+    Runs between spaces (as in "2 * 3") and intraword underscores never do.
+    """
+    counts = {'*': 0, '_': 0}
+    for match in _EMPHASIS_RUN.finditer(text):
+        before = text[match.start() - 1] if match.start() else ' '
+        after = text[match.end()] if match.end() < len(text) else ' '
+        if before.isspace() and after.isspace():
+            continue
+        marker = match.group()[0]
+        if marker == '_' and before.isalnum() and after.isalnum():
+            continue
+        counts[marker] += 1
+    return not counts['*'] % 2 and not counts['_'] % 2
+
+def _inline_balanced(text):
+    """
+    True if text contains no unterminated inline code, emphasis or link.
+    """
+    if text.count('`') % 2:
+        return False
+    text = _CODE_SPAN.sub('', text)
+    if not _emphasis_balanced(_LIST_ITEM.sub('', text)):
+        return False
+    if text.rfind('[') > text.rfind(']'):
+        return False
+    link_target = text.rfind('](')
+    return link_target == -1 or text.find(')', link_target) != -1
+
+def _safe_boundary(text):
+    """
+    Returns the end of the longest prefix of text that can be cleaned on its own:
+    never inside an open code fence, and either at a blank line or at a sentence
+    end whose paragraph has no unterminated inline markup. Paragraphs holding a
+    list are only split before an item line.
+    """
+    fences = list(_FENCE_LINE.finditer(text))
+    if len(fences) % 2:
+        text = text[:fences[-1].start()]
+
+    boundary = 0
+    block_end = text.rfind('\n\n')
+    if block_end != -1:
+        boundary = block_end + 2
+
+    # Sentence ends after the last block boundary, outside any fenced block
+    if fences and len(fences) % 2 == 0 and fences[-1].start() >= boundary:
+        return boundary
+    paragraph = text[boundary:]
+    items = [match.start() for match in _LIST_ITEM.finditer(paragraph)]
+    if items:
+        # A later item cannot start a list inside a paragraph, so a list is only
+        # split before an item line, never mid-item
+        ends = items
+    else:
+        ends = [match.end() for match in _SENTENCE_BOUNDARY.finditer(paragraph)
+                if not _is_abbreviation(paragraph, match.start())]
+    for end in reversed(ends):
+        if end and _inline_balanced(paragraph[:end]):
+            return boundary + end
+    return boundary
+
+
+class StreamingTTSCleaner:
+    """
+    Incremental clean_markdown_for_tts for text that arrives in deltas.
+
+    feed() buffers markdown and returns speakable text for everything up to the
+    last safe boundary (a blank line, the start of a list item, or a sentence end
+    outside lists, open code fences, inline code, emphasis and links); flush()
+    cleans whatever remains. Each piece of
+    markdown is parsed exactly once, and joining all returned strings gives the
+    cleaned text of the whole response.
+    """
+
+    def __init__(self):
+        self._buffer = ''
+        self._emitted = False
+
+    def _clean(self, markdown_text):
+        text = clean_markdown_for_tts(markdown_text).strip()
+        if not text:
+            return ''
+        if self._emitted:
+            text = ' ' + text
+        self._emitted = True
+        return text
+
+    def feed(self, delta):
+        self._buffer += delta
+        boundary = _safe_boundary(self._buffer)
+        if not boundary:
+            return ''
+        ready, self._buffer = self._buffer[:boundary], self._buffer[boundary:]
+        return self._clean(ready)
+
+    def flush(self):
+        ready, self._buffer = self._buffer, ''
+        return self._clean(ready)
+
+
+_SENTENCE_END = re.compile(r'(?<=[.!?;:])\s+')
+_CLAUSE_END = re.compile(r'(?<=[,)])\s+')
+
+def _split_sentences(text):
+    """
+    Splits text after sentence-ending punctuation, except after abbreviations and initials.
+    """
+    sentences, start = [], 0
+    for match in _SENTENCE_END.finditer(text):
+        if not _is_abbreviation(text, match.start() - 1):
+            sentences.append(text[start:match.start()])
+            start = match.end()
+    sentences.append(text[start:])
+    return sentences
+
+def split_tts_segments(text, max_chars=None, split_first=True):
+    """
+    Split cleaned TTS text into segments at sentence boundaries. A period after
+    an abbreviation ("Dr.", "e.g.") or an initial ("J. Smith") is not one.
+
+    The first sentence is always its own segment so audio can start as soon as
+    it is synthesized; later sentences are packed together up to max_chars.
+    Sentences longer than max_chars are split at clause boundaries, then words.
+
+    Args:
+        text (str): Clean plain text, as returned by clean_markdown_for_tts
+        max_chars (int): Maximum segment length, defaults to TTS_SEGMENT_MAX_CHARS
+        split_first (bool): Keep the first sentence alone; pass False for text
+            that continues an already-segmented response
+
+    Returns:
+        list[str]: Non-empty segments in reading order
+    """
+    max_chars = int(max_chars or os.getenv('TTS_SEGMENT_MAX_CHARS', 600))
+
+    pieces = []
+    for sentence in _split_sentences(text.strip()):
+        if len(sentence) <= max_chars:
+            pieces.append(sentence)
+            continue
+        for clause in _CLAUSE_END.split(sentence):
+            while len(clause) > max_chars:
+                cut = clause.rfind(' ', 0, max_chars)
+                if cut <= 0:
+                    cut = max_chars
+                pieces.append(clause[:cut])
+                clause = clause[cut:].lstrip()
+            pieces.append(clause)
+
+    segments = []
+    for piece in pieces:
+        if not piece:
+            continue
+        if len(segments) > (1 if split_first else 0) and len(segments[-1]) + 1 + len(piece) <= max_chars:
+            segments[-1] = f"{segments[-1]} {piece}"
+        else:
+            segments.append(piece)
+    return segments
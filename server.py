@@ -10,12 +10,14 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 from logging_config import app_logger, error_logger
 from flask import Flask
 from flask_cors import CORS
-from flask_socketio import SocketIO
 from dotenv import load_dotenv
 from components.postgres.postgres_conn_utils import init_db
 from monolithic.routes.auth_routes import auth_bp
 from monolithic.routes.chat_routes import chat_bp
 from monolithic.socket.events import register_socket_events
+from monolithic.routes.metrics_routes import metrics_bp
+from monolithic.socket.emitter import set_emitter, InstrumentedSocketIO
+from monolithic.controllers.metrics_controller import init_metrics
 
 load_dotenv()
 
@@ -30,16 +32,21 @@ init_db(app)
 # Register Blueprints
 app.register_blueprint(auth_bp, url_prefix='/auth')
 app.register_blueprint(chat_bp)
+app.register_blueprint(metrics_bp)
 
 # SocketIO setup
-socketio = SocketIO(
+# With SOCKETIO_MESSAGE_QUEUE (e.g. redis://localhost:6379/0) emits and rooms span every worker and host
+socketio = InstrumentedSocketIO(
     app,
     cors_allowed_origins="*",
     ping_timeout=20,
     ping_interval=10,
-    async_mode='eventlet'
+    async_mode='eventlet',
+    message_queue=os.getenv('SOCKETIO_MESSAGE_QUEUE') or None,
+    channel=os.getenv('SOCKETIO_CHANNEL', 'flask-socketio')
 )
-sys.modules['server_socketio'] = socketio # Make socketio available for services
+set_emitter(socketio) # Services emit through this instead of importing the server
+init_metrics(app, socketio)
 
 # Push an application context before registering events
 with app.app_context():
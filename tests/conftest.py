@@ -0,0 +1,57 @@
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def http_server():
+    """
+    Starts local HTTP servers on ephemeral ports. Call it with handle(request),
+    where request is the BaseHTTPRequestHandler; it returns the base URL. Every
+    request is recorded in server.requests as (method, path, body).
+    """
+    servers = []
+
+    def start(handle):
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def _dispatch(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                self.body = self.rfile.read(length) if length else b''
+                server.requests.append((self.command, self.path, self.body))
+                handle(self)
+
+            do_GET = do_POST = _dispatch
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        server.daemon_threads = True
+        server.requests = []
+        threading.Thread(target=server.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True).start()
+        servers.append(server)
+        return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def send(request, status, body=b'', headers=None):
+    """
+    Writes a complete response with a Content-Length body.
+    """
+    request.send_response(status)
+    for name, value in (headers or {}).items():
+        request.send_header(name, value)
+    request.send_header('Content-Length', str(len(body)))
+    request.end_headers()
+    request.wfile.write(body)
@@ -0,0 +1,44 @@
+import base64
+
+from monolithic.socket.utils import emit_audio_chunks
+
+
+class FakeSocketIO:
+    def __init__(self):
+        self.emitted = []
+
+    def emit(self, event, data, room=None):
+        self.emitted.append((event, data, room))
+
+
+def _segments(encoding):
+    socketio = FakeSocketIO()
+    channels = [('binary', encoding, 16000), ('base64', encoding, 16000)]
+    seq = emit_audio_chunks(socketio, 'u1', 'm1', b'a' * 10, channels, chunk_size=4, is_last_segment=False)
+    seq = emit_audio_chunks(socketio, 'u1', 'm1', b'b' * 3, channels, first_seq=seq, segment_index=1,
+                            chunk_size=4)
+    return seq, socketio.emitted
+
+
+def test_chunks_mark_segment_boundaries():
+    seq, emitted = _segments('LINEAR16')
+    binary = [data for _, data, room in emitted if ':binary:' in room]
+
+    assert seq == 4
+    assert [d['chunkSeq'] for d in binary] == [0, 1, 2, 3]
+    assert [d['segment'] for d in binary] == [0, 0, 0, 1]
+    assert [d['segmentStart'] for d in binary] == [True, False, False, True]
+    assert [d['segmentEnd'] for d in binary] == [False, False, True, True]
+    assert [d['isLast'] for d in binary] == [False, False, False, True]
+
+
+def test_each_segment_reassembles_to_its_own_file():
+    _, emitted = _segments('OGG_OPUS')
+    files = []
+    for _, data, room in emitted:
+        if ':base64:' not in room:
+            continue
+        if data['segmentStart']:
+            files.append(b'')
+        files[-1] += base64.b64decode(data['bytes'])
+    assert files == [b'a' * 10, b'b' * 3]
@@ -0,0 +1,65 @@
+import pytest
+
+from components.postgres import chat_queries
+
+
+class FakeCursor:
+    """Matches UPDATE chatsessions SET title by (session_id, user_id) against `sessions`."""
+
+    def __init__(self, sessions):
+        self.sessions = sessions
+        self.rowcount = -1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params):
+        title, session_id, user_id = params
+        self.rowcount = int((session_id, user_id) in self.sessions)
+
+
+class FakeConn:
+    def __init__(self, sessions):
+        self.sessions = sessions
+        self.committed = self.rolled_back = False
+
+    def cursor(self):
+        return FakeCursor(self.sessions)
+
+    def commit(self):
+        self.committed = True
+
+    def rollback(self):
+        self.rolled_back = True
+
+
+@pytest.fixture
+def cache_updates(monkeypatch):
+    updates = []
+    monkeypatch.setattr(chat_queries, '_update_session_cache', lambda *args: updates.append(args))
+    return updates
+
+
+def _exchange(session_id, title):
+    return {'session_id': session_id, 'user_id': 'u1', 'title': title, 'messages': []}
+
+
+def test_title_cached_only_for_sessions_that_were_updated(cache_updates):
+    conn = FakeConn({('s1', 'u1')})
+    chat_queries.insert_exchanges_db(conn, [_exchange('s1', 'Kept'), _exchange('s2', 'Deleted meanwhile')])
+
+    assert conn.committed
+    assert cache_updates == [('session_renamed', 'u1', 's1', 'Kept')]
+
+
+def test_failed_write_leaves_cache_alone(cache_updates, monkeypatch):
+    conn = FakeConn(set())
+    monkeypatch.setattr(FakeCursor, 'execute', lambda self, sql, params: 1 / 0)
+    with pytest.raises(ZeroDivisionError):
+        chat_queries.insert_exchanges_db(conn, [_exchange('s1', 'Title')])
+
+    assert conn.rolled_back and not conn.committed
+    assert cache_updates == []
@@ -0,0 +1,111 @@
+import json
+
+import pytest
+
+from components.llm_models import gemini_flash
+from components.llm_models.gemini_flash import iter_sse_events, get_gemini_response_stream, GeminiError
+from components.llm_models.response_cache import LLMResponseCache
+from conftest import send
+
+
+def _delta(text):
+    return 'data: ' + json.dumps({'candidates': [{'content': {'parts': [{'text': text}]}}]}) + '\n\n'
+
+
+def _sse_server(http_server, *events, status=200):
+    """
+    Fake streamGenerateContent endpoint that writes each event as its own HTTP chunk.
+    """
+    def handle(request):
+        if status != 200:
+            send(request, status, b'{"error": {"message": "bad request"}}')
+            return
+        request.send_response(200)
+        request.send_header('Content-Type', 'text/event-stream')
+        request.send_header('Transfer-Encoding', 'chunked')
+        request.end_headers()
+        for event in events:
+            data = event.encode('utf-8')
+            request.wfile.write(b'%x\r\n%s\r\n' % (len(data), data))
+            request.wfile.flush()
+        request.wfile.write(b'0\r\n\r\n')
+
+    server, url = http_server(handle)
+    return server, url
+
+
+@pytest.fixture
+def gemini(monkeypatch, http_server):
+    def start(*events, status=200, cache=None):
+        server, url = _sse_server(http_server, *events, status=status)
+        monkeypatch.setenv('GEMINI_API_BASE', url)
+        monkeypatch.setattr(gemini_flash, 'get_llm_cache', lambda: cache)
+        return server
+    return start
+
+
+def test_iter_sse_events_joins_multiline_data():
+    lines = ['data: first', 'data: second', '', 'data: third', '']
+    assert list(iter_sse_events(lines)) == ['first\nsecond', 'third']
+
+
+def test_iter_sse_events_skips_comments_keepalives_and_other_fields():
+    lines = [': keepalive', '', 'event: message', 'id: 1', 'data:no-space', 'retry: 10', '', '', ':', '']
+    assert list(iter_sse_events(lines)) == ['no-space']
+
+
+def test_iter_sse_events_yields_partial_final_event():
+    assert list(iter_sse_events(['data: a', '', 'data: tail'])) == ['a', 'tail']
+
+
+def test_stream_yields_deltas_as_they_arrive(gemini):
+    server = gemini(': keepalive\n\n', _delta('Hello'), _delta(' world'), _delta('!'))
+
+    assert list(get_gemini_response_stream('hi', use_cache=False)) == ['Hello', ' world', '!']
+    method, path, body = server.requests[0]
+    assert path.endswith(':streamGenerateContent?alt=sse')
+    assert json.loads(body)['contents'][-1]['parts'][0]['text'] == 'hi'
+
+
+def test_stream_reads_final_event_without_blank_line(gemini):
+    gemini(_delta('one'), _delta('two').rstrip('\n'))
+
+    assert list(get_gemini_response_stream('hi', use_cache=False)) == ['one', 'two']
+
+
+def test_error_event_raises_gemini_error(gemini):
+    gemini(_delta('partial'), 'data: ' + json.dumps({'error': {'code': 500, 'message': 'overloaded'}}) + '\n\n')
+
+    stream = get_gemini_response_stream('hi', use_cache=False)
+    assert next(stream) == 'partial'
+    with pytest.raises(GeminiError, match='overloaded'):
+        next(stream)
+
+
+def test_http_error_raises_gemini_error(gemini):
+    gemini(status=400)
+
+    with pytest.raises(GeminiError):
+        list(get_gemini_response_stream('hi', use_cache=False))
+
+
+def test_cache_replays_original_deltas(gemini):
+    cache = LLMResponseCache()
+    server = gemini(_delta('Hel'), _delta('lo'), cache=cache)
+
+    assert list(get_gemini_response_stream('Hi there?')) == ['Hel', 'lo']
+    # Normalised prompt hits the cache and replays the same chunk sequence
+    assert list(get_gemini_response_stream('hi there')) == ['Hel', 'lo']
+    assert len(server.requests) == 1
+    assert cache.stats()['hits'] == 1
+
+
+def test_failed_stream_is_not_cached(gemini):
+    cache = LLMResponseCache()
+    server = gemini(_delta('partial'), 'data: {"error": {"message": "boom"}}\n\n', cache=cache)
+
+    with pytest.raises(GeminiError):
+        list(get_gemini_response_stream('hi'))
+    with pytest.raises(GeminiError):
+        list(get_gemini_response_stream('hi'))
+    assert len(server.requests) == 2
@@ -0,0 +1,160 @@
+import eventlet
+import pytest
+
+job_executor = eventlet.import_patched('monolithic.services.job_executor')
+JobExecutor, JobQueue, JobRejected = job_executor.JobExecutor, job_executor.JobQueue, job_executor.JobRejected
+
+
+class Gate:
+    """A job body that records its start and blocks until opened."""
+
+    def __init__(self):
+        self.started = []
+        self._open = eventlet.event.Event()
+
+    def __call__(self, name):
+        self.started.append(name)
+        self._open.wait()
+        return name
+
+    def open(self):
+        self._open.send()
+        eventlet.sleep(0)
+
+
+def _executor(max_workers=1, **limits):
+    return JobExecutor([
+        JobQueue('tts', 0, limits.get('tts', 10)),
+        JobQueue('auto_tts', 1, limits.get('auto_tts', 10), max_wait=limits.get('auto_tts_wait')),
+        JobQueue('title', 2, limits.get('title', 10), max_depth=limits.get('title_depth', 1000)),
+    ], max_workers=max_workers)
+
+
+def _running(executor):
+    return {name: queue['running'] for name, queue in executor.stats()['queues'].items()}
+
+
+def test_free_slot_goes_to_highest_priority_queue():
+    executor = _executor(max_workers=1)
+    gate = Gate()
+    executor.submit('title', gate, 'blocker')
+    eventlet.sleep(0)
+    for queue in ('title', 'auto_tts', 'tts', 'auto_tts', 'tts'):
+        executor.submit(queue, gate, queue)
+
+    gate.open()
+    eventlet.sleep(0.01)
+    assert gate.started == ['blocker', 'tts', 'tts', 'auto_tts', 'auto_tts', 'title']
+
+
+def test_default_limits_keep_workers_for_interactive_tts(monkeypatch):
+    for name in ('JOB_MAX_WORKERS', 'JOB_TTS_CONCURRENCY', 'JOB_AUTO_TTS_CONCURRENCY', 'JOB_TITLE_CONCURRENCY'):
+        monkeypatch.delenv(name, raising=False)
+    module = eventlet.import_patched('monolithic.services.job_executor')
+    monkeypatch.setattr(module.atexit, 'register', lambda *args: None)
+    executor = module.get_job_executor()
+    gate = Gate()
+
+    # Auto-play and titles saturate first...
+    for _ in range(30):
+        executor.submit('auto_tts', gate, 'auto_tts')
+        executor.submit('title', gate, 'title')
+    eventlet.sleep(0)
+    assert _running(executor) == {'tts': 0, 'auto_tts': 12, 'title': 4}
+
+    # ...and interactive TTS still starts immediately on the reserved workers
+    for _ in range(10):
+        executor.submit('tts', gate, 'tts')
+    eventlet.sleep(0)
+    assert _running(executor) == {'tts': 8, 'auto_tts': 12, 'title': 4}
+    assert executor.stats()['running'] == 24
+    gate.open()
+
+
+def test_per_queue_cap_lets_other_queues_run():
+    executor = _executor(max_workers=4, tts=1)
+    gate = Gate()
+    for _ in range(3):
+        executor.submit('tts', gate, 'tts')
+    executor.submit('title', gate, 'title')
+    eventlet.sleep(0)
+    assert gate.started == ['tts', 'title']
+    gate.open()
+
+
+def test_full_queue_rejects():
+    executor = _executor(max_workers=1, title_depth=2)
+    gate = Gate()
+    executor.submit('tts', gate, 'blocker')
+    executor.submit('title', gate, 'a')
+    executor.submit('title', gate, 'b')
+    with pytest.raises(JobRejected):
+        executor.submit('title', gate, 'c')
+    assert executor.stats()['queues']['title']['rejected'] == 1
+    gate.open()
+
+
+def test_job_waiting_past_max_wait_is_dropped():
+    executor = _executor(max_workers=1, auto_tts_wait=0.01)
+    gate = Gate()
+    dropped = []
+    executor.submit('tts', gate, 'blocker')
+    job = executor.submit('auto_tts', gate, 'late')
+    job.on_drop(lambda j: dropped.append(j.state))
+    eventlet.sleep(0.02)
+
+    gate.open()
+    eventlet.sleep(0.01)
+    assert dropped == ['expired']
+    assert 'late' not in gate.started
+    assert job.wait() is None
+
+
+def test_cancel_pending_by_key_prefix():
+    executor = _executor(max_workers=1)
+    gate = Gate()
+    dropped = []
+    executor.submit('tts', gate, 'blocker', key=('u1', 'tts', 'm0'))
+    eventlet.sleep(0)
+    for key in (('u1', 'tts', 'm1'), ('u1', 'tts', 'm2'), ('u2', 'tts', 'm1')):
+        executor.submit('tts', gate, key[0] + key[2], key=key).on_drop(lambda j: dropped.append(j.key))
+
+    assert executor.cancel_pending('u1', 'tts', 'm1') == 1
+    assert executor.cancel_pending('u1') == 1  # the running blocker is not pending
+    gate.open()
+    eventlet.sleep(0.01)
+    assert gate.started == ['blocker', 'u2m1']
+    assert dropped == [('u1', 'tts', 'm1'), ('u1', 'tts', 'm2')]
+
+
+def test_cancel_kills_running_job():
+    executor = _executor()
+    gate = Gate()
+    job = executor.submit('tts', gate, 'running')
+    eventlet.sleep(0)
+    job.cancel()
+    eventlet.sleep(0)
+    assert job.state == 'cancelled' and job.wait() is None
+    assert executor.stats()['running'] == 0
+
+
+def test_drain_finishes_work_and_stops_accepting():
+    executor = _executor(max_workers=1)
+    results = [executor.submit('tts', eventlet.sleep, 0.01) for _ in range(3)]
+
+    assert executor.drain(timeout=1)
+    assert all(job.state == 'completed' for job in results)
+    with pytest.raises(JobRejected):
+        executor.submit('tts', eventlet.sleep, 0)
+
+
+def test_drain_timeout_discards_queued_jobs():
+    executor = _executor(max_workers=1)
+    gate = Gate()
+    dropped = []
+    executor.submit('tts', gate, 'blocker')
+    executor.submit('title', gate, 'queued').on_drop(lambda j: dropped.append(j.state))
+
+    assert not executor.drain(timeout=0.05)
+    assert dropped == ['discarded']
+    gate.open()
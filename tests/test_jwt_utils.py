@@ -0,0 +1,45 @@
+import time
+
+import jwt
+import pytest
+from flask import Flask
+
+from monolithic.utils import jwt_utils
+from monolithic.utils.jwt_utils import VerifiedTokenCache, verify_token, forget_token
+
+SECRET = 'test-secret'
+
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.setattr(jwt_utils, '_token_cache', VerifiedTokenCache(max_size=10, max_ttl=300))
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = SECRET
+    with app.app_context():
+        yield app
+
+
+def _token(exp_in=60):
+    return jwt.encode({'user_id': 'u1', 'exp': time.time() + exp_in}, SECRET, algorithm='HS256')
+
+
+def test_cached_entry_expires_with_the_token():
+    cache = VerifiedTokenCache(max_ttl=300)
+    cache.put(b'digest', 'u1', exp=time.time() - 1)
+    assert cache.get(b'digest') is None
+
+
+def test_forget_token_drops_cache_entry(app):
+    token = _token()
+    assert verify_token(token) == 'u1'
+    assert len(jwt_utils._token_cache) == 1
+
+    forget_token(token)
+    assert len(jwt_utils._token_cache) == 0
+    # Stateless: the token itself still verifies until it expires
+    assert verify_token(token) == 'u1'
+
+
+def test_expired_token_rejected(app):
+    assert verify_token(_token(exp_in=-1)) is None
+    assert len(jwt_utils._token_cache) == 0
@@ -0,0 +1,96 @@
+import datetime
+
+import pytest
+
+from monolithic.services import chat_service
+from monolithic.services.chat_service import (
+    encode_message_cursor, decode_message_cursor, list_messages_page
+)
+
+T0 = datetime.datetime(2026, 1, 1, 12, 0, 0, 123456)
+
+
+def _message(i):
+    return {'id': f'00000000-0000-0000-0000-{i:012d}', 'sender': 'USER', 'text': str(i),
+            'created_at': T0 + datetime.timedelta(seconds=i)}
+
+
+@pytest.fixture
+def pages(monkeypatch):
+    """
+    Stubs get_messages_page_db with `has_more` set per test; records the calls.
+    """
+    state = {'has_more': False, 'messages': [_message(i) for i in range(3)], 'calls': []}
+
+    def fake(session_id, limit, before=None, after=None):
+        state['calls'].append({'limit': limit, 'before': before, 'after': after})
+        return state['messages'], state['has_more']
+    monkeypatch.setattr(chat_service, 'get_messages_page_db', fake)
+    return state
+
+
+def test_cursor_round_trip():
+    message = _message(7)
+    cursor = encode_message_cursor(message)
+    assert '=' not in cursor
+    assert decode_message_cursor(cursor) == (message['created_at'], message['id'])
+
+
+@pytest.mark.parametrize('cursor', ['not-a-cursor', 'e30', '!!!', encode_message_cursor(_message(1))[:-4]])
+def test_malformed_cursor_raises_value_error(cursor):
+    with pytest.raises(ValueError):
+        decode_message_cursor(cursor)
+
+
+def test_before_and_after_together_are_rejected(pages):
+    cursor = encode_message_cursor(_message(1))
+    with pytest.raises(ValueError):
+        list_messages_page('s', 'u', before=cursor, after=cursor)
+    assert pages['calls'] == []
+
+
+@pytest.mark.parametrize('limit', ['0', '-5', 'abc'])
+def test_invalid_limit_is_rejected(pages, limit):
+    with pytest.raises(ValueError):
+        list_messages_page('s', 'u', limit=limit)
+
+
+def test_limit_defaults_and_is_capped(pages):
+    list_messages_page('s', 'u')
+    list_messages_page('s', 'u', limit=str(chat_service.MESSAGES_PAGE_MAX + 1))
+    assert [c['limit'] for c in pages['calls']] == [chat_service.MESSAGES_PAGE_DEFAULT, chat_service.MESSAGES_PAGE_MAX]
+
+
+def test_newest_page_with_older_history(pages):
+    pages['has_more'] = True
+    page = list_messages_page('s', 'u')
+    assert decode_message_cursor(page['before']) == (T0, _message(0)['id'])
+    assert page['after'] is None
+
+
+def test_newest_page_of_short_history(pages):
+    page = list_messages_page('s', 'u')
+    assert page['before'] is None and page['after'] is None
+
+
+def test_before_page_always_has_newer(pages):
+    page = list_messages_page('s', 'u', before=encode_message_cursor(_message(10)))
+    assert pages['calls'][0]['before'] == (_message(10)['created_at'], _message(10)['id'])
+    assert page['before'] is None
+    assert decode_message_cursor(page['after'])[1] == _message(2)['id']
+
+
+def test_after_page_has_older_and_maybe_newer(pages):
+    cursor = encode_message_cursor(_message(-1))
+    page = list_messages_page('s', 'u', after=cursor)
+    assert page['before'] is not None and page['after'] is None
+
+    pages['has_more'] = True
+    page = list_messages_page('s', 'u', after=cursor)
+    assert page['after'] is not None
+
+
+def test_empty_page_has_no_cursors(pages):
+    pages['messages'] = []
+    pages['has_more'] = True
+    assert list_messages_page('s', 'u') == {'messages': [], 'before': None, 'after': None}
@@ -0,0 +1,53 @@
+import pytest
+
+from components.metrics import metrics
+from components.metrics.metrics import Counter, Gauge, Histogram
+
+
+@pytest.fixture(autouse=True)
+def registry(monkeypatch):
+    monkeypatch.setattr(metrics, '_registry', [])
+
+
+def _samples(metric):
+    return [line for line in metric.collect() if not line.startswith('#')]
+
+
+def test_children_come_from_child_class():
+    counter = Counter('c', 'doc', ('event',))
+    counter.labels('a').inc(2)
+    histogram = Histogram('h', 'doc', buckets=(1, 10))
+    histogram.observe(5)
+
+    assert isinstance(counter.labels('a'), Counter.child_class)
+    assert _samples(counter) == ['c_total{event="a"} 2']
+    assert _samples(histogram) == ['h_bucket{le="1.0"} 0', 'h_bucket{le="10.0"} 1', 'h_bucket{le="+Inf"} 1',
+                                   'h_sum 5.0', 'h_count 1']
+
+
+def test_callbacks_read_values_at_scrape_time():
+    stats = {'hits': 1}
+    counter = Counter('hits', 'doc', ('event',), callback=lambda: {('hits',): stats['hits']})
+    gauge = Gauge('size', 'doc', callback=lambda: len(stats))
+
+    stats['hits'] = 7
+    assert _samples(counter) == ['hits_total{event="hits"} 7']
+    assert _samples(gauge) == ['size 1']
+
+
+def test_failing_callback_does_not_break_the_scrape():
+    Gauge('broken', 'doc', callback=lambda: 1 / 0)
+    Gauge('fine', 'doc', callback=lambda: 3)
+    assert 'fine 3' in metrics.render_metrics()
+
+
+def test_stats_sources_are_exported():
+    from monolithic.controllers import metrics_controller
+    metrics_controller._register_stats_metrics()
+    text = metrics.render_metrics()
+
+    for sample in ('tts_cache_events_total{event="misses"}', 'job_queue_running{queue="tts"}',
+                   'job_queue_jobs_total{queue="title",event="rejected"}', 'stream_jobs_active',
+                   'message_writer_pending', 'last_login_writer_events_total{event="dropped"}',
+                   'password_hash_waiting', 'log_records_total{event="dropped"}', 'context_requests_total'):
+        assert sample in text
@@ -0,0 +1,46 @@
+import pytest
+
+from monolithic.utils.text_processing import clean_markdown_for_tts, split_tts_segments, StreamingTTSCleaner
+
+DOCUMENTS = [
+    "Steps:\n\n1. First thing. Do it.\n2. Second thing. Done.\n\nEnd.",
+    "Steps:\n1. First. Two.\n2. Second. Three.\nAfter the list. Yes.",
+    "- One item. More.\n- Two item. More.\n\n* Three. Four.\n* Five.",
+    "Use *emphasis here. still* emphasis. Done.",
+    "Use _emphasis here. still_ emphasis. Done.",
+    "Hello **bold here. still bold** ok. Fine.\n\nNext paragraph. Here.",
+    "Try `a*b`. Then 2 * 3 is six. Keep snake_case words. End.",
+    "A [link. text](http://example.com/a.b) ok. B.",
+    "```\ncode. x\n```\nAfter the code. Yes.",
+    "Ask Dr. Smith and J. R. Jones, e.g. today. Then rest.",
+]
+
+
+def _stream(text, step):
+    cleaner = StreamingTTSCleaner()
+    pieces = [cleaner.feed(text[i:i + step]) for i in range(0, len(text), step)]
+    pieces.append(cleaner.flush())
+    return ''.join(pieces)
+
+
+@pytest.mark.parametrize('text', DOCUMENTS)
+@pytest.mark.parametrize('step', [1, 3, 7, 1000])
+def test_streamed_output_matches_whole_document(text, step):
+    assert _stream(text, step) == clean_markdown_for_tts(text)
+
+
+@pytest.mark.parametrize('text, first', [
+    ("Dr. Smith will see you now. Please wait.", "Dr. Smith will see you now."),
+    ("J. R. R. Tolkien wrote it. It is long.", "J. R. R. Tolkien wrote it."),
+    ("Use a tool, e.g. a hammer, i.e. this one. Then stop.", "Use a tool, e.g. a hammer, i.e. this one."),
+    ("It was made in the U.S. by Acme Inc. last year. Nice.", "It was made in the U.S. by Acme Inc. last year."),
+    ("Plain sentence. Another one.", "Plain sentence."),
+])
+def test_first_segment_not_cut_at_abbreviation(text, first):
+    assert split_tts_segments(text)[0] == first
+
+
+def test_streaming_boundary_skips_abbreviations():
+    cleaner = StreamingTTSCleaner()
+    assert cleaner.feed("Hello Dr. Smith") == ''
+    assert cleaner.feed(" and Mr. J. Doe. Next") == 'Hello Dr. Smith and Mr. J. Doe.'
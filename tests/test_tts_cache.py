@@ -0,0 +1,99 @@
+import eventlet
+import pytest
+
+# Green threading primitives, as under the server's monkey patching
+tts_cache = eventlet.import_patched('components.tts.tts_cache')
+TTSAudioCache = tts_cache.TTSAudioCache
+
+
+class Upstream:
+    def __init__(self, audio=b'audio', error=None, delay=0.01):
+        self.calls = 0
+        self.audio = audio
+        self.error = error
+        self.delay = delay
+
+    def __call__(self):
+        self.calls += 1
+        eventlet.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return self.audio
+
+
+def test_concurrent_misses_make_one_upstream_call():
+    cache = TTSAudioCache()
+    upstream = Upstream()
+    pool = eventlet.GreenPool()
+
+    results = list(pool.imap(lambda _: cache.get_or_create('key', upstream), range(20)))
+
+    assert results == [b'audio'] * 20
+    assert upstream.calls == 1
+    stats = cache.stats()
+    assert stats['misses'] == 1 and stats['coalesced'] == 19
+
+
+def test_failure_is_shared_but_not_cached():
+    cache = TTSAudioCache()
+    failing = Upstream(error=RuntimeError('upstream down'))
+    pool = eventlet.GreenPool()
+
+    def call(_):
+        try:
+            return cache.get_or_create('key', failing)
+        except RuntimeError as e:
+            return e
+    results = list(pool.imap(call, range(5)))
+
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert failing.calls == 1
+    assert cache.get('key') is None
+    assert cache.get_or_create('key', Upstream(b'fresh')) == b'fresh'
+
+
+def test_killed_leader_lets_a_waiter_retry():
+    cache = TTSAudioCache()
+    slow = Upstream(delay=10)
+    leader = eventlet.spawn(cache.get_or_create, 'key', slow)
+    eventlet.sleep(0)
+    follower = eventlet.spawn(cache.get_or_create, 'key', Upstream(b'retried'))
+    eventlet.sleep(0)
+
+    leader.kill()
+
+    assert follower.wait() == b'retried'
+
+
+def test_memory_tier_evicts_least_recently_used_over_byte_cap():
+    cache = TTSAudioCache(max_memory_bytes=10)
+    cache.put('a', b'1234')
+    cache.put('b', b'1234')
+    cache.get('a')
+    cache.put('c', b'1234')
+
+    assert cache.get('b') is None
+    assert cache.get('a') == b'1234' and cache.get('c') == b'1234'
+    stats = cache.stats()
+    assert stats['memory_bytes'] <= 10 and stats['memory_evictions'] == 1
+
+
+def test_oversized_clip_is_not_kept_in_memory():
+    cache = TTSAudioCache(max_memory_bytes=4)
+    cache.put('big', b'12345')
+    assert cache.stats()['memory_entries'] == 0
+
+
+def test_disk_tier_evicts_over_byte_cap_and_survives_restart(tmp_path):
+    cache = TTSAudioCache(max_memory_bytes=0, disk_dir=str(tmp_path), max_disk_bytes=10)
+    cache.put('a', b'1234')
+    cache.put('b', b'1234')
+    cache.put('c', b'1234')
+
+    assert cache.get('a') is None
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['b.audio', 'c.audio']
+    assert cache.stats()['disk_evictions'] == 1
+
+    reopened = TTSAudioCache(max_memory_bytes=0, disk_dir=str(tmp_path), max_disk_bytes=10)
+    assert reopened.get('c') == b'1234'
+    assert reopened.stats()['disk_hits'] == 1
@@ -0,0 +1,160 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+import requests
+from greenlet import GreenletExit
+
+from components.http import upstream_client
+from components.http.upstream_client import UpstreamClient, CircuitOpenError
+from conftest import send
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    delays = []
+    # Only the client's backoff sleeps are recorded; the tests' own waits are real
+    monkeypatch.setattr(upstream_client, 'time', SimpleNamespace(
+        sleep=delays.append, monotonic=time.monotonic, time=time.time))
+    return delays
+
+
+def _statuses(*statuses, headers=None):
+    remaining = list(statuses)
+
+    def handle(request):
+        status = remaining.pop(0) if len(remaining) > 1 else remaining[0]
+        send(request, status, b'ok', headers if status != 200 else None)
+    return handle
+
+
+def test_retries_retryable_statuses_with_full_jitter(http_server, sleeps):
+    server, url = http_server(_statuses(503, 502, 200))
+    client = UpstreamClient('test', max_retries=2, backoff_base=0.5, backoff_max=8)
+
+    response = client.post(url)
+
+    assert response.status_code == 200
+    assert len(server.requests) == 3
+    assert client.stats['retries'] == 2
+    # Full jitter: each delay is uniform between 0 and base * 2^attempt
+    assert 0 <= sleeps[0] <= 0.5 and 0 <= sleeps[1] <= 1.0
+
+
+def test_gives_up_after_max_retries(http_server, sleeps):
+    server, url = http_server(_statuses(500))
+    client = UpstreamClient('test', max_retries=2, failure_threshold=10)
+
+    assert client.post(url).status_code == 500
+    assert len(server.requests) == 3
+
+
+def test_retry_after_overrides_backoff(http_server, sleeps):
+    server, url = http_server(_statuses(429, 200, headers={'Retry-After': '3'}))
+    client = UpstreamClient('test', backoff_max=8)
+
+    assert client.post(url).status_code == 200
+    assert sleeps == [3.0]
+
+
+def test_retry_after_is_capped(http_server, sleeps):
+    server, url = http_server(_statuses(503, 200, headers={'Retry-After': '120'}))
+    client = UpstreamClient('test', backoff_max=2)
+
+    client.post(url)
+    assert sleeps == [2]
+
+
+def test_stream_is_not_retried_once_headers_arrived(http_server, sleeps):
+    def handle(request):
+        request.send_response(200)
+        request.send_header('Content-Length', '100')
+        request.end_headers()
+        request.wfile.write(b'partial')
+        request.wfile.flush()
+        request.close_connection = True
+        request.connection.shutdown(1)
+
+    server, url = http_server(handle)
+    client = UpstreamClient('test', max_retries=3)
+
+    response = client.post(url, stream=True)
+    with pytest.raises(requests.RequestException):
+        response.content
+    assert len(server.requests) == 1
+    assert sleeps == []
+
+
+def test_stream_is_retried_before_headers(http_server, sleeps):
+    server, url = http_server(_statuses(503, 200))
+    client = UpstreamClient('test', max_retries=1)
+
+    with client.post(url, stream=True) as response:
+        assert response.status_code == 200
+    assert len(server.requests) == 2
+
+
+def test_breaker_opens_half_opens_and_closes(http_server, sleeps):
+    server, url = http_server(_statuses(503, 503, 200))
+    client = UpstreamClient('test', max_retries=0, failure_threshold=2, reset_timeout=0.05)
+
+    client.post(url)
+    client.post(url)
+    assert client.breaker.state == 'open'
+    with pytest.raises(CircuitOpenError):
+        client.post(url)
+    assert len(server.requests) == 2
+
+    time.sleep(0.06)
+    assert client.post(url).status_code == 200
+    assert client.breaker.state == 'closed'
+
+
+def test_failed_trial_reopens_circuit(http_server, sleeps):
+    server, url = http_server(_statuses(503))
+    client = UpstreamClient('test', max_retries=0, failure_threshold=1, reset_timeout=0.05)
+
+    client.post(url)
+    time.sleep(0.06)
+    client.post(url)
+    assert client.breaker.state == 'open'
+    with pytest.raises(CircuitOpenError):
+        client.post(url)
+
+
+def _open_then_wait(client, url):
+    client.post(url)
+    assert client.breaker.state == 'open'
+    time.sleep(0.06)
+
+
+@pytest.mark.parametrize('error', [GreenletExit, KeyboardInterrupt])
+def test_interrupted_trial_releases_half_open_circuit(http_server, sleeps, monkeypatch, error):
+    server, url = http_server(_statuses(503, 200))
+    client = UpstreamClient('test', max_retries=0, failure_threshold=1, reset_timeout=0.05)
+    _open_then_wait(client, url)
+
+    def interrupted(*args, **kwargs):
+        raise error()
+    with monkeypatch.context() as patch:
+        patch.setattr(client.session, 'request', interrupted)
+        with pytest.raises(error):
+            client.post(url)
+
+    # The next call is the new trial instead of being short-circuited forever
+    assert client.post(url).status_code == 200
+    assert client.breaker.state == 'closed'
+
+
+def test_unexpected_request_error_counts_as_failure(http_server, sleeps, monkeypatch):
+    server, url = http_server(_statuses(503))
+    client = UpstreamClient('test', max_retries=0, failure_threshold=1, reset_timeout=0.05)
+    _open_then_wait(client, url)
+
+    def broken(*args, **kwargs):
+        raise requests.exceptions.ChunkedEncodingError('broken')
+    monkeypatch.setattr(client.session, 'request', broken)
+    with pytest.raises(requests.exceptions.ChunkedEncodingError):
+        client.post(url)
+    assert client.breaker.state == 'open'
+    assert client.breaker._trial_in_flight is False